@@ -0,0 +1,85 @@
+"""Compare memory held by a large result as rows and as columns.
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_columns.py``.
+
+The reply is parsed from bytes by a real ``ApiCommunicator`` over an
+in-memory connection, once with ``get()`` and once with ``get_columns()``.
+"""
+import argparse
+import collections
+import time
+import tracemalloc
+
+from routeros_api import api_structure
+from routeros_api import protocol
+from routeros_api import resource
+from routeros_api.api_communicator import ApiCommunicator
+
+STRUCTURE = collections.defaultdict(api_structure.StringField, {
+    'orig-bytes': api_structure.IntegerField(),
+    'repl-bytes': api_structure.IntegerField(),
+    'orig-packets': api_structure.IntegerField(),
+    'repl-packets': api_structure.IntegerField(),
+})
+
+
+class ReplayConnection(object):
+    def __init__(self, sentences):
+        self.sentences = iter(sentences)
+
+    def send_sentence(self, words):
+        pass
+
+    def receive_sentence(self):
+        return next(self.sentences)
+
+
+def build_sentences(rows):
+    sentences = [[
+        b'!re',
+        b'=.id=*' + str(index).encode(),
+        b'=protocol=tcp',
+        b'=src-address=10.0.%d.%d:%d' % (index // 256 % 256, index % 256, 1024 + index % 60000),
+        b'=dst-address=192.168.88.1:443',
+        b'=tcp-state=established',
+        b'=orig-bytes=' + str(index * 1500).encode(),
+        b'=repl-bytes=' + str(index * 900).encode(),
+        b'=orig-packets=' + str(index * 3).encode(),
+        b'=repl-packets=' + str(index * 2).encode(),
+        b'.tag=1',
+    ] for index in range(rows)]
+    sentences.append([b'!done', b'.tag=1'])
+    # Make the words fresh bytes objects, as if they were read from a socket.
+    reader = protocol.SentenceReader()
+    reader.feed(b''.join(map(protocol.encode_sentence, sentences)))
+    return list(reader.read_sentences())
+
+
+def run(name, fetch, rows):
+    sentences = build_sentences(rows)
+    some_resource = resource.RouterOsResource(
+        ApiCommunicator(ReplayConnection(sentences)), '/ip/firewall/connection', STRUCTURE)
+    del sentences
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fetch(some_resource)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:<8} {:>8.1f} MiB held {:>8.1f} MiB peak {:>8.3f}s'.format(
+        name, current / 2 ** 20, peak / 2 ** 20, elapsed))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    print('{} rows'.format(args.rows))
+    run('rows', lambda some_resource: some_resource.get(), args.rows)
+    run('columns', lambda some_resource: some_resource.get_columns(), args.rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Compare sending a command with ``call_async`` and with ``prepare``.
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_prepared.py``.
+
+Only the sending side is measured: the connection discards the bytes and
+every command is answered with an empty ``!done``.
+"""
+import argparse
+import time
+
+from routeros_api import api_structure
+from routeros_api import base_api
+from routeros_api import resource
+from routeros_api.api_communicator import ApiCommunicator
+
+
+class DiscardingSocket(object):
+    def send(self, data):
+        pass
+
+
+class DoneConnection(base_api.Connection):
+    def __init__(self):
+        super(DoneConnection, self).__init__(DiscardingSocket())
+        self.tag = 0
+
+    def receive_sentence(self):
+        self.tag += 1
+        return [b'!done', b'.tag=' + str(self.tag).encode()]
+
+
+def get_resource():
+    return resource.RouterOsResource(ApiCommunicator(DoneConnection()), '/interface',
+                                     api_structure.default_structure).select('id', 'name', 'rx-byte', 'tx-byte')
+
+
+def call(count):
+    interfaces = get_resource()
+    for _ in range(count):
+        interfaces.call_async('print', {'stats': ''}, {'type': 'ether', 'running': 'true'}).get()
+
+
+def prepared(count):
+    prepared = get_resource().prepare('print', {'stats': ''}, {'type': 'ether', 'running': 'true'})
+    for _ in range(count):
+        prepared.call()
+
+
+def run(name, function, count):
+    started = time.perf_counter()
+    function(count)
+    elapsed = time.perf_counter() - started
+    print('{:<9} {:>10.0f} commands/s {:>8.3f}s'.format(name, count / elapsed, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=50000)
+    args = parser.parse_args()
+    run('call', call, args.count)
+    run('prepared', prepared, args.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Measure decoding a large ``print`` reply into sentences.
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_protocol.py``.
+
+"per word" reproduces the previous ``Connection.receive_word`` loop, which
+decoded every length prefix one byte at a time and read the word from the
+buffered socket.  "reader" feeds the same bytes, in chunks as they
+would arrive from the socket, to ``protocol.SentenceReader``.  "recv_into"
+lets the reader receive the chunks straight into its buffer, like
+``Connection.receive_sentence`` does.
+"""
+import argparse
+import io
+import time
+
+from routeros_api import protocol
+
+
+def build_reply(rows):
+    return b''.join(protocol.encode_sentence([
+        b'!re',
+        b'=.id=*' + str(index).encode(),
+        b'=protocol=tcp',
+        b'=src-address=10.0.%d.%d:%d' % (index // 256 % 256, index % 256, 1024 + index % 60000),
+        b'=dst-address=192.168.88.1:443',
+        b'=tcp-state=established',
+        b'=timeout=23h59m58s',
+        b'=orig-bytes=' + str(index * 1500).encode(),
+        b'=repl-bytes=' + str(index * 900).encode(),
+        b'.tag=1',
+    ]) for index in range(rows))
+
+
+def decode_length(read):
+    result, additional_bytes = protocol.decode_length_prefix(ord(read(1)))
+    for _ in range(additional_bytes):
+        result <<= 8
+        result += ord(read(1))
+    return result
+
+
+def per_word(reply, rows, chunk):
+    read = io.BytesIO(reply).read
+
+    def receive_word():
+        return read(decode_length(read))
+
+    for _ in range(rows):
+        list(iter(receive_word, b''))
+
+
+def reader(reply, rows, chunk):
+    sentence_reader = protocol.SentenceReader()
+    received = 0
+    for start in range(0, len(reply), chunk):
+        sentence_reader.feed(reply[start:start + chunk])
+        for _ in sentence_reader.read_sentences():
+            received += 1
+    assert received == rows
+
+
+def reader_recv_into(reply, rows, chunk):
+    sentence_reader = protocol.SentenceReader()
+    readinto = io.BytesIO(reply).readinto
+    received = 0
+    while sentence_reader.receive_into(readinto, chunk):
+        for _ in sentence_reader.read_sentences():
+            received += 1
+    assert received == rows
+
+
+def run(name, function, reply, rows, chunk, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(reply, rows, chunk)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print('{:<10} {:>12.0f} sentences/s {:>8.3f}s'.format(name, rows / best, best))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk', type=int, default=64 * 1024)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    reply = build_reply(args.rows)
+    print('{} sentences, {} bytes, best of {}'.format(args.rows, len(reply), args.repeat))
+    run('per word', per_word, reply, args.rows, args.chunk, args.repeat)
+    run('reader', reader, reply, args.rows, args.chunk, args.repeat)
+    run('recv_into', reader_recv_into, reply, args.rows, args.chunk, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Measure rows per second spent turning received rows into typed dicts.
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_row_decoding.py``.
+
+Both paths start from the attribute dicts produced by ``ResponseSentence``.
+The "layered" path reproduces the previous decorator chain, which copied
+every row (and the list of rows) once for key cleaning, once for decoding
+keys and once for typing values.  The "fused" path is the ``RowDecoder``
+used by ``RouterOsResource``.  The last two lines read three columns of
+every row, from fused rows and from ``lazy_rows=True`` rows.
+"""
+import argparse
+import collections
+import time
+
+from routeros_api import api_structure
+from routeros_api import resource
+from routeros_api.api_communicator import base
+from routeros_api.api_communicator import key_cleaner_decorator
+
+
+def build_response(rows):
+    response = base.AsynchronousResponse(command=b'/ip/firewall/connection/print')
+    for index in range(rows):
+        response.append({
+            b'.id': b'*' + str(index).encode(),
+            b'protocol': b'tcp',
+            b'src-address': b'10.0.%d.%d:%d' % (index // 256 % 256, index % 256, 1024 + index % 60000),
+            b'dst-address': b'192.168.88.1:443',
+            b'tcp-state': b'established',
+            b'timeout': b'23h59m58s',
+            b'orig-bytes': str(index * 1500).encode(),
+            b'repl-bytes': str(index * 900).encode(),
+            b'assured': b'true',
+            b'seen-reply': b'true',
+        })
+    response.done = True
+    return response
+
+
+def layered(response, structure):
+    cleaned = response.map(key_cleaner_decorator.decode_dictionary)
+    decoded = cleaned.map(lambda row: dict((key.decode(), value) for key, value in row.items()))
+    return decoded.map(resource.TypedPromiseDecorator(None, structure).transform_dictionary)
+
+
+def fused(response, structure):
+    return response.map(resource.RowDecoder(structure))
+
+
+def fused_three_columns(response, structure):
+    return [(row['id'], row['src-address'], row['orig-bytes']) for row in fused(response, structure)]
+
+
+def lazy_three_columns(response, structure):
+    rows = response.map(resource.LazyRowDecoder(structure))
+    return [(row['id'], row['src-address'], row['orig-bytes']) for row in rows]
+
+
+def run(name, function, response, structure, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(response, structure)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print('{:<14} {:>12.0f} rows/s {:>8.3f}s'.format(name, len(response) / best, best))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    response = build_response(args.rows)
+    structure = collections.defaultdict(api_structure.StringField, {
+        'timeout': api_structure.TimedeltaField(),
+        'orig-bytes': api_structure.IntegerField(),
+        'repl-bytes': api_structure.IntegerField(),
+        'assured': api_structure.BooleanField(),
+        'seen-reply': api_structure.BooleanField(),
+    })
+    print('{} rows, best of {}'.format(args.rows, args.repeat))
+    expected = run('layered', layered, response, structure, args.repeat)
+    result = run('fused', fused, response, structure, args.repeat)
+    assert result == expected
+    expected = run('fused, 3 cols', fused_three_columns, response, structure, args.repeat)
+    result = run('lazy, 3 cols', lazy_three_columns, response, structure, args.repeat)
+    assert result == expected
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compare ``ResponseSentence.parse`` with the former regular expression parser.
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_sentence_parsing.py``.
+"""
+import argparse
+import re
+import time
+
+from routeros_api import exceptions
+from routeros_api import sentence
+
+response_re = re.compile(rb'^!(re|trap|fatal|empty|done)$')
+attribute_re = re.compile(rb'^=([^=]+)=(.*)$', re.DOTALL)
+tag_re = re.compile(rb'^\.tag=(.*)$')
+
+
+class RegexResponseSentence(sentence.ResponseSentence):
+    @classmethod
+    def parse(cls, sentence):
+        response_match = response_re.match(sentence[0])
+        if response_match:
+            response = cls(response_match.group(1))
+            response.parse_attributes(sentence[1:])
+        else:
+            raise exceptions.RouterOsApiParsingError("Malformed sentence %s", sentence)
+        return response
+
+    def parse_attributes(self, serialized_attributes):
+        for serialized in serialized_attributes:
+            attribute_match = attribute_re.match(serialized)
+            tag_match = tag_re.match(serialized)
+            if attribute_match:
+                key, value = attribute_match.groups()
+                self.attributes[key] = self.process_value(value)
+            elif tag_match:
+                self.tag = tag_match.group(1)
+            else:
+                raise exceptions.RouterOsApiParsingError("Malformed attribute %s", serialized)
+
+
+def build_sentences(rows):
+    return [[
+        b'!re',
+        b'=.id=*' + str(index).encode(),
+        b'=protocol=tcp',
+        b'=src-address=10.0.%d.%d:%d' % (index // 256 % 256, index % 256, 1024 + index % 60000),
+        b'=dst-address=192.168.88.1:443',
+        b'=tcp-state=established',
+        b'=timeout=23h59m58s',
+        b'=orig-bytes=' + str(index * 1500).encode(),
+        b'=repl-bytes=' + str(index * 900).encode(),
+        b'.tag=1',
+    ] for index in range(rows)]
+
+
+def run(name, parser, sentences, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for words in sentences:
+            parser.parse(words)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print('{:<8} {:>12.0f} sentences/s {:>8.3f}s'.format(name, len(sentences) / best, best))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    sentences = build_sentences(args.rows)
+    print('{} sentences of {} words, best of {}'.format(args.rows, len(sentences[0]), args.repeat))
+    run('regex', RegexResponseSentence, sentences, args.repeat)
+    run('split', sentence.ResponseSentence, sentences, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
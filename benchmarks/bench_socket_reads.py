@@ -0,0 +1,120 @@
+"""Count socket reads needed to receive a large ``print`` reply.
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_socket_reads.py``.
+
+The router reply is served by an in-memory socket that hands out at most
+``--segment`` bytes per read, like a kernel receive queue that is never
+empty.  The "per word" reader reproduces the previous ``Connection``, which
+issued one ``recv`` per length prefix byte and one per payload.  The
+"reader" receives into a ``protocol.SentenceReader`` like
+``Connection.receive_sentence`` does now.
+"""
+import argparse
+import time
+
+from routeros_api import base_api
+from routeros_api import protocol
+from routeros_api.api_socket import SocketWrapper
+
+
+class CountingSocket(object):
+    def __init__(self, data, segment):
+        self.data = memoryview(data)
+        self.position = 0
+        self.segment = segment
+        self.reads = 0
+
+    def recv(self, length):
+        self.reads += 1
+        length = min(length, self.segment)
+        chunk = self.data[self.position:self.position + length]
+        self.position += len(chunk)
+        return bytes(chunk)
+
+    def recv_into(self, buffer):
+        self.reads += 1
+        length = min(len(buffer), self.segment)
+        chunk = self.data[self.position:self.position + length]
+        buffer[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+
+def build_reply(rows):
+    data = bytearray()
+    for index in range(rows):
+        words = [
+            b'!re',
+            b'=.id=*' + str(index).encode(),
+            b'=protocol=tcp',
+            b'=src-address=10.0.%d.%d:%d' % (index // 256 % 256, index % 256, 1024 + index % 60000),
+            b'=dst-address=192.168.88.1:443',
+            b'=tcp-state=established',
+            b'=timeout=23h59m58s',
+            b'=orig-bytes=' + str(index * 1500).encode(),
+            b'=repl-bytes=' + str(index * 900).encode(),
+            b'.tag=1',
+        ]
+        for word in words + [b'']:
+            data += base_api.encode_length(len(word)) + word
+    return bytes(data)
+
+
+def decode_length(receive):
+    result, additional_bytes = protocol.decode_length_prefix(ord(receive(1)))
+    for _ in range(additional_bytes):
+        result <<= 8
+        result += ord(receive(1))
+    return result
+
+
+def receive_word(socket):
+    result = []
+    result_length = 0
+    expected_length = decode_length(socket.recv)
+    while result_length != expected_length:
+        received = socket.recv(expected_length - result_length)
+        result.append(received)
+        result_length += len(received)
+    return b''.join(result)
+
+
+def per_word(socket, rows):
+    for _ in range(rows):
+        while receive_word(socket):
+            pass
+
+
+def reader(socket, rows):
+    wrapper = SocketWrapper(socket)
+    sentence_reader = protocol.SentenceReader()
+    received = 0
+    while received < rows:
+        sentence_reader.receive_into(wrapper.receive_into, base_api.Connection.receive_size)
+        for _ in sentence_reader.read_sentences():
+            received += 1
+
+
+def run(name, function, reply, rows, segment):
+    socket = CountingSocket(reply, segment)
+    started = time.perf_counter()
+    function(socket, rows)
+    elapsed = time.perf_counter() - started
+    print('{:<12} {:>10} reads {:>10.3f} reads/row {:>8.3f}s'.format(
+        name, socket.reads, socket.reads / rows, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--segment', type=int, default=16 * 1024)
+    args = parser.parse_args()
+    reply = build_reply(args.rows)
+    print('{} rows, {} bytes, at most {} bytes per read'.format(args.rows, len(reply), args.segment))
+    run('per word', per_word, reply, args.rows, args.segment)
+    run('reader', reader, reply, args.rows, args.segment)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,5 +2,7 @@ from routeros_api import api_structure
 from routeros_api import query
 from routeros_api.api import RouterOsApiPool
 from routeros_api.api import connect
+from routeros_api.api_communicator.caching_decorator import ResponseCache
+from routeros_api.asyncio_api import AsyncRouterOsApiPool
 
-__all__ = ['connect', 'RouterOsApiPool', 'query', 'api_structure']
+__all__ = ['connect', 'RouterOsApiPool', 'AsyncRouterOsApiPool', 'ResponseCache', 'query', 'api_structure']
@@ -1,27 +1,39 @@
 import binascii
+import collections
+import contextlib
 import hashlib
+import threading
+import time
 
 from routeros_api import api_communicator
 from routeros_api import api_socket
 from routeros_api import api_structure
 from routeros_api import base_api
+from routeros_api import batch
 from routeros_api import communication_exception_parsers
 from routeros_api import exceptions
+from routeros_api import instrumentation
 from routeros_api import resource
 
 
 def connect(host, username='admin', password='', port=None, plaintext_login=False, use_ssl=False, ssl_verify=True,
-            ssl_verify_hostname=True, ssl_context=None):
+            ssl_verify_hostname=True, ssl_context=None, tcp_nodelay=False):
     return RouterOsApiPool(
         host, username, password, port, plaintext_login, use_ssl, ssl_verify, ssl_verify_hostname, ssl_context,
+        tcp_nodelay,
     ).get_api()
 
 
 class RouterOsApiPool(object):
     socket_timeout = 15.0
+    # Deadlines for establishing the connection and for logging in, socket_timeout is used when not set.
+    connect_timeout = None
+    login_timeout = None
+    health_check_path = '/system/identity'
 
     def __init__(self, host, username='admin', password='', port=None, plaintext_login=False, use_ssl=False,
-                 ssl_verify=True, ssl_verify_hostname=True, ssl_context=None):
+                 ssl_verify=True, ssl_verify_hostname=True, ssl_context=None, tcp_nodelay=False, min_size=0,
+                 max_size=10, max_idle_time=300.0, health_check_interval=30.0, threaded=False, cache=None):
         self.host = host
         self.username = username
         self.password = password
@@ -34,6 +46,10 @@ class RouterOsApiPool(object):
             self.use_ssl = use_ssl
         self.ssl_verify = ssl_verify
         self.ssl_verify_hostname = ssl_verify_hostname
+        self.tcp_nodelay = tcp_nodelay
+        self.threaded = threaded
+        # A ResponseCache shared by all connections of the pool.
+        self.cache = cache
 
         self.port = port or self._select_default_port(self.use_ssl)
 
@@ -42,31 +58,222 @@ class RouterOsApiPool(object):
         self.communication_exception_parser = (
             communication_exception_parsers.ExceptionHandler())
 
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.health_check_interval = health_check_interval
+        self.condition = threading.Condition()
+        self.idle_connections = collections.deque()
+        self.checked_out_connections = {}
+        self.pooled_count = 0
+        # TLS handshakes done by the pool and how many of them resumed an earlier session.
+        self.tls_handshakes = 0
+        self.tls_resumed_handshakes = 0
+        # Connections closed because they broke and not replaced yet, a new connection counts as a reconnect.
+        self.lost_connections = 0
+
     def get_api(self):
         if not self.connected:
-            self.socket = api_socket.get_socket(
-                self.host, self.port, timeout=self.socket_timeout, use_ssl=self.use_ssl, ssl_verify=self.ssl_verify,
-                ssl_verify_hostname=self.ssl_verify_hostname, ssl_context=self.ssl_context)
-            base = base_api.Connection(self.socket)
-            communicator = api_communicator.ApiCommunicator(base)
-            self.api = RouterOsApi(communicator)
-            for handler in self._get_exception_handlers():
-                communicator.add_exception_handler(handler)
-            self.api.login(self.username, self.password, self.plaintext_login)
+            socket = self._open_socket()
+            try:
+                self.api = self._create_api(socket, CloseConnectionExceptionHandler(self))
+            except BaseException:
+                socket.close()
+                raise
+            self.socket = socket
             self.connected = True
         return self.api
 
     def disconnect(self):
+        if self.connected:
+            self.api.communicator.forget_timings()
         self.connected = False
         self.socket.close()
         self.socket = api_socket.DummySocket()
 
+    def connection_lost(self):
+        """Disconnect a connection that broke, the next ``get_api()`` counts as a reconnect."""
+        if self.connected:
+            with self.condition:
+                self.lost_connections += 1
+        self.disconnect()
+
     def set_timeout(self, socket_timeout):
         self.socket_timeout = socket_timeout
+        if self.threaded:
+            # Reader threads wait for replies without a timeout, see ThreadedApiCommunicatorBase.read_responses.
+            return
         self.socket.settimeout(socket_timeout)
+        with self.condition:
+            connections = list(self.idle_connections) + list(self.checked_out_connections.values())
+        for connection in connections:
+            connection.socket.settimeout(socket_timeout)
+
+    def acquire(self, timeout=None):
+        """Check out a logged in api which no other thread uses until it is released."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            connection = self._checkout(deadline)
+            if connection is None:
+                connection = self._create_pooled_connection()
+            elif not self._is_healthy(connection):
+                self._discard(connection)
+                continue
+            with self.condition:
+                self.checked_out_connections[connection.api] = connection
+            return connection.api
+
+    def release(self, api):
+        with self.condition:
+            connection = self.checked_out_connections.pop(api)
+            if connection.broken:
+                self.pooled_count -= 1
+                self.lost_connections += 1
+            else:
+                connection.last_used = time.monotonic()
+                self.idle_connections.append(connection)
+            self.condition.notify()
+        if connection.broken:
+            connection.disconnect()
+
+    def close_connection(self, api):
+        """Close a checked out connection, waking up a thread reading from it; ``release()`` drops it."""
+        with self.condition:
+            connection = self.checked_out_connections[api]
+        connection.disconnect()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        api = self.acquire(timeout)
+        try:
+            yield api
+        finally:
+            self.release(api)
+
+    def warm_up(self):
+        """Open and log in connections until the pool holds ``min_size`` of them."""
+        while True:
+            with self.condition:
+                if self.pooled_count >= self.min_size:
+                    return
+                self.pooled_count += 1
+            connection = self._create_pooled_connection()
+            with self.condition:
+                connection.last_used = time.monotonic()
+                self.idle_connections.append(connection)
+                self.condition.notify()
+
+    def close(self):
+        self.disconnect()
+        with self.condition:
+            connections = list(self.idle_connections) + list(self.checked_out_connections.values())
+            self.pooled_count -= len(self.idle_connections)
+            self.idle_connections.clear()
+            for connection in self.checked_out_connections.values():
+                connection.broken = True
+        for connection in connections:
+            connection.disconnect()
+
+    def _checkout(self, deadline):
+        with self.condition:
+            while True:
+                self._evict_idle_connections()
+                if self.idle_connections:
+                    return self.idle_connections.pop()
+                if self.pooled_count < self.max_size:
+                    self.pooled_count += 1
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise exceptions.RouterOsApiPoolTimeoutError(
+                        'No connection to {} available in the pool'.format(self.host))
+                self.condition.wait(remaining)
+
+    def _evict_idle_connections(self):
+        now = time.monotonic()
+        while (self.idle_connections and self.pooled_count > self.min_size and
+               now - self.idle_connections[0].last_used > self.max_idle_time):
+            self.idle_connections.popleft().disconnect()
+            self.pooled_count -= 1
+
+    def _is_healthy(self, connection):
+        if connection.broken:
+            return False
+        if time.monotonic() - connection.last_used < self.health_check_interval:
+            return True
+        try:
+            # Prepared commands are never answered from the response cache.
+            health_check = connection.api.get_binary_resource(self.health_check_path)
+            health_check.prepare('print').call(timeout=self._get_reply_timeout())
+        except exceptions.RouterOsApiError:
+            return False
+        return not connection.broken
+
+    def _discard(self, connection):
+        connection.disconnect()
+        with self.condition:
+            self.pooled_count -= 1
+            self.lost_connections += 1
+            self.condition.notify()
+
+    def _create_pooled_connection(self):
+        try:
+            socket = self._open_socket()
+            connection = PooledConnection(socket)
+            try:
+                connection.api = self._create_api(socket, CloseConnectionExceptionHandler(connection))
+            except BaseException:
+                socket.close()
+                raise
+        except BaseException:
+            with self.condition:
+                self.pooled_count -= 1
+                self.condition.notify()
+            raise
+        return connection
+
+    def _open_socket(self):
+        socket = api_socket.get_socket(
+            self.host, self.port, timeout=self._get_login_timeout(), use_ssl=self.use_ssl,
+            ssl_verify=self.ssl_verify, ssl_verify_hostname=self.ssl_verify_hostname, ssl_context=self.ssl_context,
+            tcp_nodelay=self.tcp_nodelay, connect_timeout=self.connect_timeout)
+        with self.condition:
+            if self.use_ssl:
+                self.tls_handshakes += 1
+                self.tls_resumed_handshakes += socket.session_reused
+            reconnected = self.lost_connections > 0
+            if reconnected:
+                self.lost_connections -= 1
+        instrument = instrumentation.instrument
+        if reconnected and instrument is not None:
+            instrument.reconnected(self.host)
+        return socket
+
+    def _create_api(self, socket, close_handler):
+        base = base_api.Connection(socket, self.host)
+        communicator = api_communicator.ApiCommunicator(base, threaded=self.threaded, cache=self.cache)
+        api = RouterOsApi(communicator)
+        for handler in self._get_exception_handlers(close_handler):
+            communicator.add_exception_handler(handler)
+        api.login(self.username, self.password, self.plaintext_login, timeout=self._get_reply_timeout(login=True))
+        if not self.threaded and self._get_login_timeout() != self.socket_timeout:
+            socket.settimeout(self.socket_timeout)
+        return api
 
-    def _get_exception_handlers(self):
-        yield CloseConnectionExceptionHandler(self)
+    def _get_login_timeout(self):
+        if self.login_timeout is None:
+            return self.socket_timeout
+        else:
+            return self.login_timeout
+
+    def _get_reply_timeout(self, login=False):
+        # Reader threads wait without a socket timeout, their callers need a deadline instead.
+        if not self.threaded:
+            return None
+        return self._get_login_timeout() if login else self.socket_timeout
+
+    def _get_exception_handlers(self, close_handler):
+        yield close_handler
         yield self.communication_exception_parser
 
     def _select_default_port(self, use_ssl):
@@ -76,38 +283,76 @@ class RouterOsApiPool(object):
             return 8728
 
 
+class PooledConnection(object):
+    def __init__(self, socket):
+        self.socket = socket
+        self.api = None
+        self.broken = False
+        self.last_used = time.monotonic()
+
+    def disconnect(self):
+        self.broken = True
+        self.socket.close()
+        if self.api is not None:
+            self.api.communicator.forget_timings()
+
+    def connection_lost(self):
+        # Counted as lost by RouterOsApiPool.release.
+        self.disconnect()
+
+
 class RouterOsApi(object):
     def __init__(self, communicator):
         self.communicator = communicator
 
-    def login(self, login, password, plaintext_login):
+    def login(self, login, password, plaintext_login, timeout=None):
+        """Log in, failing with RouterOsApiTimeoutError if it takes more than ``timeout`` seconds."""
         if isinstance(login, str):
             login = login.encode()
         if isinstance(password, str):
             password = password.encode()
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
         response = None
         if plaintext_login:
-            response = self.get_binary_resource('/').call('login', {'name': login, 'password': password})
+            response = self.get_binary_resource('/').call(
+                'login', {'name': login, 'password': password}, timeout=get_remaining(deadline))
         else:
-            response = self.get_binary_resource('/').call('login')
+            response = self.get_binary_resource('/').call('login', timeout=get_remaining(deadline))
         if 'ret' in response.done_message:
-            token = binascii.unhexlify(response.done_message['ret'])
-            hasher = hashlib.md5()
-            hasher.update(b'\x00')
-            hasher.update(password)
-            hasher.update(token)
-            hashed = b'00' + hasher.hexdigest().encode('ascii')
+            hashed = get_challenge_response(password, response.done_message['ret'])
             self.get_binary_resource('/').call(
-                'login', {'name': login, 'response': hashed})
+                'login', {'name': login, 'response': hashed}, timeout=get_remaining(deadline))
+        instrument = instrumentation.instrument
+        if instrument is not None:
+            instrument.logged_in(self.communicator.base.host, time.monotonic() - started)
 
-    def get_resource(self, path, structure=None):
+    def get_resource(self, path, structure=None, lazy_rows=False):
         if structure is None:
             structure = api_structure.default_structure
-        return resource.RouterOsResource(self.communicator, path, structure)
+        return resource.RouterOsResource(self.communicator, path, structure, lazy_rows)
 
     def get_binary_resource(self, path):
         return resource.RouterOsBinaryResource(self.communicator, path)
 
+    def batch(self, timeout=None, max_in_flight=None):
+        return batch.Batch(self, timeout, max_in_flight)
+
+
+def get_remaining(deadline):
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0)
+
+
+def get_challenge_response(password, challenge):
+    token = binascii.unhexlify(challenge)
+    hasher = hashlib.md5()
+    hasher.update(b'\x00')
+    hasher.update(password)
+    hasher.update(token)
+    return b'00' + hasher.hexdigest().encode('ascii')
+
 
 class CloseConnectionExceptionHandler:
     def __init__(self, pool):
@@ -118,4 +363,4 @@ class CloseConnectionExceptionHandler:
             exception, exceptions.RouterOsApiConnectionError)
         fatal_error = isinstance(exception, exceptions.FatalRouterOsApiError)
         if connection_closed or fatal_error:
-            self.pool.disconnect()
+            self.pool.connection_lost()
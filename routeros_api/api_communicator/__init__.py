@@ -1,16 +1,22 @@
 from routeros_api.api_communicator import async_decorator
 from routeros_api.api_communicator import base
+from routeros_api.api_communicator import caching_decorator
 from routeros_api.api_communicator import encoding_decorator
 from routeros_api.api_communicator import exception_decorator
 from routeros_api.api_communicator import key_cleaner_decorator
+from routeros_api.api_communicator import threaded_base
 
 
 class ApiCommunicator(encoding_decorator.EncodingApiCommunicator):
-    def __init__(self, base_api):
-        communicator = base.ApiCommunicatorBase(base_api)
+    def __init__(self, base_api, threaded=False, cache=None):
+        self.base = base_api
+        if threaded:
+            self.communicator = threaded_base.ThreadedApiCommunicatorBase(base_api)
+        else:
+            self.communicator = base.ApiCommunicatorBase(base_api)
 
         key_cleaner_communicator = (
-            key_cleaner_decorator.KeyCleanerApiCommunicator(communicator))
+            key_cleaner_decorator.KeyCleanerApiCommunicator(self.communicator))
 
         self.exception_aware_communicator = (
             exception_decorator.ExceptionAwareApiCommunicator(
@@ -19,7 +25,17 @@ class ApiCommunicator(encoding_decorator.EncodingApiCommunicator):
         async_communicator = async_decorator.AsyncApiCommunicator(
             self.exception_aware_communicator)
 
+        if cache is not None:
+            async_communicator = caching_decorator.CachingApiCommunicator(async_communicator, cache)
+
         super(ApiCommunicator, self).__init__(async_communicator)
 
     def add_exception_handler(self, exception_handler):
         self.exception_aware_communicator.add_handler(exception_handler)
+
+    def coalescing(self):
+        return self.base.coalescing()
+
+    def forget_timings(self):
+        """Stop measuring the commands still running, the connection is closed."""
+        self.communicator.forget_timings()
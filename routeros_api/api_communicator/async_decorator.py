@@ -1,3 +1,6 @@
+from routeros_api import exceptions
+
+
 class AsyncApiCommunicator(object):
     def __init__(self, inner):
         self.inner = inner
@@ -6,17 +9,58 @@ class AsyncApiCommunicator(object):
         tag = self.inner.send(*args, **kwargs)
         return ResponsePromise(self.inner, tag)
 
+    def prepare(self, *args, **kwargs):
+        return self.inner.prepare(*args, **kwargs)
+
+    def call_prepared(self, prepared):
+        tag = self.inner.send_prepared(prepared)
+        return ResponsePromise(self.inner, tag)
+
 
 class ResponsePromise(object):
     def __init__(self, receiver, tag):
         self.receiver = receiver
         self.tag = tag
         self.response = None
+        self.cancelled = False
 
-    def get(self):
+    def get(self, timeout=None):
+        """Wait for the response; a command not done within ``timeout`` seconds is cancelled."""
         if self.response is None:
-            self.response = self.receiver.receive(self.tag)
+            if self.cancelled:
+                raise exceptions.RouterOsApiCommunicationError('Command was cancelled', b'interrupted')
+            try:
+                self.response = self.receiver.receive(self.tag, timeout)
+            except exceptions.RouterOsApiTimeoutError:
+                self.cancelled = True
+                raise
         return self.response
 
+    def cancel(self):
+        """Stop the command, e.g. a monitor that never finishes. Its remaining replies are discarded."""
+        if not self.cancelled and self.response is None:
+            self.cancelled = True
+            self.receiver.cancel(self.tag)
+
     def __iter__(self):
-        return self.receiver.receive_iterator(self.tag)
+        return self.stream()
+
+    def stream(self, max_buffered=None):
+        """Iterate over rows as they arrive without keeping them in memory.
+
+        At most ``max_buffered`` rows wait for the consumer, older ones are dropped.
+        The command is cancelled when the iteration is stopped early.
+        """
+        return self.cancel_when_closed(self.receiver.receive_iterator(self.tag, max_buffered))
+
+    def cancel_when_closed(self, rows):
+        try:
+            for row in rows:
+                yield row
+        except GeneratorExit:
+            try:
+                self.cancel()
+            except exceptions.RouterOsApiError:
+                # The connection is gone, there is nothing left to cancel.
+                pass
+            raise
@@ -0,0 +1,230 @@
+import asyncio
+
+from routeros_api import exceptions
+from routeros_api import instrumentation
+from routeros_api import sentence
+from routeros_api.api_communicator import base
+from routeros_api.api_communicator import encoding_decorator
+from routeros_api.api_communicator import exception_decorator
+from routeros_api.api_communicator import key_cleaner_decorator
+
+
+class AsyncioApiCommunicator(encoding_decorator.EncodingApiCommunicator):
+    def __init__(self, base_api):
+        self.base = base_api
+        self.communicator = AsyncioApiCommunicatorBase(base_api)
+        key_cleaner_communicator = (
+            key_cleaner_decorator.KeyCleanerApiCommunicator(self.communicator))
+        self.exception_aware_communicator = (
+            exception_decorator.ExceptionAwareApiCommunicator(
+                key_cleaner_communicator))
+        promise_communicator = AsyncioPromiseApiCommunicator(
+            self.exception_aware_communicator, self.communicator)
+        super(AsyncioApiCommunicator, self).__init__(promise_communicator)
+
+    def add_exception_handler(self, exception_handler):
+        self.exception_aware_communicator.add_handler(exception_handler)
+
+    def decorate_promise(self, promise):
+        return promise
+
+    def close(self):
+        self.communicator.close()
+
+
+class AsyncioPromiseApiCommunicator(object):
+    def __init__(self, sender, receiver):
+        self.sender = sender
+        self.receiver = receiver
+
+    def call(self, *args, **kwargs):
+        tag = self.sender.send(*args, **kwargs)
+        return AsyncioResponsePromise(self.receiver, self.sender, tag)
+
+    def prepare(self, *args, **kwargs):
+        return self.sender.prepare(*args, **kwargs)
+
+    def call_prepared(self, prepared):
+        tag = self.sender.send_prepared(prepared)
+        return AsyncioResponsePromise(self.receiver, self.sender, tag)
+
+
+class AsyncioResponsePromise(object):
+    def __init__(self, receiver, exception_handler, tag):
+        self.receiver = receiver
+        self.exception_handler = exception_handler
+        self.tag = tag
+        self.response = None
+        self.cancelled = False
+        self.row_decoder = encoding_decorator.decode_row
+
+    async def get(self, timeout=None):
+        if self.response is None:
+            if self.cancelled:
+                raise exceptions.RouterOsApiCommunicationError('Command was cancelled', b'interrupted')
+            try:
+                response = await self.receiver.receive(self.tag, timeout)
+            except exceptions.RouterOsApiTimeoutError:
+                self.cancelled = True
+                raise
+            except exceptions.RouterOsApiError as e:
+                self.exception_handler.handle_exception(e)
+            self.response = response.map(self.row_decoder)
+        return self.response
+
+    def __await__(self):
+        return self.get().__await__()
+
+    def __aiter__(self):
+        return self.stream()
+
+    async def stream(self, max_buffered=None):
+        try:
+            async for row in self.receiver.receive_iterator(self.tag, max_buffered):
+                yield self.row_decoder(row)
+        except exceptions.RouterOsApiError as e:
+            self.exception_handler.handle_exception(e)
+        except GeneratorExit:
+            try:
+                self.cancel()
+            except exceptions.RouterOsApiError:
+                # The connection is gone, there is nothing left to cancel.
+                pass
+            raise
+
+    def cancel(self):
+        if not self.cancelled and self.response is None:
+            self.cancelled = True
+            try:
+                self.receiver.cancel(self.tag)
+            except exceptions.RouterOsApiError as e:
+                self.exception_handler.handle_exception(e)
+
+    def transform_row(self, row):
+        return self.row_decoder(row)
+
+
+class AsyncioApiCommunicatorBase(base.ApiCommunicatorBase):
+    """Tag multiplexing over an asyncio connection.
+
+    A single reader task parses every reply and wakes the coroutines waiting
+    for its tag, so any number of commands can be awaited concurrently.
+    """
+
+    def __init__(self, base):
+        super(AsyncioApiCommunicatorBase, self).__init__(base)
+        self.events = {}
+        self.reader_task = None
+        self.error = None
+
+    def send(self, *args, **kwargs):
+        if self.error is not None:
+            raise self.error
+        return self._register(super(AsyncioApiCommunicatorBase, self).send(*args, **kwargs))
+
+    def send_prepared(self, prepared):
+        if self.error is not None:
+            raise self.error
+        return self._register(super(AsyncioApiCommunicatorBase, self).send_prepared(prepared))
+
+    def _register(self, tag):
+        self.events[tag] = asyncio.Event()
+        if self.reader_task is None:
+            self.reader_task = asyncio.get_running_loop().create_task(self.read_responses())
+        return tag
+
+    async def receive(self, tag, timeout=None):
+        response = self.response_buffor[tag]
+        try:
+            if timeout is None:
+                await self.wait_until_done(tag, response)
+            else:
+                try:
+                    await asyncio.wait_for(self.wait_until_done(tag, response), timeout)
+                except asyncio.TimeoutError:
+                    self.cancel(tag)
+                    raise exceptions.RouterOsApiTimeoutError('Timed out waiting for a reply')
+        finally:
+            self.clean(tag)
+        if response.error:
+            raise response.error_as_exception
+        else:
+            return response
+
+    async def receive_iterator(self, tag, max_buffered=None):
+        response = self.start_streaming(tag, max_buffered)
+        try:
+            await self.base.drain()
+            while True:
+                while response.rows:
+                    yield response.rows.popleft()
+                if response.done:
+                    break
+                await self.wait_for_change(tag)
+        finally:
+            self.clean(tag)
+        if response.error:
+            raise response.error_as_exception
+
+    async def wait_until_done(self, tag, response):
+        await self.base.drain()
+        while not response.done:
+            await self.wait_for_change(tag)
+
+    async def wait_for_change(self, tag):
+        if self.error is not None:
+            raise self.error
+        event = self.events[tag]
+        event.clear()
+        await event.wait()
+        if self.error is not None:
+            raise self.error
+
+    def abandon(self, tag):
+        event = self.events.pop(tag, None)
+        abandoned = super(AsyncioApiCommunicatorBase, self).abandon(tag)
+        if event is not None:
+            event.set()
+        return abandoned
+
+    def clean(self, tag):
+        self.response_buffor.pop(tag, None)
+        self.events.pop(tag, None)
+
+    async def read_responses(self):
+        try:
+            while True:
+                response = await self.receive_single_response()
+                self.save_response(response)
+                event = self.events.get(response.response.tag)
+                if event is not None:
+                    event.set()
+        except exceptions.RouterOsApiError as e:
+            self.fail(e)
+        except asyncio.CancelledError:
+            self.fail(exceptions.RouterOsApiConnectionClosedError('Connection closed'))
+            raise
+
+    async def receive_single_response(self):
+        serialized = []
+        while not serialized:
+            serialized = await self.base.receive_sentence()
+        instrument = instrumentation.instrument
+        if instrument is not None:
+            instrument.sentence_received(self.base.host, len(serialized))
+        response_sentence = sentence.ResponseSentence.parse(serialized)
+        return base.SingleResponse(response_sentence)
+
+    def fail(self, error):
+        self.error = error
+        self.forget_timings()
+        for event in self.events.values():
+            event.set()
+
+    def close(self):
+        self.forget_timings()
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+        else:
+            self.fail(exceptions.RouterOsApiConnectionClosedError('Connection closed'))
+        self.base.close()
@@ -1,4 +1,10 @@
+import collections
+import contextlib
+import time
+
 from routeros_api import exceptions
+from routeros_api import instrumentation
+from routeros_api import protocol
 from routeros_api import query
 from routeros_api import sentence
 
@@ -8,6 +14,10 @@ class ApiCommunicatorBase(object):
         self.base = base
         self.tag = 0
         self.response_buffor = {}
+        # Tags of cancelled commands, whose remaining replies are discarded until their !done.
+        self.tombstones = set()
+        # CommandTiming by tag of commands sent while an instrument is installed.
+        self.timings = {}
 
     def send(self, path, command, arguments=None, queries=None, additional_queries=()):
         tag = self._get_next_tag()
@@ -29,16 +39,99 @@ class ApiCommunicatorBase(object):
         return command
 
     def send_command(self, command):
-        self.base.send_sentence(command.get_api_format())
+        instrument = instrumentation.instrument
+        if instrument is None:
+            self.base.send_sentence(command.get_api_format())
+            return
+        timing = self.start_timing(instrument, command.tag, command)
+        words = command.get_api_format()
+        with self.forgetting_timings_on_error():
+            self.base.send_sentence(words)
+        self.finish_sending(instrument, timing, len(words))
+
+    def prepare(self, path, command, arguments=None, queries=None, additional_queries=()):
+        command = self.get_command(path, command, arguments, queries, additional_queries=additional_queries)
+        return PreparedCommand(command)
+
+    def send_prepared(self, prepared):
+        tag = self._get_next_tag()
+        self.send_prepared_command(prepared, tag)
+        self.response_buffor[tag] = AsynchronousResponse(command=prepared.command)
+        return tag
+
+    def send_prepared_command(self, prepared, tag):
+        instrument = instrumentation.instrument
+        if instrument is None:
+            self.base.send_encoded_sentence(prepared.sentence.encode(tag))
+            return
+        timing = self.start_timing(instrument, tag, prepared.command)
+        with self.forgetting_timings_on_error():
+            self.base.send_encoded_sentence(prepared.sentence.encode(tag))
+        self.finish_sending(instrument, timing, len(prepared.sentence.words) + 1)
+
+    def start_timing(self, instrument, tag, command):
+        # Registered before sending, a reader thread may get the first reply before send_sentence returns.
+        timing = instrumentation.CommandTiming((command.path + command.command).decode(), time.monotonic())
+        self.timings[tag] = timing
+        instrument.in_flight(self.base.host, 1)
+        return timing
+
+    def finish_sending(self, instrument, timing, words):
+        if timing.sent is None:
+            timing.sent = time.monotonic()
+        instrument.sentence_sent(self.base.host, words)
+
+    @contextlib.contextmanager
+    def forgetting_timings_on_error(self):
+        try:
+            yield
+        except (exceptions.RouterOsApiConnectionError, exceptions.FatalRouterOsApiError):
+            self.forget_timings()
+            raise
+
+    def forget_timings(self):
+        # Commands of a lost connection never finish.
+        timings, self.timings = self.timings, {}
+        instrument = instrumentation.instrument
+        if timings and instrument is not None:
+            instrument.in_flight(self.base.host, -len(timings))
+
+    def record_reply(self, reply):
+        timing = self.timings.get(reply.tag)
+        if timing is None:
+            return
+        now = time.monotonic()
+        if timing.first_reply is None:
+            timing.first_reply = now
+            if timing.sent is None:
+                # Another thread read the reply before send_sentence returned.
+                timing.sent = now
+        if reply.type == b're':
+            timing.rows += 1
+        elif reply.type in (b'trap', b'fatal'):
+            timing.error = reply.attributes.get(b'message', reply.type)
+        if reply.type in (b'done', b'fatal'):
+            del self.timings[reply.tag]
+            timing.finished = now
+            instrument = instrumentation.instrument
+            if instrument is not None:
+                instrument.command_finished(self.base.host, timing)
+                instrument.in_flight(self.base.host, -1)
 
     def _get_next_tag(self):
         self.tag += 1
         return str(self.tag).encode()
 
-    def receive(self, tag):
+    def receive(self, tag, timeout=None):
+        """Wait for the whole response to ``tag``; after ``timeout`` seconds the command is cancelled."""
+        deadline = get_deadline(timeout)
         response_buffor_manager = AsynchronousResponseBufforManager(self, tag)
-        while not response_buffor_manager.done:
-            response_buffor_manager.step_to_finish_response()
+        try:
+            while not response_buffor_manager.done:
+                response_buffor_manager.step_to_finish_response(deadline)
+        except exceptions.RouterOsApiTimeoutError:
+            self.cancel(tag)
+            raise
         response_buffor_manager.clean()
         response = response_buffor_manager.response
         if response.error:
@@ -46,22 +139,84 @@ class ApiCommunicatorBase(object):
         else:
             return response
 
-    def receive_iterator(self, tag):
+    def receive_iterator(self, tag, max_buffered=None):
+        self.start_streaming(tag, max_buffered)
         response_buffor_manager = AsynchronousResponseBufforManager(self, tag)
         return AsynchronousResponseIterator(response_buffor_manager)
 
-    def process_single_response(self):
-        response = self.receive_single_response()
+    def start_streaming(self, tag, max_buffered=None):
+        """Replace the response buffered for ``tag`` by one that drops rows once they are consumed."""
+        response = self.response_buffor[tag]
+        if isinstance(response, StreamingResponse):
+            return response
+        stream = StreamingResponse(response.command, max_buffered)
+        for row in response:
+            stream.append(row)
+        stream.done = response.done
+        stream.done_message = response.done_message
+        stream.error = response.error
+        self.response_buffor[tag] = stream
+        return stream
+
+    def cancel(self, tag):
+        """Stop the command sent with ``tag``, replies still coming for it are discarded."""
+        if self.abandon(tag):
+            self.send_cancel(tag)
+
+    def abandon(self, tag):
+        """Forget ``tag`` and drop its late replies, return whether any are still expected."""
+        response = self.response_buffor.pop(tag, None)
+        if response is None or response.done:
+            return False
+        response.done = True
+        response.error = b'interrupted'
+        self.tombstones.add(tag)
+        return True
+
+    def send_cancel(self, tag):
+        cancel_tag = self._get_next_tag()
+        self.tombstones.add(cancel_tag)
+        self.send_command(self.get_cancel_command(tag, cancel_tag))
+
+    def get_cancel_command(self, tag, cancel_tag):
+        return self.get_command(b'/', b'cancel', {b'tag': tag}, tag=cancel_tag)
+
+    def process_single_response(self, deadline=None):
+        self.save_response(self.receive_single_response(deadline))
+
+    def save_response(self, response):
+        if self.timings:
+            self.record_reply(response.response)
+        tag = response.response.tag
+        if tag in self.tombstones:
+            if response.response.type in (b'done', b'fatal'):
+                self.tombstones.discard(tag)
+            return
         response.save_to_buffor(self.response_buffor)
 
-    def receive_single_response(self):
+    def receive_single_response(self, deadline=None):
         serialized = []
-        while not serialized:
-            serialized = self.base.receive_sentence()
+        with self.forgetting_timings_on_error():
+            while not serialized:
+                if deadline is None:
+                    serialized = self.base.receive_sentence()
+                else:
+                    serialized = self.base.receive_sentence(deadline)
+        instrument = instrumentation.instrument
+        if instrument is not None:
+            instrument.sentence_received(self.base.host, len(serialized))
         response_sentence = sentence.ResponseSentence.parse(serialized)
         return SingleResponse(response_sentence)
 
 
+class PreparedCommand(object):
+    """A command encoded once, see ``RouterOsBinaryResource.prepare``."""
+
+    def __init__(self, command):
+        self.command = command
+        self.sentence = protocol.PreparedSentence(command.get_api_format())
+
+
 class SingleResponse(object):
     def __init__(self, response_sentence):
         self.response = response_sentence
@@ -90,29 +245,21 @@ class SingleResponse(object):
 class AsynchronousResponseIterator:
     def __init__(self, response_buffor_manager):
         self.response_buffor_manager = response_buffor_manager
-        self.index = 0
 
     def __iter__(self):
         return self
 
     def __next__(self):
         response = self.response_buffor_manager.response
-        while self.end_of_buffered and not self.response_buffor_manager.done:
+        while not response.rows and not self.response_buffor_manager.done:
             self.response_buffor_manager.step_to_finish_response()
-        if self.end_of_buffered and response.error:
-            self.response_buffor_manager.clean()
+        if response.rows:
+            return response.rows.popleft()
+        self.response_buffor_manager.clean()
+        if response.error:
             raise response.error_as_exception
-        elif self.end_of_buffered:
-            self.response_buffor_manager.clean()
-            raise StopIteration
         else:
-            current = response[self.index]
-            self.index += 1
-            return current
-
-    @property
-    def end_of_buffered(self):
-        return self.index >= len(self.response_buffor_manager.response)
+            raise StopIteration
 
 
 class AsynchronousResponseBufforManager(object):
@@ -121,8 +268,8 @@ class AsynchronousResponseBufforManager(object):
         self.tag = tag
         self.response = self.receiver.response_buffor[self.tag]
 
-    def step_to_finish_response(self):
-        self.receiver.process_single_response()
+    def step_to_finish_response(self, deadline=None):
+        self.receiver.process_single_response(deadline)
 
     @property
     def done(self):
@@ -157,3 +304,32 @@ class AsynchronousResponse(list):
         result.done = self.done
         result.error = self.error
         return result
+
+
+class StreamingResponse(object):
+    """Rows of a response that are handed out once and then forgotten.
+
+    With ``max_buffered`` set, the oldest rows are dropped (and counted in
+    ``dropped``) when the consumer falls behind.
+    """
+
+    def __init__(self, command, max_buffered=None):
+        self.command = command
+        self.rows = collections.deque(maxlen=max_buffered)
+        self.done_message = {}
+        self.done = False
+        self.error = None
+        self.dropped = 0
+
+    def append(self, row):
+        if len(self.rows) == self.rows.maxlen:
+            self.dropped += 1
+        self.rows.append(row)
+
+    error_as_exception = AsynchronousResponse.error_as_exception
+
+
+def get_deadline(timeout):
+    if timeout is None:
+        return None
+    return time.monotonic() + timeout
@@ -0,0 +1,197 @@
+import collections
+import threading
+import time
+
+
+class CachingApiCommunicator(object):
+    """Answers ``print`` commands from a :class:`ResponseCache` and invalidates it on writes."""
+
+    def __init__(self, inner, cache):
+        self.inner = inner
+        self.cache = cache
+
+    def call(self, path, command, arguments=None, queries=None, additional_queries=()):
+        key = self.cache.get_key(path, command, arguments, queries, additional_queries)
+        if key is None:
+            self.cache.invalidate_after(path, command)
+            return self.inner.call(path, command, arguments, queries, additional_queries)
+        response = self.cache.get(key)
+        if response is not None:
+            return CachedResponsePromise(response)
+        generation = self.cache.generation
+        promise = self.inner.call(path, command, arguments, queries, additional_queries)
+        return CachingResponsePromise(promise, self.cache, key, generation)
+
+    def prepare(self, *args, **kwargs):
+        return self.inner.prepare(*args, **kwargs)
+
+    def call_prepared(self, prepared):
+        self.cache.invalidate_after(prepared.command.path, prepared.command.command)
+        return self.inner.call_prepared(prepared)
+
+
+class CachingResponsePromise(object):
+    """Stores the response in the cache once it is received with ``get()``."""
+
+    def __init__(self, inner, cache, key, generation):
+        self.inner = inner
+        self.cache = cache
+        self.key = key
+        self.generation = generation
+
+    def get(self, timeout=None):
+        response = self.inner.get(timeout)
+        self.cache.put(self.key, response, self.generation)
+        return response
+
+    def __iter__(self):
+        return iter(self.inner)
+
+    def stream(self, max_buffered=None):
+        return self.inner.stream(max_buffered)
+
+    def cancel(self):
+        self.inner.cancel()
+
+
+class CachedResponsePromise(object):
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, timeout=None):
+        return self.response
+
+    def __iter__(self):
+        return iter(self.response)
+
+    def stream(self, max_buffered=None):
+        return iter(self.response)
+
+    def cancel(self):
+        pass
+
+
+class ResponseCache(object):
+    """LRU cache of ``print`` responses, each kept for the TTL of its path.
+
+    ``ttls`` maps paths to their TTL in seconds, other paths use ``ttl``; a
+    TTL of 0 disables caching of the path. The cache holds at most
+    ``max_entries`` responses and, when ``max_bytes`` is set, about that many
+    bytes of received words. Writes to a menu made through a communicator
+    using the cache drop the responses of that menu and of its submenus.
+    """
+
+    cached_commands = (b'print',)
+    invalidating_commands = (
+        b'add', b'set', b'remove', b'unset', b'enable', b'disable', b'move', b'comment', b'reset-counters',
+    )
+    # Responses to these never end or are repeated, they are not cached.
+    streaming_arguments = (b'follow', b'follow-only', b'interval')
+
+    def __init__(self, ttl=10.0, ttls=None, max_entries=1024, max_bytes=None):
+        self.ttl = ttl
+        self.ttls = dict((clean_path(path), path_ttl) for path, path_ttl in (ttls or {}).items())
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_key(self, path, command, arguments=None, queries=None, additional_queries=()):
+        """Return the key of a cacheable command, None for any other one."""
+        arguments = arguments or {}
+        if command not in self.cached_commands or not self.get_ttl(path):
+            return None
+        if any(argument in arguments for argument in self.streaming_arguments):
+            return None
+        return (
+            path,
+            command,
+            tuple(sorted(arguments.items())),
+            tuple(sorted((queries or {}).items())),
+            tuple(tuple(additional_query.get_api_format()) for additional_query in additional_queries),
+        )
+
+    def get_ttl(self, path):
+        return self.ttls.get(path, self.ttl)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self.remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.response
+
+    def put(self, key, response, generation):
+        """Store ``response`` unless the cache was invalidated since ``generation``."""
+        entry = CacheEntry(response, time.monotonic() + self.get_ttl(key[0]), get_size(response))
+        if self.max_bytes is not None and entry.size > self.max_bytes:
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = entry
+            self.size += entry.size
+            while len(self.entries) > self.max_entries or (self.max_bytes is not None and self.size > self.max_bytes):
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        self.size -= self.entries.pop(key).size
+
+    def invalidate_after(self, path, command):
+        if command in self.invalidating_commands:
+            self.invalidate(path)
+
+    def invalidate(self, path=None):
+        """Drop cached responses of ``path`` and its submenus, or all of them."""
+        with self.lock:
+            # Responses of commands sent before this point may be stale, they are not stored.
+            self.generation += 1
+            for key in list(self.entries):
+                if path is None or key[0].startswith(path):
+                    self.remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return '{}(entries={}, hits={}, misses={})'.format(type(self).__name__, len(self), self.hits, self.misses)
+
+
+class CacheEntry(object):
+    __slots__ = ('response', 'expires', 'size')
+
+    def __init__(self, response, expires, size):
+        self.response = response
+        self.expires = expires
+        self.size = size
+
+
+def get_size(response):
+    size = 0
+    for row in response:
+        for key, value in row.items():
+            size += len(key) + len(value or b'')
+    return size
+
+
+def clean_path(path):
+    return ('/' + path.strip('/') + '/').replace('//', '/').encode()
@@ -1,5 +1,7 @@
 import logging
 
+from routeros_api.api_communicator import key_cleaner_decorator
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,6 +18,14 @@ class EncodingApiCommunicator(object):
             path, command, arguments, queries, additional_queries)
         return self.decorate_promise(promise)
 
+    def prepare(self, path, command, arguments=None, queries=None, additional_queries=()):
+        return self.inner.prepare(
+            path.encode(), command.encode(), self.transform_dictionary(arguments or {}),
+            self.transform_dictionary(queries or {}), additional_queries)
+
+    def call_prepared(self, prepared):
+        return self.decorate_promise(self.inner.call_prepared(prepared))
+
     def transform_dictionary(self, dictionary):
         return dict(self.transform_item(item) for item in dictionary.items())
 
@@ -33,19 +43,32 @@ class EncodingApiCommunicator(object):
 
 
 class EncodedPromiseDecorator(object):
-    def __init__(self, inner):
+    """Turns raw rows into dicts with str keys.
+
+    ``row_decoder`` replaces the default key decoding, which lets resources
+    build their final rows in a single pass.
+    """
+
+    def __init__(self, inner, row_decoder=None):
         self.inner = inner
+        self.row_decoder = row_decoder or decode_row
 
-    def get(self):
-        response = self.inner.get()
-        return response.map(self.transform_row)
+    def get(self, timeout=None):
+        response = self.inner.get(timeout)
+        return response.map(self.row_decoder)
 
     def __iter__(self):
-        return map(self.transform_row, self.inner)
+        return map(self.row_decoder, self.inner)
+
+    def stream(self, max_buffered=None):
+        return map(self.row_decoder, self.inner.stream(max_buffered))
+
+    def cancel(self):
+        self.inner.cancel()
 
     def transform_row(self, row):
-        return dict(self.transform_item(item) for item in row.items())
+        return self.row_decoder(row)
 
-    def transform_item(self, item):
-        key, value = item
-        return (key.decode(), value)
+
+def decode_row(row):
+    return dict((key_cleaner_decorator.decode_key(key).decode(), value) for key, value in row.items())
@@ -12,19 +12,34 @@ class ExceptionAwareApiCommunicator(object):
         except exceptions.RouterOsApiError as e:
             self.handle_exception(e)
 
-    def receive(self, tag):
+    def prepare(self, *args, **kwargs):
+        return self.inner.prepare(*args, **kwargs)
+
+    def send_prepared(self, prepared):
+        try:
+            return self.inner.send_prepared(prepared)
+        except exceptions.RouterOsApiError as e:
+            self.handle_exception(e)
+
+    def receive(self, tag, timeout=None):
         try:
-            return self.inner.receive(tag)
+            return self.inner.receive(tag, timeout)
         except exceptions.RouterOsApiError as e:
             self.handle_exception(e)
 
-    def receive_iterator(self, tag):
+    def receive_iterator(self, tag, max_buffered=None):
         try:
-            for line in self.inner.receive_iterator(tag):
+            for line in self.inner.receive_iterator(tag, max_buffered):
                 yield line
         except exceptions.RouterOsApiError as e:
             self.handle_exception(e)
 
+    def cancel(self, tag):
+        try:
+            return self.inner.cancel(tag)
+        except exceptions.RouterOsApiError as e:
+            self.handle_exception(e)
+
     def add_handler(self, handler):
         self.exception_handlers.append(handler)
 
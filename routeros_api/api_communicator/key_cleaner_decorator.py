@@ -10,13 +10,23 @@ class KeyCleanerApiCommunicator(object):
             path, command, arguments=encoded_arguments,
             queries=encoded_queries, additional_queries=additional_queries)
 
-    def receive(self, tag):
-        answers = self.inner.receive(tag)
-        return answers.map(decode_dictionary)
+    def prepare(self, path, command, arguments=None, queries=None, additional_queries=()):
+        return self.inner.prepare(
+            path, command, arguments=encode_dictionary(arguments or {}),
+            queries=encode_dictionary(queries or {}), additional_queries=additional_queries)
 
-    def receive_iterator(self, tag):
-        answers = self.inner.receive_iterator(tag)
-        return map(decode_dictionary, answers)
+    def send_prepared(self, prepared):
+        return self.inner.send_prepared(prepared)
+
+    def receive(self, tag, timeout=None):
+        # Keys of received rows are cleaned while decoding them, see encoding_decorator.decode_row.
+        return self.inner.receive(tag, timeout)
+
+    def receive_iterator(self, tag, max_buffered=None):
+        return self.inner.receive_iterator(tag, max_buffered)
+
+    def cancel(self, tag):
+        return self.inner.cancel(tag)
 
 
 def encode_dictionary(dictionary):
@@ -0,0 +1,157 @@
+import threading
+import time
+
+from routeros_api import exceptions
+from routeros_api.api_communicator import base
+
+
+class ThreadedApiCommunicatorBase(base.ApiCommunicatorBase):
+    """Tag multiplexing for a connection shared by many threads.
+
+    A dedicated reader thread receives every reply and wakes up the threads
+    waiting for its tag. Callers never read from the socket themselves, so
+    any number of them can wait on the same connection at once.
+    """
+
+    def __init__(self, base):
+        super(ThreadedApiCommunicatorBase, self).__init__(base)
+        self.lock = threading.Lock()
+        self.conditions = {}
+        self.error = None
+        self.reader = None
+
+    def send(self, path, command, arguments=None, queries=None, additional_queries=()):
+        with self.lock:
+            tag = self._get_next_tag()
+            command = self.get_command(
+                path, command, arguments, queries, tag=tag, additional_queries=additional_queries)
+            self._register(tag, command)
+        self._send_registered(tag, self.send_command, command)
+        return tag
+
+    def send_prepared(self, prepared):
+        with self.lock:
+            tag = self._get_next_tag()
+            self._register(tag, prepared.command)
+        self._send_registered(tag, self.send_prepared_command, prepared, tag)
+        return tag
+
+    def _register(self, tag, command):
+        if self.error is not None:
+            raise self.error
+        # Registered before sending, the reader thread may get the reply before the command is sent.
+        self.response_buffor[tag] = base.AsynchronousResponse(command=command)
+        self.conditions[tag] = threading.Condition(self.lock)
+        self._start_reader()
+
+    def _send_registered(self, tag, send, *args):
+        try:
+            send(*args)
+        except exceptions.RouterOsApiError:
+            with self.lock:
+                self._clean(tag)
+            raise
+
+    def receive(self, tag, timeout=None):
+        self.base.flush()
+        deadline = base.get_deadline(timeout)
+        timed_out = False
+        with self.lock:
+            response = self.response_buffor[tag]
+            condition = self.conditions[tag]
+            try:
+                while not response.done:
+                    if not self._wait(condition, deadline):
+                        timed_out = self._abandon(tag)
+                        break
+            finally:
+                self._clean(tag)
+        if timed_out:
+            self.send_cancel(tag)
+            raise exceptions.RouterOsApiTimeoutError('Timed out waiting for a reply')
+        if response.error:
+            raise response.error_as_exception
+        else:
+            return response
+
+    def receive_iterator(self, tag, max_buffered=None):
+        self.base.flush()
+        with self.lock:
+            response = self.start_streaming(tag, max_buffered)
+            condition = self.conditions[tag]
+        try:
+            while True:
+                with self.lock:
+                    while not response.rows and not response.done:
+                        self._wait(condition)
+                    if not response.rows:
+                        break
+                    row = response.rows.popleft()
+                yield row
+        finally:
+            with self.lock:
+                self._clean(tag)
+        if response.error:
+            raise response.error_as_exception
+
+    def abandon(self, tag):
+        with self.lock:
+            return self._abandon(tag)
+
+    def _abandon(self, tag):
+        condition = self.conditions.pop(tag, None)
+        abandoned = super(ThreadedApiCommunicatorBase, self).abandon(tag)
+        if condition is not None:
+            condition.notify_all()
+        return abandoned
+
+    def send_cancel(self, tag):
+        with self.lock:
+            cancel_tag = self._get_next_tag()
+            self.tombstones.add(cancel_tag)
+        self.send_command(self.get_cancel_command(tag, cancel_tag))
+
+    def _wait(self, condition, deadline=None):
+        """Wait for a reply, return False once ``deadline`` has passed."""
+        if self.error is not None:
+            raise self.error
+        if deadline is None:
+            condition.wait()
+        elif not condition.wait(max(deadline - time.monotonic(), 0)):
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+    def _clean(self, tag):
+        self.response_buffor.pop(tag, None)
+        self.conditions.pop(tag, None)
+
+    def _start_reader(self):
+        if self.reader is None:
+            self.reader = threading.Thread(target=self.read_responses, name='routeros-api-reader')
+            self.reader.daemon = True
+            self.reader.start()
+
+    def read_responses(self):
+        # Waiting callers have no deadline here, dead peers are detected by TCP keepalive.
+        self.base.socket.settimeout(None)
+        try:
+            while True:
+                response = self.receive_single_response()
+                with self.lock:
+                    self.save_response(response)
+                    condition = self.conditions.get(response.response.tag)
+                    if condition is not None:
+                        condition.notify_all()
+        except exceptions.RouterOsApiError as e:
+            self.fail(e)
+        except Exception as e:
+            self.fail(exceptions.RouterOsApiConnectionError(str(e)))
+            raise
+
+    def fail(self, error):
+        with self.lock:
+            self.error = error
+            for condition in self.conditions.values():
+                condition.notify_all()
@@ -1,7 +1,14 @@
+import collections
+import itertools
+import os
+import selectors
 import socket
 import ssl
+import threading
+import time
 
 from routeros_api import exceptions
+from routeros_api import instrumentation
 
 try:
     import errno
@@ -9,31 +16,240 @@ except ImportError:
     errno = None
 
 EINTR = getattr(errno, 'EINTR', 4)
+# Errors of a non-blocking connect() still in progress.
+CONNECT_IN_PROGRESS = tuple(
+    getattr(errno, name) for name in ('EINPROGRESS', 'EWOULDBLOCK', 'EAGAIN', 'WSAEWOULDBLOCK') if hasattr(errno, name))
+
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
 
 
 def get_socket(hostname, port, use_ssl=False, ssl_verify=True, ssl_verify_hostname=True, ssl_context=None,
-               timeout=15.0):
+               timeout=15.0, tcp_nodelay=False, connect_timeout=None):
+    if connect_timeout is None:
+        connect_timeout = timeout
+    started = time.monotonic()
     while True:
         try:
-            api_socket = socket.create_connection((hostname, port), timeout=timeout)
+            api_socket = create_connection(resolver.resolve(hostname, port), timeout=connect_timeout)
         except socket.error as e:
             if e.args[0] != EINTR:
+                report_connect_failure(hostname, e)
                 raise exceptions.RouterOsApiConnectionError(e)
         else:
             break
+    connected = time.monotonic()
     set_keepalive(api_socket, after_idle_sec=10)
+    if tcp_nodelay:
+        api_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    ssl_context = get_ssl_context(use_ssl, ssl_verify, ssl_verify_hostname, ssl_context)
+    if ssl_context is not None:
+        session_key = (hostname, port)
+        try:
+            api_socket = ssl_context.wrap_socket(
+                api_socket, server_hostname=hostname, session=ssl_sessions.get(session_key, ssl_context))
+        except BaseException as e:
+            api_socket.close()
+            report_connect_failure(hostname, e)
+            raise
+    handshaken = time.monotonic()
+    if connect_timeout != timeout:
+        api_socket.settimeout(timeout)
+    wrapper = SocketWrapper(api_socket)
+    if ssl_context is not None:
+        wrapper.session_key = session_key
+        wrapper.save_session()
+    instrument = instrumentation.instrument
+    if instrument is not None:
+        if ssl_context is None:
+            instrument.connected(hostname, connected - started, None, None)
+        else:
+            instrument.connected(hostname, connected - started, handshaken - connected, wrapper.session_reused)
+    return wrapper
+
+
+def report_connect_failure(hostname, error):
+    instrument = instrumentation.instrument
+    if instrument is not None:
+        instrument.connect_failed(hostname, error)
+
+
+def create_connection(addresses, timeout=None, attempt_delay=0.25):
+    """Connect to the first of ``addresses`` that answers, "happy eyeballs" style (RFC 8305).
+
+    Address families are interleaved and a new attempt is started every
+    ``attempt_delay`` seconds, or as soon as one fails, without waiting for
+    the earlier ones, so a dead IPv6 route does not delay IPv4. ``timeout``
+    limits the whole connection, the returned socket gets it as its timeout.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pending = collections.deque(interleave_families(addresses))
+    selector = selectors.DefaultSelector()
+    error = None
+    next_attempt = time.monotonic()
+    try:
+        while pending or selector.get_map():
+            now = time.monotonic()
+            if pending and (not selector.get_map() or now >= next_attempt):
+                family, type, proto, _, address = pending.popleft()
+                attempt = None
+                try:
+                    attempt = socket.socket(family, type, proto)
+                    attempt.setblocking(False)
+                    result = attempt.connect_ex(address)
+                except socket.error as e:
+                    # E.g. an address family the host has disabled, the other addresses may still work.
+                    if attempt is not None:
+                        attempt.close()
+                    error = e
+                    continue
+                if result == 0:
+                    return connected(attempt, timeout)
+                if result not in CONNECT_IN_PROGRESS:
+                    attempt.close()
+                    error = socket.error(result, os.strerror(result))
+                    continue
+                selector.register(attempt, selectors.EVENT_WRITE)
+                next_attempt = now + attempt_delay
+            wait = None if deadline is None else deadline - now
+            if wait is not None and wait <= 0:
+                raise socket.timeout('timed out')
+            if pending:
+                wait = next_attempt - now if wait is None else min(wait, next_attempt - now)
+            for key, _ in selector.select(None if wait is None else max(wait, 0)):
+                attempt = key.fileobj
+                selector.unregister(attempt)
+                result = attempt.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if result == 0:
+                    return connected(attempt, timeout)
+                attempt.close()
+                error = socket.error(result, os.strerror(result))
+                next_attempt = time.monotonic()
+        raise error or socket.error('No address to connect to')
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+
+def connected(attempt, timeout):
+    attempt.settimeout(timeout)
+    return attempt
+
+
+def interleave_families(addresses):
+    """Alternate address families, keeping the resolver's order within each of them."""
+    families = collections.OrderedDict()
+    for address in addresses:
+        families.setdefault(address[0], []).append(address)
+    return [address for addresses in itertools.zip_longest(*families.values()) for address in addresses
+            if address is not None]
+
+
+class Resolver(object):
+    """``getaddrinfo`` results cached for ``ttl`` seconds, 0 disables the cache.
+
+    Reconnecting to a host then does not wait for DNS again. Failed lookups
+    are not cached.
+    """
+
+    def __init__(self, ttl=300.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def resolve(self, hostname, port):
+        key = (hostname, port)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        addresses = socket.getaddrinfo(hostname, port, 0, socket.SOCK_STREAM)
+        if self.ttl:
+            with self.lock:
+                self.entries.pop(key, None)
+                self.entries[key] = (time.monotonic() + self.ttl, addresses)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return addresses
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+resolver = Resolver()
+
+
+# Contexts created from the same options are shared, which loads the CA certificates only once.
+ssl_contexts = {}
+ssl_contexts_lock = threading.Lock()
+
+
+def get_ssl_context(use_ssl=False, ssl_verify=True, ssl_verify_hostname=True, ssl_context=None):
     # A provided ssl_context overrides any options
     if ssl_context is None and use_ssl:
-        ssl_context = ssl.create_default_context()
-        if ssl_verify:
-            ssl_context.check_hostname = ssl_verify_hostname
-            ssl_context.verify_mode = ssl.CERT_REQUIRED
-        else:
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-    if ssl_context is not None:
-        api_socket = ssl_context.wrap_socket(api_socket, server_hostname=hostname)
-    return SocketWrapper(api_socket)
+        key = (bool(ssl_verify), bool(ssl_verify and ssl_verify_hostname))
+        with ssl_contexts_lock:
+            ssl_context = ssl_contexts.get(key)
+            if ssl_context is None:
+                ssl_context = ssl_contexts[key] = create_ssl_context(ssl_verify, ssl_verify_hostname)
+    return ssl_context
+
+
+def create_ssl_context(ssl_verify=True, ssl_verify_hostname=True):
+    ssl_context = ssl.create_default_context()
+    if ssl_verify:
+        ssl_context.check_hostname = ssl_verify_hostname
+        ssl_context.verify_mode = ssl.CERT_REQUIRED
+    else:
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+    return ssl_context
+
+
+class SessionCache(object):
+    """TLS sessions by ``(hostname, port)``, offered again on reconnect to skip the full handshake.
+
+    A session is only offered to a socket of the SSL context it was created
+    by. Expired sessions are not offered and at most ``max_entries`` hosts are
+    remembered, the least recently connected ones are forgotten first.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.sessions = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, ssl_context):
+        with self.lock:
+            entry = self.sessions.get(key)
+        if entry is None:
+            return None
+        entry_context, session = entry
+        if entry_context is not ssl_context or session.time + session.timeout <= time.time():
+            return None
+        return session
+
+    def put(self, key, ssl_context, session):
+        with self.lock:
+            self.sessions.pop(key, None)
+            self.sessions[key] = (ssl_context, session)
+            while len(self.sessions) > self.max_entries:
+                self.sessions.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.sessions.clear()
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+ssl_sessions = SessionCache()
 
 
 # http://stackoverflow.com/a/14855726
@@ -63,30 +279,85 @@ class DummySocket(object):
 
 
 class SocketWrapper(object):
+    # Key of the TLS session of the socket in ssl_sessions, None for sockets not opened by get_socket().
+    session_key = None
+
     def __init__(self, socket):
         self.socket = socket
+        self.selector = None
+        # Whether the TLS handshake resumed an earlier session instead of doing a full one.
+        self.session_reused = isinstance(socket, ssl.SSLSocket) and bool(socket.session_reused)
 
     def send(self, bytes):
         return self.socket.sendall(bytes)
 
+    def send_many(self, buffers):
+        # SSL sockets do not support scatter/gather writes.
+        if isinstance(self.socket, ssl.SSLSocket) or not hasattr(self.socket, 'sendmsg'):
+            return self.socket.sendall(b''.join(buffers))
+        pending = collections.deque(memoryview(buffer) for buffer in buffers if buffer)
+        while pending:
+            sent = self.socket.sendmsg(list(itertools.islice(pending, IOV_MAX)))
+            while sent:
+                if sent >= len(pending[0]):
+                    sent -= len(pending.popleft())
+                else:
+                    pending[0] = pending[0][sent:]
+                    sent = 0
+
     def receive(self, length):
+        buffer = bytearray(length)
+        del buffer[self._receive_retrying(buffer):]
+        return bytes(buffer)
+
+    def receive_into(self, buffer):
+        """Receive into ``buffer`` like ``socket.recv_into``."""
+        return self._receive_retrying(buffer)
+
+    def wait_readable(self, timeout):
+        """Wait until ``receive`` would not block, return False on timeout."""
+        # Decrypted data buffered by an SSL socket does not make it selectable.
+        if isinstance(self.socket, ssl.SSLSocket) and self.socket.pending():
+            return True
+        if self.selector is None:
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.socket, selectors.EVENT_READ)
+        return bool(self.selector.select(timeout))
+
+    def _receive_retrying(self, buffer):
         while True:
             try:
-                return self._receive_and_check_connection(length)
+                return self._receive_and_check_connection(buffer)
             except socket.error as e:
                 if e.args[0] == EINTR:
                     continue
                 else:
                     raise
 
-    def _receive_and_check_connection(self, length):
-        bytes = self.socket.recv(length)
-        if bytes:
-            return bytes
+    def _receive_and_check_connection(self, buffer):
+        length = self.socket.recv_into(buffer)
+        if length:
+            return length
         else:
             raise exceptions.RouterOsApiConnectionClosedError
 
+    def save_session(self):
+        # With TLS 1.3 the session ticket arrives after the handshake, so the session is saved again on close.
+        if self.session_key is None:
+            return
+        session = self.socket.session
+        if session is not None:
+            ssl_sessions.put(self.session_key, self.socket.context, session)
+
     def close(self):
+        if self.selector is not None:
+            self.selector.close()
+        self.save_session()
+        # Shutting down first wakes up a thread blocked reading from the socket.
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         return self.socket.close()
 
     def settimeout(self, timeout):
@@ -0,0 +1,278 @@
+import asyncio
+import collections
+import time
+
+from routeros_api import api
+from routeros_api import api_socket
+from routeros_api import api_structure
+from routeros_api import base_api
+from routeros_api import communication_exception_parsers
+from routeros_api import exceptions
+from routeros_api import instrumentation
+from routeros_api import resource
+from routeros_api.api_communicator import asyncio_communicator
+
+
+async def connect(host, username='admin', password='', port=None, plaintext_login=False, use_ssl=False,
+                  ssl_verify=True, ssl_verify_hostname=True, ssl_context=None):
+    return await AsyncRouterOsApiPool(
+        host, username, password, port, plaintext_login, use_ssl, ssl_verify, ssl_verify_hostname, ssl_context,
+    ).get_api()
+
+
+class AsyncRouterOsApiPool(object):
+    socket_timeout = 15.0
+    connect_timeout = None
+    login_timeout = None
+    # Delay before trying the next address of the host, see api_socket.create_connection.
+    happy_eyeballs_delay = 0.25
+
+    def __init__(self, host, username='admin', password='', port=None, plaintext_login=False, use_ssl=False,
+                 ssl_verify=True, ssl_verify_hostname=True, ssl_context=None):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.plaintext_login = plaintext_login
+        self.ssl_context = ssl_context
+        if ssl_context is not None:
+            self.use_ssl = True
+        else:
+            self.use_ssl = use_ssl
+        self.ssl_verify = ssl_verify
+        self.ssl_verify_hostname = ssl_verify_hostname
+
+        self.port = port or (8729 if self.use_ssl else 8728)
+
+        self.connected = False
+        self.communicator = None
+        # Created on first use, it has to belong to the running event loop.
+        self.connect_lock = None
+        self.communication_exception_parser = (
+            communication_exception_parsers.ExceptionHandler())
+
+    async def get_api(self):
+        """Return the logged in api, connecting first; concurrent callers share one connection."""
+        if not self.connected:
+            if self.connect_lock is None:
+                self.connect_lock = asyncio.Lock()
+            async with self.connect_lock:
+                if not self.connected:
+                    await self._connect()
+        return self.api
+
+    async def _connect(self):
+        reader, writer = await self._open_connection()
+        base = base_api.AsyncConnection(reader, writer, self.host)
+        self.communicator = asyncio_communicator.AsyncioApiCommunicator(base)
+        routeros_api = AsyncRouterOsApi(self.communicator)
+        for handler in self._get_exception_handlers():
+            self.communicator.add_exception_handler(handler)
+        try:
+            await asyncio.wait_for(
+                routeros_api.login(self.username, self.password, self.plaintext_login),
+                self._get_timeout(self.login_timeout))
+        except asyncio.TimeoutError as e:
+            self.disconnect()
+            raise exceptions.RouterOsApiConnectionError(e)
+        except BaseException:
+            self.disconnect()
+            raise
+        self.api = routeros_api
+        self.connected = True
+
+    async def _open_connection(self):
+        ssl_context = api_socket.get_ssl_context(
+            self.use_ssl, self.ssl_verify, self.ssl_verify_hostname, self.ssl_context)
+        started = time.monotonic()
+        try:
+            connection = await asyncio.wait_for(
+                asyncio.open_connection(
+                    self.host, self.port, ssl=ssl_context, server_hostname=self.host if ssl_context else None,
+                    happy_eyeballs_delay=self.happy_eyeballs_delay, interleave=1),
+                self._get_timeout(self.connect_timeout))
+        except (OSError, asyncio.TimeoutError) as e:
+            api_socket.report_connect_failure(self.host, e)
+            raise exceptions.RouterOsApiConnectionError(e)
+        instrument = instrumentation.instrument
+        if instrument is not None:
+            # The TLS handshake is not reported apart, its time is included in the connection time.
+            instrument.connected(self.host, time.monotonic() - started, None, None)
+        return connection
+
+    def disconnect(self):
+        self.connected = False
+        if self.communicator is not None:
+            self.communicator.close()
+            self.communicator = None
+
+    def connection_lost(self):
+        # Called by api.CloseConnectionExceptionHandler, reconnects are not counted for asyncio pools.
+        self.disconnect()
+
+    def set_timeout(self, socket_timeout):
+        self.socket_timeout = socket_timeout
+
+    def _get_timeout(self, timeout):
+        if timeout is None:
+            return self.socket_timeout
+        else:
+            return timeout
+
+    def _get_exception_handlers(self):
+        yield api.CloseConnectionExceptionHandler(self)
+        yield self.communication_exception_parser
+
+    async def __aenter__(self):
+        return await self.get_api()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
+
+
+class AsyncRouterOsApi(object):
+    def __init__(self, communicator):
+        self.communicator = communicator
+
+    async def login(self, login, password, plaintext_login):
+        if isinstance(login, str):
+            login = login.encode()
+        if isinstance(password, str):
+            password = password.encode()
+        started = time.monotonic()
+        if plaintext_login:
+            response = await self.get_binary_resource('/').call('login', {'name': login, 'password': password})
+        else:
+            response = await self.get_binary_resource('/').call('login')
+        if 'ret' in response.done_message:
+            hashed = api.get_challenge_response(password, response.done_message['ret'])
+            await self.get_binary_resource('/').call(
+                'login', {'name': login, 'response': hashed})
+        instrument = instrumentation.instrument
+        if instrument is not None:
+            instrument.logged_in(self.communicator.base.host, time.monotonic() - started)
+
+    def get_resource(self, path, structure=None, lazy_rows=False):
+        if structure is None:
+            structure = api_structure.default_structure
+        return AsyncRouterOsResource(self.communicator, path, structure, lazy_rows)
+
+    def get_binary_resource(self, path):
+        return AsyncRouterOsBinaryResource(self.communicator, path)
+
+
+class AsyncRouterOsBinaryResource(resource.RouterOsBinaryResource):
+    async def call(self, command, arguments=None, queries=None, additional_queries=(), timeout=None):
+        return await self.call_async(
+            command, arguments=arguments, queries=queries, additional_queries=additional_queries,
+        ).get(timeout)
+
+    async def call_prepared(self, prepared, timeout=None):
+        return await self.call_prepared_async(prepared).get(timeout)
+
+    async def call_many(self, command, arguments, max_in_flight=None):
+        return await call_many(self, command, arguments, max_in_flight)
+
+
+class AsyncRouterOsResource(resource.RouterOsResource):
+    async def call(self, command, arguments=None, queries=None, additional_queries=(), timeout=None):
+        return await self.call_async(
+            command, arguments=arguments, queries=queries, additional_queries=additional_queries,
+        ).get(timeout)
+
+    async def call_prepared(self, prepared, timeout=None):
+        return await self.call_prepared_async(prepared).get(timeout)
+
+    async def call_many(self, command, arguments, max_in_flight=None):
+        return await call_many(self, command, arguments, max_in_flight)
+
+    async def get(self, columns=None, reply_timeout=None, **kwargs):
+        if columns is not None:
+            return await self.select(*columns).get(reply_timeout=reply_timeout, **kwargs)
+        response = await self.call('print', {}, kwargs, timeout=reply_timeout)
+        self.check_selected_columns(response)
+        return response
+
+    async def get_columns(self, **kwargs):
+        columns = resource.Columns(self.row_decoder)
+        promise = self.call_async('print', {}, kwargs)
+        promise.row_decoder = columns.append
+        async for _ in promise.stream():
+            pass
+        return columns.finish()
+
+    async def reconcile(self, desired, key, queries=None, remove=True, dry_run=False, max_in_flight=None):
+        plan = AsyncReconcilePlan(desired, key, remove)
+        plan.compare(await self.select(*plan.columns).call('print', {}, queries))
+        if not dry_run:
+            await plan.apply(self, max_in_flight)
+        return plan
+
+    def decorate_promise(self, promise):
+        if isinstance(promise, asyncio_communicator.AsyncioResponsePromise):
+            promise.row_decoder = self.row_decoder
+            return promise
+        return AsyncTypedPromiseDecorator(promise, self.structure)
+
+
+class AsyncReconcilePlan(resource.ReconcilePlan):
+    async def apply(self, resource, max_in_flight=None):
+        await send_all(resource, self.changes, max_in_flight or resource.max_in_flight)
+        return self.changes
+
+
+async def call_many(some_resource, command, arguments, max_in_flight=None):
+    """asyncio counterpart of ``RouterOsBinaryResource.call_many``."""
+    results = [resource.CommandResult(command, item) for item in arguments]
+    await send_all(some_resource, results, max_in_flight or some_resource.max_in_flight)
+    return results
+
+
+async def send_all(some_resource, results, max_in_flight):
+    """asyncio counterpart of ``resource.send_all``."""
+    in_flight = collections.deque()
+    connection_error = None
+    for result in results:
+        while connection_error is None and len(in_flight) >= max_in_flight:
+            oldest = in_flight.popleft()
+            await collect(oldest)
+            connection_error = oldest.connection_error
+        if connection_error is not None:
+            result.set_error(connection_error)
+            continue
+        result.send(some_resource)
+        connection_error = result.connection_error
+        in_flight.append(result)
+    for result in in_flight:
+        if connection_error is not None:
+            result.set_error(connection_error)
+            continue
+        await collect(result)
+        connection_error = result.connection_error
+
+
+async def collect(result):
+    if not result.done:
+        try:
+            result.response = await result.promise.get()
+        except exceptions.RouterOsApiError as e:
+            result.error = e
+        result.done = True
+
+
+class AsyncTypedPromiseDecorator(resource.TypedPromiseDecorator):
+    async def get(self, timeout=None):
+        response = await self.inner.get(timeout)
+        return response.map(self.transform_dictionary)
+
+    def __await__(self):
+        return self.get().__await__()
+
+    def __iter__(self):
+        raise TypeError('Use "async for" to iterate over an asyncio response.')
+
+    def __aiter__(self):
+        return self.stream()
+
+    async def stream(self, max_buffered=None):
+        async for row in self.inner.stream(max_buffered):
+            yield self.transform_dictionary(row)
@@ -1,85 +1,163 @@
+import contextlib
 import socket
+import threading
+import time
 
 from routeros_api import exceptions
+from routeros_api import instrumentation
+from routeros_api import protocol
 
-LENGTH_MATRIX = [
-    (0x80, 0x0),
-    (0x40, 0x80),
-    (0x20, 0xC0),
-    (0x10, 0xE0),
-    (0x1, 0xF0),
-]
-
-OVER_MAX_LENGTH_MASK = 0xF8
+LENGTH_MATRIX = protocol.LENGTH_MATRIX
+OVER_MAX_LENGTH_MASK = protocol.OVER_MAX_LENGTH_MASK
+encode_sentence = protocol.encode_sentence
+encode_length = protocol.encode_length
+decode_length_prefix = protocol.decode_length_prefix
 
 
 class Connection(object):
-    def __init__(self, socket):
+    max_queued_bytes = 64 * 1024
+    receive_size = 64 * 1024
+
+    def __init__(self, socket, host=None):
         self.socket = socket
+        # Label of the connection in measurements, see routeros_api.instrumentation.
+        self.host = host
+        self.write_lock = threading.Lock()
+        self.local = threading.local()
+        self.reader = protocol.SentenceReader()
 
     def send_sentence(self, words):
+        self.send_encoded_sentence(encode_sentence(words))
+
+    def send_encoded_sentence(self, sentence):
+        if self._get_queue().coalescing_depth:
+            self.queue_encoded_sentence(sentence)
+        else:
+            self._send(self.socket.send, sentence)
+
+    def queue_sentence(self, words):
+        self.queue_encoded_sentence(encode_sentence(words))
+
+    def queue_encoded_sentence(self, sentence):
+        queue = self._get_queue()
+        queue.sentences.append(sentence)
+        queue.size += len(sentence)
+        if queue.size >= self.max_queued_bytes:
+            self.flush()
+
+    def flush(self):
+        queue = self._get_queue()
+        if not queue.sentences:
+            return
+        sentences = queue.sentences
+        queue.sentences = []
+        queue.size = 0
+        if len(sentences) == 1:
+            self._send(self.socket.send, sentences[0])
+        else:
+            self._send(self.socket.send_many, sentences)
+
+    @contextlib.contextmanager
+    def coalescing(self):
+        """Queue sentences sent by this thread inside the block and write them together."""
+        queue = self._get_queue()
+        queue.coalescing_depth += 1
+        try:
+            yield self
+        finally:
+            queue.coalescing_depth -= 1
+            if not queue.coalescing_depth:
+                self.flush()
+
+    def _get_queue(self):
+        try:
+            return self.local.queue
+        except AttributeError:
+            self.local.queue = SentenceQueue()
+            return self.local.queue
+
+    def _send(self, send, data):
         try:
-            for word in words + [b'']:
-                full_word = encode_length(len(word)) + word
-                self.socket.send(full_word)
+            with self.write_lock:
+                send(data)
         except socket.error as e:
             raise exceptions.RouterOsApiConnectionError(str(e))
+        instrument = instrumentation.instrument
+        if instrument is not None:
+            instrument.bytes_sent(self.host, len(data) if isinstance(data, bytes) else sum(map(len, data)))
 
-    def receive_sentence(self):
+    def receive_sentence(self, deadline=None):
+        """Return the next sentence, raising RouterOsApiTimeoutError if it is not complete by ``deadline``."""
+        self.flush()
         try:
-            return list(iter(self.receive_word, b''))
+            words = self.reader.read_sentence()
+            while words is None:
+                if deadline is not None:
+                    self.wait_readable(deadline)
+                count = self.reader.receive_into(self.socket.receive_into, self.receive_size)
+                instrument = instrumentation.instrument
+                if instrument is not None:
+                    instrument.bytes_received(self.host, count)
+                words = self.reader.read_sentence()
+            return words
         except socket.error as e:
             raise exceptions.RouterOsApiConnectionError(str(e))
 
-    def receive_word(self):
-        result = []
-        result_length = 0
-        expected_length = decode_length(self.socket.receive)
-        while result_length != expected_length:
-            received = self.socket.receive(expected_length - result_length)
-            result.append(received)
-            result_length += len(received)
-            assert result_length <= expected_length
-        return b''.join(result)
-
-
-def encode_length(length):
-    data, number_of_bytes = _encode_length(length)
-    return to_bytes(data, number_of_bytes)
-
-
-def _encode_length(length):
-    if length < 0:
-        raise exceptions.FatalRouterOsApiError("Negative length.")
-
-    for bytes, (max_value, mask) in enumerate(LENGTH_MATRIX):
-        offset = 8 * bytes
-        if length < (max_value << offset):
-            return length | (mask << offset), bytes + 1
-    raise exceptions.FatalRouterOsApiError("String to long.")
-
-
-def to_bytes(number, length):
-    if hasattr(number, 'to_bytes'):
-        return number.to_bytes(length, 'big')
-    else:
-        result = []
-        for byte in reversed(range(length)):
-            result.append(chr((number >> (8 * byte)) & 0xff))
-        return b''.join(result)
-
-
-def decode_length(read):
-    first = ord(read(1))
-    masks = tuple(zip(*LENGTH_MATRIX))[1]
-    mask_with_next = zip(masks, masks[1:] + (OVER_MAX_LENGTH_MASK,))
-    for bytes, (mask, next_mask) in enumerate(mask_with_next):
-        if next_mask & first == mask:
-            result = first & ~next_mask
-            break
-    else:
-        raise exceptions.FatalRouterOsApiError("Malformed length")
-    for _ in range(bytes):
-        result <<= 8
-        result += ord(read(1))
-    return result
+    def wait_readable(self, deadline):
+        # Data received so far stays in the reader, so the connection can still be used after a timeout.
+        if not self.socket.wait_readable(max(deadline - time.monotonic(), 0)):
+            raise exceptions.RouterOsApiTimeoutError('Timed out waiting for a reply')
+
+
+class SentenceQueue(object):
+    def __init__(self):
+        self.sentences = []
+        self.size = 0
+        self.coalescing_depth = 0
+
+
+class AsyncConnection(object):
+    receive_size = 64 * 1024
+
+    def __init__(self, reader, writer, host=None):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+        self.sentence_reader = protocol.SentenceReader()
+
+    def send_sentence(self, words):
+        self.send_encoded_sentence(encode_sentence(words))
+
+    def send_encoded_sentence(self, sentence):
+        self.writer.write(sentence)
+        instrument = instrumentation.instrument
+        if instrument is not None:
+            instrument.bytes_sent(self.host, len(sentence))
+
+    async def drain(self):
+        try:
+            await self.writer.drain()
+        except OSError as e:
+            raise exceptions.RouterOsApiConnectionError(str(e))
+
+    async def receive_sentence(self):
+        words = self.sentence_reader.read_sentence()
+        while words is None:
+            self.sentence_reader.feed(await self._receive())
+            words = self.sentence_reader.read_sentence()
+        return words
+
+    async def _receive(self):
+        try:
+            data = await self.reader.read(self.receive_size)
+        except OSError as e:
+            raise exceptions.RouterOsApiConnectionError(str(e))
+        if not data:
+            raise exceptions.RouterOsApiConnectionClosedError
+        instrument = instrumentation.instrument
+        if instrument is not None:
+            instrument.bytes_received(self.host, len(data))
+        return data
+
+    def close(self):
+        self.writer.close()
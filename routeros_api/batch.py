@@ -0,0 +1,134 @@
+import collections
+import time
+
+from routeros_api import api_structure
+from routeros_api import exceptions
+from routeros_api import resource
+
+
+class Batch(object):
+    """Commands sent together and answered when the block ends.
+
+    With ``timeout`` all replies have to arrive within that many seconds of
+    the end of the block, commands still running then are cancelled. At most
+    ``max_in_flight`` commands wait for their reply, the oldest ones are
+    answered while the block still sends, so neither side's socket buffers
+    fill up.
+    """
+
+    def __init__(self, api, timeout=None, max_in_flight=None):
+        self.api = api
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight or resource.RouterOsResource.max_in_flight
+        self.results = []
+        self.pending = collections.deque()
+        self.coalescing = None
+
+    def __enter__(self):
+        self.coalescing = self.api.communicator.coalescing()
+        self.coalescing.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Commands already sent have to be answered even if the block failed, otherwise their replies would be
+        # left on the connection.
+        self.coalescing.__exit__(None, None, None)
+        self.collect()
+
+    def get_resource(self, path, structure=None, lazy_rows=False):
+        if structure is None:
+            structure = api_structure.default_structure
+        return BatchResource(self, self.api.communicator, path, structure, lazy_rows)
+
+    def get_binary_resource(self, path):
+        return BatchBinaryResource(self, self.api.communicator, path)
+
+    def append(self, promise, timeout=None):
+        result = BatchResult(promise, timeout)
+        self.results.append(result)
+        self.pending.append(result)
+        while len(self.pending) > self.max_in_flight:
+            # Receiving flushes the commands queued so far.
+            self.pending.popleft().collect()
+        return result
+
+    def collect(self):
+        self.pending.clear()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        connection_error = None
+        for result in self.results:
+            if connection_error is not None:
+                result.set_error(connection_error)
+                continue
+            if deadline is None:
+                result.collect()
+            else:
+                result.collect(max(deadline - time.monotonic(), 0))
+            if isinstance(result.error, (exceptions.RouterOsApiConnectionError, exceptions.FatalRouterOsApiError)):
+                connection_error = result.error
+        return self.results
+
+    @property
+    def errors(self):
+        return [result for result in self.results if result.error is not None]
+
+
+class BatchResult(object):
+    def __init__(self, promise, timeout=None):
+        self.promise = promise
+        self.timeout = timeout
+        self.response = None
+        self.error = None
+        self.done = False
+
+    def collect(self, timeout=None):
+        if not self.done:
+            if timeout is None or (self.timeout is not None and self.timeout < timeout):
+                timeout = self.timeout
+            try:
+                self.response = self.promise.get(timeout)
+            except exceptions.RouterOsApiError as e:
+                self.error = e
+            self.done = True
+
+    def set_error(self, error):
+        if not self.done:
+            self.error = error
+            self.done = True
+
+    def get(self):
+        self.collect()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    def __repr__(self):
+        if not self.done:
+            state = 'pending'
+        elif self.error is not None:
+            state = 'error={!r}'.format(self.error)
+        else:
+            state = 'response={!r}'.format(self.response)
+        return '{}({})'.format(type(self).__name__, state)
+
+
+class BatchResourceMixin(object):
+    def call(self, command, arguments=None, queries=None, additional_queries=(), timeout=None):
+        promise = self.call_async(
+            command, arguments=arguments, queries=queries, additional_queries=additional_queries)
+        return self.batch.append(promise, timeout)
+
+    def call_prepared(self, prepared, timeout=None):
+        return self.batch.append(self.call_prepared_async(prepared), timeout)
+
+
+class BatchBinaryResource(BatchResourceMixin, resource.RouterOsBinaryResource):
+    def __init__(self, batch, communicator, path):
+        self.batch = batch
+        super(BatchBinaryResource, self).__init__(communicator, path)
+
+
+class BatchResource(BatchResourceMixin, resource.RouterOsResource):
+    def __init__(self, batch, communicator, path, structure, lazy_rows=False):
+        self.batch = batch
+        super(BatchResource, self).__init__(communicator, path, structure, lazy_rows)
@@ -26,3 +26,11 @@ class RouterOsApiFatalCommunicationError(RouterOsApiError):
 
 class RouterOsApiConnectionClosedError(RouterOsApiConnectionError):
     pass
+
+
+class RouterOsApiPoolTimeoutError(RouterOsApiError):
+    pass
+
+
+class RouterOsApiTimeoutError(RouterOsApiError):
+    pass
@@ -0,0 +1,155 @@
+"""Run one command on many routers at once.
+
+Results are yielded as soon as each host finishes, so a slow or dead
+router only holds up its own slot.
+"""
+import asyncio
+import concurrent.futures
+import itertools
+import time
+
+from routeros_api import api
+from routeros_api import asyncio_api
+
+
+def fan_out(hosts, path, command='print', arguments=None, queries=None, structure=None, max_workers=32,
+            connect_timeout=2.0, login_timeout=5.0, command_timeout=15.0, **connection_kwargs):
+    """Run ``command`` on ``path`` for every host and yield a :class:`FanOutResult` per host.
+
+    ``hosts`` may contain host names, dicts of ``RouterOsApiPool`` arguments or
+    ``RouterOsApiPool`` instances, whose pooled connections are reused.
+    ``connection_kwargs`` are defaults for hosts given by name or dict.
+
+    A ``RouterOsApiPool`` opens new connections with its own
+    ``connect_timeout`` and ``login_timeout``; for those hosts
+    ``connect_timeout + login_timeout`` only limits waiting for a free
+    pooled connection.
+    """
+    job = FanOutJob(path, command, arguments, queries, structure, connect_timeout, login_timeout,
+                    command_timeout, connection_kwargs)
+    hosts = iter(hosts)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = set(executor.submit(job.run, host) for host in itertools.islice(hosts, max_workers * 2))
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for host in itertools.islice(hosts, len(done)):
+                pending.add(executor.submit(job.run, host))
+            for future in done:
+                yield future.result()
+    finally:
+        # When the caller stops iterating, do not run the queued hosts or wait for the running ones.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def async_fan_out(hosts, path, command='print', arguments=None, queries=None, structure=None,
+                        max_concurrency=256, connect_timeout=2.0, login_timeout=5.0, command_timeout=15.0,
+                        **connection_kwargs):
+    """asyncio counterpart of :func:`fan_out`, used with ``async for``.
+
+    ``AsyncRouterOsApiPool`` instances in ``hosts`` keep their connection open
+    and can be shared with other coroutines.
+    """
+    job = FanOutJob(path, command, arguments, queries, structure, connect_timeout, login_timeout,
+                    command_timeout, connection_kwargs)
+    hosts = iter(hosts)
+    pending = set(asyncio.ensure_future(job.run_async(host)) for host in itertools.islice(hosts, max_concurrency))
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for host in itertools.islice(hosts, len(done)):
+                pending.add(asyncio.ensure_future(job.run_async(host)))
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class FanOutJob(object):
+    def __init__(self, path, command, arguments, queries, structure, connect_timeout, login_timeout,
+                 command_timeout, connection_kwargs):
+        self.path = path
+        self.command = command
+        self.arguments = arguments
+        self.queries = queries
+        self.structure = structure
+        self.connect_timeout = connect_timeout
+        self.login_timeout = login_timeout
+        self.command_timeout = command_timeout
+        self.connection_kwargs = connection_kwargs
+
+    def run(self, host):
+        started = time.monotonic()
+        try:
+            if isinstance(host, api.RouterOsApiPool):
+                with host.connection(timeout=self.connect_timeout + self.login_timeout) as routeros_api:
+                    response = self.call(routeros_api)
+            else:
+                pool = self.configure(api.RouterOsApiPool(**self.get_connection_kwargs(host)))
+                try:
+                    response = self.call(pool.get_api())
+                finally:
+                    pool.disconnect()
+        except Exception as e:
+            return FanOutResult(host, error=e, elapsed=time.monotonic() - started)
+        return FanOutResult(host, response=response, elapsed=time.monotonic() - started)
+
+    async def run_async(self, host):
+        started = time.monotonic()
+        try:
+            if isinstance(host, asyncio_api.AsyncRouterOsApiPool):
+                routeros_api = await asyncio.wait_for(host.get_api(), self.connect_timeout + self.login_timeout)
+                response = await asyncio.wait_for(self.call(routeros_api), self.command_timeout)
+            else:
+                pool = self.configure(asyncio_api.AsyncRouterOsApiPool(**self.get_connection_kwargs(host)))
+                try:
+                    routeros_api = await pool.get_api()
+                    response = await asyncio.wait_for(self.call(routeros_api), self.command_timeout)
+                finally:
+                    pool.disconnect()
+        except Exception as e:
+            return FanOutResult(host, error=e, elapsed=time.monotonic() - started)
+        return FanOutResult(host, response=response, elapsed=time.monotonic() - started)
+
+    def get_connection_kwargs(self, host):
+        if isinstance(host, dict):
+            return dict(self.connection_kwargs, **host)
+        else:
+            return dict(self.connection_kwargs, host=host)
+
+    def configure(self, pool):
+        pool.connect_timeout = self.connect_timeout
+        pool.login_timeout = self.login_timeout
+        pool.set_timeout(self.command_timeout)
+        return pool
+
+    def call(self, routeros_api):
+        if self.structure is None:
+            resource = routeros_api.get_resource(self.path)
+        else:
+            resource = routeros_api.get_resource(self.path, self.structure)
+        return resource.call(self.command, self.arguments, self.queries, timeout=self.command_timeout)
+
+
+class FanOutResult(object):
+    def __init__(self, host, response=None, error=None, elapsed=None):
+        self.host = host
+        self.response = response
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def get(self):
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    def __repr__(self):
+        if self.ok:
+            return 'FanOutResult({!r}, response={!r})'.format(self.host, self.response)
+        else:
+            return 'FanOutResult({!r}, error={!r})'.format(self.host, self.error)
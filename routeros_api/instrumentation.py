@@ -0,0 +1,245 @@
+"""Measurements of connections and commands.
+
+Nothing is measured until an :class:`Instrument` is installed with
+:func:`install`; until then every hook is a single ``is None`` check.
+:class:`PrometheusCollector` is an instrument keeping the measurements in
+memory and rendering them in the Prometheus text exposition format.
+"""
+import bisect
+import threading
+
+instrument = None
+
+
+def install(new_instrument):
+    """Send measurements of all connections to ``new_instrument``, replacing the installed one."""
+    global instrument
+    instrument = new_instrument
+    return new_instrument
+
+
+def uninstall():
+    global instrument
+    instrument = None
+
+
+class Instrument(object):
+    """Receives measurements, every method does nothing here.
+
+    Subclass it and override the methods of interest. ``host`` is the host
+    name of the connection, or None for connections not opened by a pool.
+    Methods are called from the thread using the connection, so they should
+    be quick and thread-safe.
+    """
+
+    def connected(self, host, connect_seconds, tls_seconds, tls_resumed):
+        """A connection was established; ``tls_seconds`` and ``tls_resumed`` are None without TLS."""
+
+    def connect_failed(self, host, error):
+        pass
+
+    def reconnected(self, host):
+        """A pool opened a connection replacing a broken one."""
+
+    def logged_in(self, host, seconds):
+        pass
+
+    def bytes_sent(self, host, count):
+        pass
+
+    def bytes_received(self, host, count):
+        pass
+
+    def sentence_sent(self, host, words):
+        pass
+
+    def sentence_received(self, host, words):
+        pass
+
+    def command_finished(self, host, timing):
+        """A command got its ``!done``, or ``!fatal``; ``timing`` is a :class:`CommandTiming`."""
+
+    def in_flight(self, host, change):
+        """The number of commands waiting for their ``!done`` changed by ``change``.
+
+        It is 1 for a sent command, -1 for a finished one and minus the
+        unfinished commands when a connection is lost, so the changes of all
+        connections of a host add up to the commands waiting on the host.
+        """
+
+
+class CommandTiming(object):
+    """Phases of a command: ``send`` until it is written, ``wait`` for the first reply, ``receive`` the rest."""
+
+    __slots__ = ('command', 'started', 'sent', 'first_reply', 'finished', 'rows', 'error')
+
+    def __init__(self, command, started):
+        self.command = command
+        self.started = started
+        self.sent = None
+        self.first_reply = None
+        self.finished = None
+        self.rows = 0
+        self.error = None
+
+    @property
+    def send_seconds(self):
+        return self.sent - self.started
+
+    @property
+    def wait_seconds(self):
+        return self.first_reply - self.sent
+
+    @property
+    def receive_seconds(self):
+        return self.finished - self.first_reply
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, self.command)
+
+
+class PrometheusCollector(Instrument):
+    """Counters and histograms of all measurements, see :meth:`render`.
+
+    Commands are labelled with their path and command name, e.g.
+    ``/interface/print``; histograms use ``buckets`` (in seconds).
+    """
+
+    buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    families = (
+        ('routeros_api_connects_total', 'counter', 'Connections established.'),
+        ('routeros_api_connect_failures_total', 'counter', 'Connections that could not be established.'),
+        ('routeros_api_reconnects_total', 'counter', 'Connections replacing a broken one.'),
+        ('routeros_api_connect_seconds', 'histogram', 'Time to establish a connection by phase (tcp or tls).'),
+        ('routeros_api_tls_handshakes_total', 'counter', 'TLS handshakes by whether they resumed a session.'),
+        ('routeros_api_login_seconds', 'histogram', 'Time to log in.'),
+        ('routeros_api_bytes_sent_total', 'counter', 'Bytes written to connections.'),
+        ('routeros_api_bytes_received_total', 'counter', 'Bytes read from connections.'),
+        ('routeros_api_words_sent_total', 'counter', 'Words of sent sentences.'),
+        ('routeros_api_words_received_total', 'counter', 'Words of received sentences.'),
+        ('routeros_api_command_seconds', 'histogram', 'Command latency by phase (send, wait or receive).'),
+        ('routeros_api_command_errors_total', 'counter', 'Commands answered with !trap or !fatal.'),
+        ('routeros_api_rows_received_total', 'counter', 'Rows (!re sentences) received.'),
+        ('routeros_api_commands_in_flight', 'gauge', 'Commands waiting for their !done.'),
+    )
+
+    def __init__(self, buckets=None):
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.samples = dict((name, {}) for name, _, _ in self.families)
+
+    def connected(self, host, connect_seconds, tls_seconds, tls_resumed):
+        self.increment('routeros_api_connects_total', host=host)
+        self.observe('routeros_api_connect_seconds', connect_seconds, host=host, phase='tcp')
+        if tls_seconds is not None:
+            self.observe('routeros_api_connect_seconds', tls_seconds, host=host, phase='tls')
+            self.increment('routeros_api_tls_handshakes_total', host=host, resumed=str(bool(tls_resumed)).lower())
+
+    def connect_failed(self, host, error):
+        self.increment('routeros_api_connect_failures_total', host=host)
+
+    def reconnected(self, host):
+        self.increment('routeros_api_reconnects_total', host=host)
+
+    def logged_in(self, host, seconds):
+        self.observe('routeros_api_login_seconds', seconds, host=host)
+
+    def bytes_sent(self, host, count):
+        self.increment('routeros_api_bytes_sent_total', count, host=host)
+
+    def bytes_received(self, host, count):
+        self.increment('routeros_api_bytes_received_total', count, host=host)
+
+    def sentence_sent(self, host, words):
+        self.increment('routeros_api_words_sent_total', words, host=host)
+
+    def sentence_received(self, host, words):
+        self.increment('routeros_api_words_received_total', words, host=host)
+
+    def command_finished(self, host, timing):
+        command = timing.command
+        self.observe('routeros_api_command_seconds', timing.send_seconds, host=host, command=command, phase='send')
+        self.observe('routeros_api_command_seconds', timing.wait_seconds, host=host, command=command, phase='wait')
+        self.observe('routeros_api_command_seconds', timing.receive_seconds, host=host, command=command,
+                     phase='receive')
+        if timing.rows:
+            self.increment('routeros_api_rows_received_total', timing.rows, host=host, command=command)
+        if timing.error is not None:
+            self.increment('routeros_api_command_errors_total', host=host, command=command)
+
+    def in_flight(self, host, change):
+        self.increment('routeros_api_commands_in_flight', change, host=host)
+
+    def increment(self, name, value=1, **labels):
+        labels = get_labels(**labels)
+        with self.lock:
+            samples = self.samples[name]
+            samples[labels] = samples.get(labels, 0) + value
+
+    def observe(self, name, value, **labels):
+        labels = get_labels(**labels)
+        with self.lock:
+            histogram = self.samples[name].get(labels)
+            if histogram is None:
+                histogram = self.samples[name][labels] = Histogram(len(self.buckets))
+            histogram.observe(bisect.bisect_left(self.buckets, value), value)
+
+    def render(self):
+        """Return all measurements in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, metric_type, description in self.families:
+                samples = self.samples[name]
+                if not samples:
+                    continue
+                lines.append('# HELP {} {}'.format(name, description))
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+                for labels, value in sorted(samples.items()):
+                    if metric_type == 'histogram':
+                        lines.extend(value.render(name, labels, self.buckets))
+                    else:
+                        lines.append(format_sample(name, labels, value))
+        return ''.join(line + '\n' for line in lines)
+
+    def clear(self):
+        with self.lock:
+            for samples in self.samples.values():
+                samples.clear()
+
+
+class Histogram(object):
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, bucket_count):
+        # The last count is of values above every bucket.
+        self.counts = [0] * (bucket_count + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, index, value):
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels, buckets):
+        cumulative = 0
+        for bucket, count in zip(buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield format_sample(name + '_bucket', labels + (('le', str(bucket)),), cumulative)
+        yield format_sample(name + '_sum', labels, self.sum)
+        yield format_sample(name + '_count', labels, self.count)
+
+
+def get_labels(**labels):
+    return tuple((key, '' if value is None else str(value)) for key, value in sorted(labels.items()))
+
+
+def format_sample(name, labels, value):
+    if labels:
+        name += '{' + ','.join('{}="{}"'.format(key, escape_label(value)) for key, value in labels) + '}'
+    return '{} {}'.format(name, value)
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
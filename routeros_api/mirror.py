@@ -0,0 +1,232 @@
+"""Local replica of a RouterOS menu kept current by the router.
+
+:class:`Mirror` reads the whole menu once and then only the changes, which
+the router sends on a ``print follow-only`` (or ``listen``) tag as they
+happen. Reads are local dict lookups and traffic scales with the number of
+changes instead of the size of the table.
+"""
+import collections.abc
+import logging
+import socket
+import threading
+
+from routeros_api import exceptions
+
+logger = logging.getLogger(__name__)
+
+ADDED = 'added'
+UPDATED = 'updated'
+REMOVED = 'removed'
+
+# Errors after which the mirror resyncs on a new connection.
+CONNECTION_ERRORS = (
+    exceptions.RouterOsApiConnectionError,
+    exceptions.FatalRouterOsApiError,
+    exceptions.RouterOsApiFatalCommunicationError,
+    socket.error,
+)
+
+
+class Mirror(collections.abc.Mapping):
+    """Rows of ``path`` by their ``id``, updated from a follow stream.
+
+    A connection of ``pool`` is held while the mirror runs. After a
+    connection error a new one is checked out and the replica is
+    resynchronised with one full ``print`` before following changes again.
+    Errors answered by the router, such as a ``!trap`` for a bad query, are
+    retried the same way and kept in ``error`` for :meth:`wait_synced`.
+    """
+
+    retry_interval = 5.0
+
+    def __init__(self, pool, path, structure=None, queries=None, command='print'):
+        if command not in ('print', 'listen'):
+            raise ValueError('Changes are followed with print or listen, not {}.'.format(command))
+        self.pool = pool
+        self.path = path
+        self.structure = structure
+        self.queries = queries or {}
+        self.command = command
+        self.rows = {}
+        self.callbacks = []
+        self.synced = threading.Event()
+        self.error = None
+        self.state_changed = threading.Condition()
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.api = None
+        self.thread = None
+
+    def __getitem__(self, row_id):
+        return self.rows[row_id]
+
+    def __iter__(self):
+        return iter(list(self.rows))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def on_change(self, callback):
+        """Call ``callback`` with a :class:`Change` for every added, updated and removed row.
+
+        Returns ``callback``, so it can be used as a decorator.
+        """
+        self.callbacks.append(callback)
+        return callback
+
+    def start(self):
+        """Run the mirror in a daemon thread."""
+        self.thread = threading.Thread(target=self.run, name='Mirror({})'.format(self.path), daemon=True)
+        self.thread.start()
+        return self
+
+    def wait_synced(self, timeout=None):
+        """Wait until the replica holds a full print, return False on timeout.
+
+        Raises the error of the last attempt if the router refused it.
+        """
+        with self.state_changed:
+            self.state_changed.wait_for(lambda: self.synced.is_set() or self.error is not None, timeout)
+            if self.synced.is_set():
+                return True
+            if self.error is not None:
+                raise self.error
+            return False
+
+    def stop(self):
+        self.stopped.set()
+        with self.lock:
+            if self.api is not None:
+                # Wakes up the thread waiting for changes, the closed connection is dropped by the pool.
+                self.pool.close_connection(self.api)
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def run(self):
+        """Follow changes until :meth:`stop` is called, resyncing after errors or when the changes end."""
+        while not self.stopped.is_set():
+            try:
+                with self.pool.connection() as api:
+                    self.follow(api)
+            except (exceptions.RouterOsApiError, socket.error) as e:
+                self.synced.clear()
+                if self.stopped.is_set():
+                    return
+                if isinstance(e, CONNECTION_ERRORS):
+                    logger.warning('Mirror of %s lost its connection (%r), resyncing in %ss.', self.path, e,
+                                   self.retry_interval)
+                else:
+                    with self.state_changed:
+                        self.error = e
+                        self.state_changed.notify_all()
+                    logger.error('Mirror of %s failed (%r), retrying in %ss.', self.path, e, self.retry_interval)
+            else:
+                self.synced.clear()
+                if self.stopped.is_set():
+                    return
+                logger.warning('Mirror of %s stopped receiving changes, resyncing in %ss.', self.path,
+                               self.retry_interval)
+            self.stopped.wait(self.retry_interval)
+
+    def follow(self, api):
+        with self.lock:
+            if self.stopped.is_set():
+                return
+            self.api = api
+        api_socket = api.communicator.base.socket
+        try:
+            changes = self.sync(api)
+            # Changes may not come for a long time, dead peers are noticed by TCP keepalive.
+            api_socket.settimeout(None)
+            for row in changes:
+                self.apply(row)
+        except socket.error:
+            self.pool.close_connection(api)
+            raise
+        finally:
+            # Reader threads of threaded pools wait without a timeout, see ThreadedApiCommunicatorBase.
+            if not self.pool.threaded:
+                try:
+                    api_socket.settimeout(self.pool.socket_timeout)
+                except socket.error:
+                    pass
+            with self.lock:
+                self.api = None
+
+    def sync(self, api):
+        """Start following changes, replace the replica with a full print and return the changes."""
+        resource = self.get_resource(api)
+        if self.command == 'print':
+            changes = resource.call_async('print', {'follow-only': None}, self.queries)
+        else:
+            changes = resource.call_async('listen', {}, self.queries)
+        # Changes made before the print was answered are replayed on top of it, which is harmless
+        # because every change carries the whole row.
+        try:
+            # Prepared commands are never answered from the response cache of the pool.
+            rows = resource.prepare('print', {}, self.queries).call()
+        except exceptions.RouterOsApiCommunicationError:
+            # The connection goes back to the pool, the follow command must not keep running on it.
+            changes.cancel()
+            raise
+        self.replace(rows)
+        with self.state_changed:
+            self.error = None
+            self.synced.set()
+            self.state_changed.notify_all()
+        return changes.stream()
+
+    def get_resource(self, api):
+        if self.structure is None:
+            return api.get_resource(self.path)
+        else:
+            return api.get_resource(self.path, self.structure)
+
+    def replace(self, rows):
+        rows = dict((row['id'], row) for row in rows)
+        previous_rows, self.rows = self.rows, rows
+        for row_id, previous in previous_rows.items():
+            if row_id not in rows:
+                self.notify(Change(REMOVED, row_id, None, previous))
+        for row_id, row in rows.items():
+            previous = previous_rows.get(row_id)
+            if previous is None:
+                self.notify(Change(ADDED, row_id, row, None))
+            elif previous != row:
+                self.notify(Change(UPDATED, row_id, row, previous))
+
+    def apply(self, row):
+        row_id = row.get('id')
+        if row_id is None:
+            return
+        previous = self.rows.get(row_id)
+        if '.dead' in row:
+            if previous is not None:
+                del self.rows[row_id]
+                self.notify(Change(REMOVED, row_id, None, previous))
+        elif previous != row:
+            self.rows[row_id] = row
+            self.notify(Change(ADDED if previous is None else UPDATED, row_id, row, previous))
+
+    def notify(self, change):
+        for callback in self.callbacks:
+            try:
+                callback(change)
+            except Exception:
+                logger.exception('Change callback of mirror of %s failed.', self.path)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, self.path)
+
+
+class Change(object):
+    """``row`` is None for removed rows and ``previous`` is None for added ones."""
+
+    def __init__(self, action, id, row, previous):
+        self.action = action
+        self.id = id
+        self.row = row
+        self.previous = previous
+
+    def __repr__(self):
+        return 'Change({!r}, {!r})'.format(self.action, self.id)
@@ -0,0 +1,162 @@
+"""Framing of the RouterOS API protocol, independent of any I/O.
+
+Outgoing sentences are turned into bytes with :func:`encode_sentence` and
+received bytes are fed to a :class:`SentenceReader`, which hands out
+complete sentences. The blocking and asyncio connections as well as test
+servers only move the bytes around. Parsing the words of a reply is left to
+:mod:`routeros_api.sentence` and matching replies to commands by tag to the
+communicators.
+"""
+from routeros_api import exceptions
+
+LENGTH_MATRIX = [
+    (0x80, 0x0),
+    (0x40, 0x80),
+    (0x20, 0xC0),
+    (0x10, 0xE0),
+    (0x1, 0xF0),
+]
+
+OVER_MAX_LENGTH_MASK = 0xF8
+
+
+def _build_length_prefixes():
+    masks = [mask for _, mask in LENGTH_MATRIX] + [OVER_MAX_LENGTH_MASK]
+    prefixes = []
+    for first in range(256):
+        for additional_bytes, (mask, next_mask) in enumerate(zip(masks, masks[1:])):
+            if first & next_mask == mask:
+                prefixes.append((first & ~next_mask, additional_bytes))
+                break
+        else:
+            prefixes.append(None)
+    return tuple(prefixes)
+
+
+# Indexed by the first byte of an encoded length: the bits of the length it
+# holds and the number of bytes that follow, or None for a malformed length.
+LENGTH_PREFIXES = _build_length_prefixes()
+
+SHORT_LENGTHS = tuple(bytes((length,)) for length in range(LENGTH_MATRIX[0][0]))
+
+
+def encode_length(length):
+    if length < 0:
+        raise exceptions.FatalRouterOsApiError("Negative length.")
+    for bytes_count, (max_value, mask) in enumerate(LENGTH_MATRIX):
+        offset = 8 * bytes_count
+        if length < (max_value << offset):
+            return (length | (mask << offset)).to_bytes(bytes_count + 1, 'big')
+    raise exceptions.FatalRouterOsApiError("String to long.")
+
+
+def decode_length_prefix(first):
+    prefix = LENGTH_PREFIXES[first]
+    if prefix is None:
+        raise exceptions.FatalRouterOsApiError("Malformed length")
+    return prefix
+
+
+def encode_sentence(words):
+    encoded = []
+    for word in words:
+        length = len(word)
+        if length < 0x80:
+            encoded.append(SHORT_LENGTHS[length])
+        else:
+            encoded.append(encode_length(length))
+        encoded.append(word)
+    encoded.append(b'\x00')
+    return b''.join(encoded)
+
+
+class PreparedSentence(object):
+    """Words of a command framed once, completed with a new ``.tag`` word on every send."""
+
+    def __init__(self, words):
+        self.words = words
+        self.data = encode_sentence(words)[:-1]
+
+    def encode(self, tag):
+        return self.data + encode_sentence([b'.tag=' + tag])
+
+
+class SentenceReader(object):
+    """Incremental decoder of received bytes into sentences (lists of words)."""
+
+    def __init__(self):
+        # Bytes from position to end are received but not decoded yet, the rest of the buffer is free.
+        self.buffer = bytearray()
+        self.position = 0
+        self.end = 0
+        self.words = []
+
+    def feed(self, data):
+        self.reserve(len(data))
+        self.buffer[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    def receive_into(self, recv_into, size):
+        """Receive straight into the buffer with ``recv_into(view)``, offering at least ``size`` bytes of it.
+
+        Returns the value of ``recv_into``, the number of bytes received.
+        """
+        self.reserve(size)
+        with memoryview(self.buffer) as view, view[self.end:] as free:
+            count = recv_into(free)
+        self.end += count
+        return count
+
+    def reserve(self, size):
+        if len(self.buffer) - self.end >= size:
+            return
+        if self.position:
+            del self.buffer[:self.position]
+            self.end -= self.position
+            self.position = 0
+        missing = size - (len(self.buffer) - self.end)
+        if missing > 0:
+            self.buffer += bytes(missing)
+
+    def read_sentence(self):
+        """Return the next complete sentence, or None if more data is needed."""
+        buffer = self.buffer
+        end = self.end
+        position = self.position
+        words = self.words
+        while position < end:
+            length = buffer[position]
+            start = position + 1
+            if length >= 0x80:
+                prefix = LENGTH_PREFIXES[length]
+                if prefix is None:
+                    raise exceptions.FatalRouterOsApiError("Malformed length")
+                length, additional_bytes = prefix
+                if start + additional_bytes > end:
+                    break
+                for byte in buffer[start:start + additional_bytes]:
+                    length = (length << 8) + byte
+                start += additional_bytes
+            stop = start + length
+            if stop > end:
+                break
+            position = stop
+            if length:
+                words.append(bytes(buffer[start:stop]))
+            else:
+                self.position = position
+                self.words = []
+                return words
+        self.position = position
+        return None
+
+    def read_sentences(self):
+        while True:
+            words = self.read_sentence()
+            if words is None:
+                return
+            yield words
+
+    @property
+    def buffered(self):
+        return self.end - self.position
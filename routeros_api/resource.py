@@ -1,10 +1,28 @@
+import array
+import collections
+import collections.abc
+import copy
+import itertools
+import logging
+import sys
+
+from routeros_api import api_structure
+from routeros_api import exceptions
+from routeros_api.api_communicator import encoding_decorator
+from routeros_api.api_communicator import key_cleaner_decorator
+
+logger = logging.getLogger(__name__)
+
+
 class RouterOsBinaryResource(object):
+    max_in_flight = 64
+
     def __init__(self, communicator, path):
         self.communicator = communicator
         self.path = clean_path(path)
 
-    def get(self, **kwargs):
-        return self.call('print', {}, kwargs)
+    def get(self, reply_timeout=None, **kwargs):
+        return self.call('print', {}, kwargs, timeout=reply_timeout)
 
     def get_async(self, **kwargs):
         return self.call_async('print', {}, kwargs)
@@ -19,7 +37,7 @@ class RouterOsBinaryResource(object):
         return self.call('set', kwargs)
 
     def set_async(self, **kwargs):
-        return self.call('set', kwargs)
+        return self.call_async('set', kwargs)
 
     def add(self, **kwargs):
         return self.call('add', kwargs)
@@ -33,34 +51,158 @@ class RouterOsBinaryResource(object):
     def remove_async(self, **kwargs):
         return self.call_async('remove', kwargs)
 
+    def add_many(self, rows, max_in_flight=None):
+        """Add every row of ``rows``, see :meth:`call_many`."""
+        return self.call_many('add', rows, max_in_flight)
+
+    def set_many(self, rows, max_in_flight=None):
+        """Set every row of ``rows``, each including the ``id`` of the row to change, see :meth:`call_many`."""
+        return self.call_many('set', rows, max_in_flight)
+
+    def remove_many(self, ids, max_in_flight=None, ids_per_command=1):
+        """Remove the rows with ``ids``, see :meth:`call_many`.
+
+        With ``ids_per_command`` above 1 that many ids are removed by each
+        command through a comma separated ``numbers`` argument. A failing
+        command then reports one error for all of its ids.
+        """
+        if ids_per_command == 1:
+            arguments = ({'id': row_id} for row_id in ids)
+        else:
+            arguments = ({'numbers': join_ids(chunk)} for chunk in iter_chunks(ids, ids_per_command))
+        return self.call_many('remove', arguments, max_in_flight)
+
+    def call_many(self, command, arguments, max_in_flight=None):
+        """Send ``command`` once for each dict of ``arguments``, without waiting for every reply.
+
+        At most ``max_in_flight`` commands wait for their reply at a time.
+        Returns a :class:`CommandResult` per command, in order; a failing
+        command does not stop the others, but a broken connection fails all
+        commands not answered yet.
+        """
+        results = [CommandResult(command, item) for item in arguments]
+        send_all(self, results, max_in_flight or self.max_in_flight)
+        return results
+
     def call(self, command, arguments=None, queries=None,
-             additional_queries=()):
+             additional_queries=(), timeout=None):
+        """Send ``command`` and wait for its reply, at most ``timeout`` seconds when set.
+
+        A command not answered in time is cancelled and
+        ``RouterOsApiTimeoutError`` is raised; the connection stays usable.
+        """
         return self.call_async(
             command, arguments=arguments, queries=queries, additional_queries=additional_queries,
-        ).get()
+        ).get(timeout)
 
     def call_async(self, command, arguments=None, queries=None, additional_queries=()):
         return self.communicator.call(
             self.path, command, arguments=arguments, queries=queries,
             additional_queries=additional_queries)
 
+    def prepare(self, command, arguments=None, queries=None, additional_queries=()):
+        """Encode ``command`` once to send it many times, see :class:`PreparedCall`."""
+        return PreparedCall(self, self.communicator.prepare(
+            self.path, command, arguments=arguments, queries=queries,
+            additional_queries=additional_queries))
+
+    def call_prepared(self, prepared, timeout=None):
+        return self.call_prepared_async(prepared).get(timeout)
+
+    def call_prepared_async(self, prepared):
+        return self.communicator.call_prepared(prepared)
+
     def __repr__(self):
         return type(self).__name__ + '({path})'.format(path=self.path)
 
 
 class RouterOsResource(RouterOsBinaryResource):
-    def __init__(self, communicator, path, structure):
+    def __init__(self, communicator, path, structure, lazy_rows=False):
         self.structure = structure
+        if lazy_rows:
+            self.row_decoder = LazyRowDecoder(structure)
+        else:
+            self.row_decoder = RowDecoder(structure)
+        self.selected_columns = None
         super(RouterOsResource, self).__init__(communicator, path)
 
+    def select(self, *columns):
+        """Return a copy of this resource whose prints only fetch ``columns`` (using ``.proplist``)."""
+        selected = copy.copy(self)
+        selected.selected_columns = tuple(column.replace('_', '-') for column in columns)
+        selected.row_decoder = type(self.row_decoder)(self.structure)
+        return selected
+
+    def get(self, columns=None, reply_timeout=None, **kwargs):
+        if columns is not None:
+            return self.select(*columns).get(reply_timeout=reply_timeout, **kwargs)
+        response = super(RouterOsResource, self).get(reply_timeout=reply_timeout, **kwargs)
+        self.check_selected_columns(response)
+        return response
+
+    def get_async(self, columns=None, **kwargs):
+        if columns is not None:
+            return self.select(*columns).get_async(**kwargs)
+        return super(RouterOsResource, self).get_async(**kwargs)
+
+    def check_selected_columns(self, rows):
+        if self.selected_columns is None or not isinstance(rows, list) or not rows:
+            return
+        missing = [name for name in self.selected_columns if name not in self.row_decoder.keys]
+        missing = [name for name in missing if not any(name in row for row in rows)]
+        if missing:
+            logger.warning('Selected columns %s of %s were not returned.', ', '.join(missing), self.path)
+
+    def get_proplist(self):
+        return ','.join(
+            key_cleaner_decorator.encode_key(column.encode()).decode() for column in self.selected_columns)
+
     def call_async(self, command, arguments=None, queries=None, additional_queries=()):
-        arguments = self.transform_dictionary(arguments or {})
+        arguments = self.transform_dictionary(self.get_arguments(command, arguments))
         queries = self.transform_dictionary(queries or {})
         promise = self.communicator.call(
             self.path, command, arguments=arguments, queries=queries,
             additional_queries=additional_queries)
         return self.decorate_promise(promise)
 
+    def prepare(self, command, arguments=None, queries=None, additional_queries=()):
+        arguments = self.transform_dictionary(self.get_arguments(command, arguments))
+        queries = self.transform_dictionary(queries or {})
+        return PreparedCall(self, self.communicator.prepare(
+            self.path, command, arguments=arguments, queries=queries,
+            additional_queries=additional_queries))
+
+    def call_prepared_async(self, prepared):
+        return self.decorate_promise(self.communicator.call_prepared(prepared))
+
+    def get_arguments(self, command, arguments):
+        if self.selected_columns is not None and command == 'print':
+            return dict(arguments or {}, proplist=self.get_proplist())
+        return arguments or {}
+
+    def get_columns(self, **kwargs):
+        """Fetch ``print`` as :class:`Columns`, without building a dict per row."""
+        columns = Columns(self.row_decoder)
+        promise = self.call_async('print', {}, kwargs)
+        promise.row_decoder = columns.append
+        collections.deque(promise.stream(), maxlen=0)
+        return columns.finish()
+
+    def reconcile(self, desired, key, queries=None, remove=True, dry_run=False, max_in_flight=None):
+        """Add, set and remove rows so that the rows matching ``queries`` become ``desired``.
+
+        Rows are matched by their ``key`` field and only the fields used by
+        ``desired`` are fetched. Changes are sent like :meth:`call_many` does,
+        keeping up to ``max_in_flight`` of them waiting for replies; the
+        returned :class:`ReconcilePlan` holds the result of each of them, or
+        only the planned changes with ``dry_run``.
+        """
+        plan = ReconcilePlan(desired, key, remove)
+        plan.compare(self.select(*plan.columns).call('print', {}, queries))
+        if not dry_run:
+            plan.apply(self, max_in_flight)
+        return plan
+
     def transform_dictionary(self, dictionary):
         return dict(self.transform_item(item) for item in dictionary.items())
 
@@ -72,9 +214,363 @@ class RouterOsResource(RouterOsBinaryResource):
             return (key, self.structure[key].get_mikrotik_value(value))
 
     def decorate_promise(self, promise):
+        if isinstance(promise, encoding_decorator.EncodedPromiseDecorator):
+            return encoding_decorator.EncodedPromiseDecorator(promise.inner, self.row_decoder)
         return TypedPromiseDecorator(promise, self.structure)
 
 
+class PreparedCall(object):
+    """A command of a resource encoded once.
+
+    Every call sends the same bytes, only the ``.tag`` word changes.
+    """
+
+    def __init__(self, resource, command):
+        self.resource = resource
+        self.command = command
+
+    def call(self, timeout=None):
+        return self.resource.call_prepared(self.command, timeout)
+
+    def call_async(self):
+        return self.resource.call_prepared_async(self.command)
+
+    def __repr__(self):
+        return '{}({!r}, {})'.format(type(self).__name__, self.resource, self.command.command)
+
+
+class ReconcilePlan(object):
+    """Changes turning current rows into ``desired`` rows, matched by their ``key`` field.
+
+    Rows are removed first, then updated, then added. Current rows without
+    ``key`` are left alone.
+    """
+
+    def __init__(self, desired, key, remove=True):
+        self.key = key.replace('_', '-')
+        self.desired = [dict((name.replace('_', '-'), value) for name, value in row.items()) for row in desired]
+        self.remove = remove
+        self.changes = []
+
+    @property
+    def columns(self):
+        names = set()
+        for row in self.desired:
+            names.update(row)
+        names.discard(self.key)
+        return ('id', self.key) + tuple(sorted(names))
+
+    def compare(self, current):
+        current_by_key = {}
+        removed = []
+        for row in current:
+            if self.key not in row:
+                continue
+            if row[self.key] in current_by_key:
+                removed.append(row)
+            else:
+                current_by_key[row[self.key]] = row
+        updated = []
+        added = []
+        desired_keys = set()
+        for row in self.desired:
+            key = row[self.key]
+            if key in desired_keys:
+                raise ValueError('Desired rows have {} {!r} more than once.'.format(self.key, key))
+            desired_keys.add(key)
+            current_row = current_by_key.get(key)
+            if current_row is None:
+                added.append(PlannedChange('add', row, key))
+                continue
+            arguments = dict((name, value) for name, value in row.items() if current_row.get(name) != value)
+            if arguments:
+                arguments['id'] = current_row['id']
+                updated.append(PlannedChange('set', arguments, key))
+        removed.extend(row for key, row in current_by_key.items() if key not in desired_keys)
+        if not self.remove:
+            removed = []
+        self.changes = [PlannedChange('remove', {'id': row['id']}, row[self.key]) for row in removed]
+        self.changes.extend(updated)
+        self.changes.extend(added)
+        return self.changes
+
+    def apply(self, resource, max_in_flight=None):
+        with resource.communicator.coalescing():
+            send_all(resource, self.changes, max_in_flight or resource.max_in_flight)
+        return self.changes
+
+    @property
+    def errors(self):
+        return [change for change in self.changes if change.error is not None]
+
+    def __repr__(self):
+        counts = collections.Counter(change.command for change in self.changes)
+        return '{}(add={}, set={}, remove={})'.format(
+            type(self).__name__, counts['add'], counts['set'], counts['remove'])
+
+
+def send_all(resource, results, max_in_flight):
+    """Send the command of every :class:`CommandResult` in order and collect its reply.
+
+    At most ``max_in_flight`` commands wait for their reply, older ones are
+    collected before more are sent. A broken connection fails all commands
+    not answered yet.
+    """
+    in_flight = collections.deque()
+    connection_error = None
+    for result in results:
+        while connection_error is None and len(in_flight) >= max_in_flight:
+            oldest = in_flight.popleft()
+            oldest.collect()
+            connection_error = oldest.connection_error
+        if connection_error is not None:
+            result.set_error(connection_error)
+            continue
+        result.send(resource)
+        connection_error = result.connection_error
+        in_flight.append(result)
+    for result in in_flight:
+        if connection_error is not None:
+            result.set_error(connection_error)
+            continue
+        result.collect()
+        connection_error = result.connection_error
+
+
+class CommandResult(object):
+    """Result of one command sent by :meth:`RouterOsBinaryResource.call_many` and alike.
+
+    ``error`` holds the exception the command failed with instead of raising it.
+    """
+
+    def __init__(self, command, arguments):
+        self.command = command
+        self.arguments = arguments
+        self.promise = None
+        self.response = None
+        self.error = None
+        self.done = False
+
+    def send(self, resource):
+        try:
+            self.promise = resource.call_async(self.command, self.arguments)
+        except exceptions.RouterOsApiError as e:
+            self.set_error(e)
+
+    def collect(self):
+        if not self.done:
+            try:
+                self.response = self.promise.get()
+            except exceptions.RouterOsApiError as e:
+                self.error = e
+            self.done = True
+
+    def set_error(self, error):
+        if not self.done:
+            self.error = error
+            self.done = True
+
+    def get(self):
+        self.collect()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    @property
+    def ret(self):
+        """Value returned by the command, e.g. the id of an added row."""
+        return self.get().done_message.get('ret')
+
+    @property
+    def connection_error(self):
+        if isinstance(self.error, (exceptions.RouterOsApiConnectionError, exceptions.FatalRouterOsApiError)):
+            return self.error
+        return None
+
+    def __repr__(self):
+        return '{}({}, {!r})'.format(type(self).__name__, self.command, self.arguments)
+
+
+class PlannedChange(CommandResult):
+    """One command of a :class:`ReconcilePlan` and, once applied, its result."""
+
+    def __init__(self, command, arguments, key):
+        super(PlannedChange, self).__init__(command, arguments)
+        self.key = key
+
+
+class RowDecoder(object):
+    """Builds a typed row straight from the received attribute words.
+
+    Every raw key is compiled once into its interned name and the converter
+    of its field, so large results share their key strings.
+    """
+
+    def __init__(self, structure):
+        self.structure = structure
+        self.schema = {}
+        self.keys = {}
+
+    def __call__(self, row):
+        schema = self.schema
+        decoded = {}
+        for key, value in row.items():
+            try:
+                name, converter = schema[key]
+            except KeyError:
+                name, converter = self.compile(key)
+            if value is None:
+                decoded[name] = None
+            else:
+                decoded[name] = converter(value)
+        return decoded
+
+    def compile(self, key):
+        name = sys.intern(key_cleaner_decorator.decode_key(key).decode())
+        compiled = self.schema[key] = (name, self.structure[name].get_python_value)
+        self.keys[name] = key
+        return compiled
+
+
+class LazyRowDecoder(RowDecoder):
+    """Wraps received rows in :class:`LazyRow` instead of converting them."""
+
+    def __call__(self, row):
+        return LazyRow(row, self)
+
+
+class LazyRow(collections.abc.Mapping):
+    """Read-only row converting each value through its field on first access.
+
+    ``dict(row)`` gives the same result as an eagerly decoded row.
+    """
+
+    __slots__ = ('raw', 'decoder', 'values')
+
+    def __init__(self, raw, decoder):
+        self.raw = raw
+        self.decoder = decoder
+        self.values = {}
+
+    def __getitem__(self, name):
+        values = self.values
+        if name in values:
+            return values[name]
+        key = self.decoder.keys.get(name)
+        if key not in self.raw:
+            key = self.get_raw_key(name)
+        value = self.raw[key]
+        if value is not None:
+            value = self.decoder.schema[key][1](value)
+        values[name] = value
+        return value
+
+    def get_raw_key(self, name):
+        key = self.decoder.keys.get(name)
+        if key not in self.raw:
+            # Names are only known once the keys of the row have been compiled.
+            for raw_key in self.raw:
+                if raw_key not in self.decoder.schema:
+                    self.decoder.compile(raw_key)
+            key = self.decoder.keys.get(name)
+            if key not in self.raw:
+                raise KeyError(name)
+        return key
+
+    def __contains__(self, name):
+        try:
+            self.get_raw_key(name)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        schema = self.decoder.schema
+        for key in self.raw:
+            try:
+                yield schema[key][0]
+            except KeyError:
+                yield self.decoder.compile(key)[0]
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, dict(self))
+
+
+class Columns(collections.abc.Mapping):
+    """Rows of a result stored as one sequence per column.
+
+    Columns of ``IntegerField`` fields are ``array('q')``, the others lists.
+    ``masks[name]`` holds 1 for every row that has the column; missing cells
+    hold 0 or None.
+    """
+
+    def __init__(self, decoder):
+        self.decoder = decoder
+        self.columns = {}
+        self.masks = {}
+        self.row_count = 0
+
+    def append(self, row):
+        schema = self.decoder.schema
+        index = self.row_count
+        for key, value in row.items():
+            try:
+                name, converter = schema[key]
+            except KeyError:
+                name, converter = self.decoder.compile(key)
+            column = self.columns.get(name)
+            if column is None:
+                column = self.add_column(name)
+            mask = self.masks[name]
+            if len(mask) < index:
+                self.pad(name, index)
+            if value is None:
+                column.append(self.get_missing_value(column))
+                mask.append(0)
+            else:
+                column.append(converter(value))
+                mask.append(1)
+        self.row_count = index + 1
+
+    def add_column(self, name):
+        if isinstance(self.decoder.structure[name], api_structure.IntegerField):
+            column = array.array('q')
+        else:
+            column = []
+        self.columns[name] = column
+        self.masks[name] = bytearray()
+        return column
+
+    def pad(self, name, length):
+        column = self.columns[name]
+        missing = length - len(column)
+        column.extend([self.get_missing_value(column)] * missing)
+        self.masks[name].extend(bytes(missing))
+
+    def get_missing_value(self, column):
+        return 0 if isinstance(column, array.array) else None
+
+    def finish(self):
+        for name in self.columns:
+            self.pad(name, self.row_count)
+        return self
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __repr__(self):
+        return '{}({} rows, columns={!r})'.format(type(self).__name__, self.row_count, list(self.columns))
+
+
 class TypedPromiseDecorator(object):
     def __init__(self, inner, structure):
         self.inner = inner
@@ -83,10 +579,16 @@ class TypedPromiseDecorator(object):
     def __iter__(self):
         return map(self.transform_dictionary, self.inner)
 
-    def get(self):
-        response = self.inner.get()
+    def stream(self, max_buffered=None):
+        return map(self.transform_dictionary, self.inner.stream(max_buffered))
+
+    def get(self, timeout=None):
+        response = self.inner.get(timeout)
         return response.map(self.transform_dictionary)
 
+    def cancel(self):
+        self.inner.cancel()
+
     def transform_dictionary(self, row):
         return dict(self.transform_item(item) for item in row.items())
 
@@ -98,6 +600,22 @@ class TypedPromiseDecorator(object):
             return (key, self.structure[key].get_python_value(value))
 
 
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def join_ids(ids):
+    if isinstance(ids[0], bytes):
+        return b','.join(ids)
+    else:
+        return ','.join(ids)
+
+
 def clean_path(path):
     if not path.endswith('/'):
         path += '/'
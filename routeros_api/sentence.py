@@ -1,11 +1,12 @@
-import re
-
 from routeros_api import exceptions
 from routeros_api import query
 
-response_re = re.compile(rb'^!(re|trap|fatal|empty|done)$')
-attribute_re = re.compile(rb'^=([^=]+)=(.*)$', re.DOTALL)
-tag_re = re.compile(rb'^\.tag=(.*)$')
+# First words of a response mapped to its type. Like ``$`` of the regular
+# expression used before, a single trailing newline is accepted.
+response_types = dict(
+    (b'!' + response_type + suffix, response_type)
+    for response_type in [b're', b'trap', b'fatal', b'empty', b'done']
+    for suffix in [b'', b'\n'])
 
 
 class ResponseSentence(object):
@@ -16,9 +17,9 @@ class ResponseSentence(object):
 
     @classmethod
     def parse(cls, sentence):
-        response_match = response_re.match(sentence[0])
-        if response_match:
-            response = cls(response_match.group(1))
+        response_type = response_types.get(sentence[0])
+        if response_type is not None:
+            response = cls(response_type)
             response.parse_attributes(sentence[1:])
         else:
             raise exceptions.RouterOsApiParsingError("Malformed sentence %s",
@@ -26,14 +27,14 @@ class ResponseSentence(object):
         return response
 
     def parse_attributes(self, serialized_attributes):
+        attributes = self.attributes
+        process_value = self.process_value
         for serialized in serialized_attributes:
-            attribute_match = attribute_re.match(serialized)
-            tag_match = tag_re.match(serialized)
-            if attribute_match:
-                key, value = attribute_match.groups()
-                self.attributes[key] = self.process_value(value)
-            elif tag_match:
-                self.tag = tag_match.group(1)
+            parts = serialized.split(b'=', 2)
+            if len(parts) == 3 and not parts[0] and parts[1]:
+                attributes[parts[1]] = process_value(parts[2])
+            elif parts[0] == b'.tag' and len(parts) > 1:
+                self.tag = parse_tag(serialized)
             else:
                 raise exceptions.RouterOsApiParsingError(
                     "Malformed attribute %s", serialized)
@@ -48,7 +49,7 @@ class CommandSentence(object):
         self.command = command
         self.attributes = {}
         self.api_attributes = {}
-        self.queries = set()
+        self.queries = []
         self.tag = tag
 
     def get_api_format(self):
@@ -70,12 +71,22 @@ class CommandSentence(object):
     def filter(self, *args, **kwargs):
         for arg in args:
             if hasattr(arg, 'get_api_format'):
-                self.queries.add(arg)
+                self.queries.append(arg)
             else:
-                self.queries.add(query.HasValueQuery(arg))
+                self.queries.append(query.HasValueQuery(arg))
 
         for key, value in kwargs.items():
-            self.queries.add(query.IsEqualQuery(key, value))
+            self.queries.append(query.IsEqualQuery(key, value))
 
     def __str__(self):
         return str(b' '.join(self.get_api_format()))
+
+
+def parse_tag(serialized):
+    tag = serialized[5:]
+    if tag[-1:] == b'\n':
+        tag = tag[:-1]
+    if b'\n' in tag:
+        raise exceptions.RouterOsApiParsingError(
+            "Malformed attribute %s", serialized)
+    return tag
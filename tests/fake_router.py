@@ -0,0 +1,40 @@
+import socket
+import threading
+
+from routeros_api import protocol
+
+
+class FakeRouter(object):
+    """Local stand-in for a router, answering commands over a socket pair.
+
+    ``handler`` is called with the words of every received command and
+    returns the sentences to send back.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.client_socket, self.server_socket = socket.socketpair()
+        self.reader = protocol.SentenceReader()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        try:
+            while True:
+                data = self.server_socket.recv(64 * 1024)
+                if not data:
+                    return
+                self.reader.feed(data)
+                for words in self.reader.read_sentences():
+                    replies = self.handler(words)
+                    if replies:
+                        self.server_socket.sendall(b''.join(map(protocol.encode_sentence, replies)))
+        except OSError:
+            pass
+
+    def close(self):
+        try:
+            self.server_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server_socket.close()
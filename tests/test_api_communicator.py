@@ -1,3 +1,5 @@
+import threading
+
 from unittest import TestCase
 
 try:
@@ -6,7 +8,10 @@ except ImportError:
     import mock
 
 from routeros_api import api_communicator
+from routeros_api import api_socket
+from routeros_api import base_api
 from routeros_api import exceptions
+from tests import fake_router
 
 
 class TestCommunicator(TestCase):
@@ -100,3 +105,218 @@ class TestCommunicator(TestCase):
         communicator.call('/interface/', 'print').get()
         self.assertRaises(exceptions.RouterOsApiCommunicationError,
                           promise.get)
+
+    def test_streaming_drops_consumed_rows(self):
+        base = mock.Mock()
+        base.receive_sentence.side_effect = [[b'!re', b'=x=1', b'.tag=1'],
+                                             [b'!re', b'=x=2', b'.tag=1'],
+                                             [b'!done', b'.tag=1']]
+        communicator = api_communicator.ApiCommunicator(base)
+        stream = communicator.call('/interface/', 'monitor').stream()
+        self.assertEqual(next(stream), {'x': b'1'})
+        self.assertEqual(len(communicator.communicator.response_buffor[b'1'].rows), 0)
+        self.assertEqual(next(stream), {'x': b'2'})
+        self.assertRaises(StopIteration, next, stream)
+        self.assertNotIn(b'1', communicator.communicator.response_buffor)
+
+    def test_streaming_bounded_queue_drops_oldest_rows(self):
+        base = mock.Mock()
+        base.receive_sentence.side_effect = [[b'!re', b'=x=1', b'.tag=1'],
+                                             [b'!re', b'=x=2', b'.tag=1'],
+                                             [b'!re', b'=x=3', b'.tag=1'],
+                                             [b'!done', b'.tag=2'],
+                                             [b'!re', b'=x=4', b'.tag=1'],
+                                             [b'!done', b'.tag=1']]
+        communicator = api_communicator.ApiCommunicator(base)
+        promise = communicator.call('/interface/', 'monitor')
+        communicator.communicator.start_streaming(b'1', max_buffered=2)
+        buffered = communicator.communicator.response_buffor[b'1']
+        communicator.call('/interface/', 'print').get()
+        self.assertEqual(list(promise.stream(max_buffered=2)), [{'x': b'2'}, {'x': b'3'}, {'x': b'4'}])
+        self.assertEqual(buffered.dropped, 1)
+
+    def test_streaming_error(self):
+        base = mock.Mock()
+        base.receive_sentence.side_effect = [[b'!re', b'=x=1', b'.tag=1'],
+                                             [b'!trap', b'=message=m', b'.tag=1'],
+                                             [b'!done', b'.tag=1']]
+        communicator = api_communicator.ApiCommunicator(base)
+        stream = communicator.call('/tool/', 'torch').stream()
+        self.assertEqual(next(stream), {'x': b'1'})
+        self.assertRaises(exceptions.RouterOsApiCommunicationError, next, stream)
+
+    def test_cancel(self):
+        base = mock.Mock()
+        base.receive_sentence.side_effect = [[b'!re', b'=x=1', b'.tag=1'],
+                                             [b'!re', b'=x=2', b'.tag=1'],
+                                             [b'!trap', b'=category=2', b'=message=interrupted', b'.tag=1'],
+                                             [b'!done', b'.tag=1'],
+                                             [b'!done', b'.tag=2'],
+                                             [b'!done', b'.tag=3']]
+        communicator = api_communicator.ApiCommunicator(base)
+        promise = communicator.call('/interface/', 'monitor-traffic')
+        stream = promise.stream()
+        self.assertEqual(next(stream), {'x': b'1'})
+        promise.cancel()
+        base.send_sentence.assert_called_with([b'/cancel', b'=tag=1', b'.tag=2'])
+        self.assertRaises(exceptions.RouterOsApiCommunicationError, promise.get)
+        self.assertEqual(communicator.call('/interface/', 'print').get(), [])
+        self.assertEqual(communicator.communicator.tombstones, set())
+        self.assertEqual(communicator.communicator.response_buffor, {})
+
+    def test_abandoned_stream_is_cancelled(self):
+        base = mock.Mock()
+        base.receive_sentence.side_effect = [[b'!re', b'=x=1', b'.tag=1']]
+        communicator = api_communicator.ApiCommunicator(base)
+        stream = communicator.call('/interface/', 'monitor-traffic').stream()
+        next(stream)
+        del stream
+        base.send_sentence.assert_called_with([b'/cancel', b'=tag=1', b'.tag=2'])
+
+    def test_cancel_finished_command(self):
+        base = mock.Mock()
+        base.receive_sentence.side_effect = [[b'!done', b'.tag=1']]
+        communicator = api_communicator.ApiCommunicator(base)
+        promise = communicator.call('/interface/', 'print')
+        self.assertEqual(list(promise), [])
+        promise.cancel()
+        self.assertEqual(base.send_sentence.call_count, 1)
+
+    def test_unknown_tag_is_fatal(self):
+        base = mock.Mock()
+        base.receive_sentence.side_effect = [[b'!re', b'=x=1', b'.tag=7']]
+        communicator = api_communicator.ApiCommunicator(base)
+        self.assertRaises(exceptions.FatalRouterOsApiError, communicator.call('/interface/', 'print').get)
+
+    def test_prepared_call(self):
+        base = mock.Mock()
+        base.receive_sentence.side_effect = [[b'!re', b'=x=1', b'.tag=1'], [b'!done', b'.tag=1'],
+                                             [b'!re', b'=x=2', b'.tag=2'], [b'!done', b'.tag=2']]
+        communicator = api_communicator.ApiCommunicator(base)
+        prepared = communicator.prepare('/interface/', 'print', arguments={'proplist': b'x'},
+                                        queries={'name': b'ether1', 'type': b'ether'})
+        self.assertEqual(communicator.call_prepared(prepared).get(), [{'x': b'1'}])
+        self.assertEqual(communicator.call_prepared(prepared).get(), [{'x': b'2'}])
+        words = [b'/interface/print', b'=.proplist=x', b'?name=ether1', b'?type=ether']
+        self.assertEqual(base.send_encoded_sentence.mock_calls, [
+            mock.call(base_api.encode_sentence(words + [b'.tag=1'])),
+            mock.call(base_api.encode_sentence(words + [b'.tag=2'])),
+        ])
+
+
+class TestCommandTimeout(TestCase):
+    def setUp(self):
+        self.router = fake_router.FakeRouter(self.reply)
+        self.client = api_socket.SocketWrapper(self.router.client_socket)
+        self.pending = []
+
+    def tearDown(self):
+        self.client.close()
+        self.router.close()
+
+    def reply(self, words):
+        """Leave ``/interface/monitor-traffic`` running until it is cancelled."""
+        tag = words[-1]
+        if words[0] == b'/interface/monitor-traffic':
+            self.pending.append(tag)
+            return []
+        if words[0] == b'/cancel':
+            interrupted = self.pending.pop()
+            return [[b'!trap', b'=category=2', b'=message=interrupted', interrupted], [b'!done', interrupted],
+                    [b'!done', tag]]
+        return [[b'!re', b'=name=ether1', tag], [b'!done', tag]]
+
+    def check_timeout(self, communicator):
+        promise = communicator.call('/interface/', 'monitor-traffic')
+        self.assertRaises(exceptions.RouterOsApiTimeoutError, promise.get, 0.05)
+        self.assertRaises(exceptions.RouterOsApiCommunicationError, promise.get)
+        # The command was cancelled and the connection is still usable.
+        self.assertEqual(communicator.call('/interface/', 'print').get(1), [{'name': b'ether1'}])
+        self.assertEqual(self.pending, [])
+        self.assertEqual(communicator.communicator.tombstones, set())
+
+    def test_timeout(self):
+        self.check_timeout(api_communicator.ApiCommunicator(base_api.Connection(self.client)))
+
+    def test_threaded_timeout(self):
+        self.check_timeout(api_communicator.ApiCommunicator(base_api.Connection(self.client), threaded=True))
+
+
+class TestThreadedCommunicator(TestCase):
+    def setUp(self):
+        self.commands = []
+        self.commands_count = 1
+        self.router = fake_router.FakeRouter(self.reply_in_reverse_order)
+        self.client = api_socket.SocketWrapper(self.router.client_socket)
+        self.communicator = api_communicator.ApiCommunicator(base_api.Connection(self.client), threaded=True)
+
+    def tearDown(self):
+        self.client.close()
+        self.router.close()
+
+    def reply_in_reverse_order(self, words):
+        """Collect ``commands_count`` commands, then answer them in reverse order."""
+        self.commands.append(words)
+        if len(self.commands) < self.commands_count:
+            return []
+        replies = []
+        for words in reversed(self.commands):
+            tag = words[-1]
+            name = b''.join(word[6:] for word in words if word.startswith(b'?name='))
+            replies.append([b'!re', b'=name=' + name, tag])
+            replies.append([b'!done', tag])
+        return replies
+
+    def test_threads_share_connection(self):
+        self.commands_count = 20
+        results = {}
+        barrier = threading.Barrier(20)
+
+        def work(index):
+            name = 'ether{}'.format(index)
+            promise = self.communicator.call('/interface/', 'print', queries={'name': name})
+            barrier.wait()
+            results[name] = promise.get()
+
+        workers = [threading.Thread(target=work, args=(index,)) for index in range(20)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(results), 20)
+        for name, response in results.items():
+            self.assertEqual(response, [{'name': name.encode()}])
+
+    def test_iterating(self):
+        rows = list(self.communicator.call('/interface/', 'print', queries={'name': 'ether1'}))
+        self.assertEqual(rows, [{'name': b'ether1'}])
+
+    def test_prepared_call(self):
+        prepared = self.communicator.prepare('/interface/', 'print', queries={'name': b'ether2'})
+        self.assertEqual(self.communicator.call_prepared(prepared).get(), [{'name': b'ether2'}])
+
+    def test_cancel_wakes_up_waiting_thread(self):
+        self.commands_count = 3
+        promise = self.communicator.call('/interface/', 'print', queries={'name': 'ether1'})
+        errors = []
+
+        def wait():
+            try:
+                promise.get()
+            except exceptions.RouterOsApiCommunicationError as e:
+                errors.append(e)
+        waiting = threading.Thread(target=wait)
+        waiting.start()
+        self.communicator.communicator.cancel(b'1')
+        waiting.join()
+        self.assertEqual(len(errors), 1)
+        # Late replies to the cancelled command do not break the connection.
+        self.assertEqual(self.communicator.call('/interface/', 'print', queries={'name': 'ether3'}).get(),
+                         [{'name': b'ether3'}])
+
+    def test_closed_connection_wakes_up_waiting_threads(self):
+        self.commands_count = 2
+        promise = self.communicator.call('/interface/', 'print')
+        self.router.close()
+        self.assertRaises(exceptions.RouterOsApiConnectionError, promise.get)
+        self.assertRaises(exceptions.RouterOsApiConnectionError, self.communicator.call, '/interface/', 'print')
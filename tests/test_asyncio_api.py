@@ -0,0 +1,229 @@
+import asyncio
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from routeros_api import api
+from routeros_api import asyncio_api
+from routeros_api import base_api
+from routeros_api import exceptions
+from routeros_api.api_communicator import asyncio_communicator
+
+
+def encode_replies(*sentences):
+    return b''.join(base_api.encode_sentence(words) for words in sentences)
+
+
+class AsyncioApiTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.reader = asyncio.StreamReader()
+        self.writer = mock.Mock()
+        self.writer.drain = mock.AsyncMock()
+        base = base_api.AsyncConnection(self.reader, self.writer)
+        self.communicator = asyncio_communicator.AsyncioApiCommunicator(base)
+        self.api = asyncio_api.AsyncRouterOsApi(self.communicator)
+
+    def tearDown(self):
+        self.communicator.close()
+
+    def reply(self, *sentences):
+        self.reader.feed_data(encode_replies(*sentences))
+
+    async def test_call(self):
+        promise = self.api.get_binary_resource('/interface').call('print')
+        self.reply([b'!re', b'=.id=*1', b'=name=ether1', b'.tag=1'], [b'!done', b'.tag=1'])
+        self.assertEqual(await promise, [{'id': b'*1', 'name': b'ether1'}])
+        self.writer.write.assert_called_once_with(
+            base_api.encode_sentence([b'/interface/print', b'.tag=1']))
+
+    async def test_typed_get(self):
+        self.reply([b'!re', b'=name=ether1', b'.tag=1'], [b'!done', b'.tag=1'])
+        response = await self.api.get_resource('/interface').get(name='ether1')
+        self.assertEqual(response, [{'name': 'ether1'}])
+        self.writer.write.assert_called_once_with(
+            base_api.encode_sentence([b'/interface/print', b'?name=ether1', b'.tag=1']))
+
+    async def test_add(self):
+        self.reply([b'!done', b'=ret=*A', b'.tag=1'])
+        response = await self.api.get_resource('/ip/address').add(address='10.0.0.1/24', interface='ether1')
+        self.assertEqual(response.done_message, {'ret': '*A'})
+
+    async def test_concurrent_calls_are_multiplexed(self):
+        first = asyncio.ensure_future(self.api.get_resource('/interface').get())
+        second = asyncio.ensure_future(self.api.get_resource('/ip/address').get())
+        await asyncio.sleep(0)
+        self.reply(
+            [b'!re', b'=address=10.0.0.1/24', b'.tag=2'],
+            [b'!re', b'=name=ether1', b'.tag=1'],
+            [b'!done', b'.tag=2'],
+            [b'!done', b'.tag=1'],
+        )
+        self.assertEqual(await first, [{'name': 'ether1'}])
+        self.assertEqual(await second, [{'address': '10.0.0.1/24'}])
+
+    async def test_async_for(self):
+        promise = self.api.get_resource('/interface').call_async('monitor-traffic', {'interface': 'ether1'})
+        self.reply([b'!re', b'=rx-bits-per-second=1', b'.tag=1'])
+        rows = []
+        async for row in promise:
+            rows.append(row)
+            if len(rows) == 1:
+                self.reply([b'!re', b'=rx-bits-per-second=2', b'.tag=1'], [b'!done', b'.tag=1'])
+        self.assertEqual(rows, [{'rx-bits-per-second': '1'}, {'rx-bits-per-second': '2'}])
+
+    async def test_get_columns(self):
+        self.reply([b'!re', b'=name=ether1', b'.tag=1'], [b'!re', b'=name=ether2', b'.tag=1'], [b'!done', b'.tag=1'])
+        columns = await self.api.get_resource('/interface').get_columns()
+        self.assertEqual(columns['name'], ['ether1', 'ether2'])
+        self.assertEqual(columns.masks['name'], bytearray([1, 1]))
+
+    async def test_prepared_call(self):
+        prepared = self.api.get_resource('/interface').prepare('print', queries={'name': 'ether1'})
+        self.reply([b'!re', b'=name=ether1', b'.tag=1'], [b'!done', b'.tag=1'])
+        self.assertEqual(await prepared.call(), [{'name': 'ether1'}])
+        self.writer.write.assert_called_once_with(
+            base_api.encode_sentence([b'/interface/print', b'?name=ether1', b'.tag=1']))
+
+    async def test_cancel(self):
+        promise = self.api.get_resource('/interface').call_async('monitor-traffic', {'interface': 'ether1'})
+        self.reply([b'!re', b'=rx-bits-per-second=1', b'.tag=1'])
+        stream = promise.stream()
+        self.assertEqual(await stream.__anext__(), {'rx-bits-per-second': '1'})
+        await stream.aclose()
+        self.writer.write.assert_called_with(base_api.encode_sentence([b'/cancel', b'=tag=1', b'.tag=2']))
+        self.reply(
+            [b'!trap', b'=category=2', b'=message=interrupted', b'.tag=1'],
+            [b'!done', b'.tag=1'],
+            [b'!done', b'.tag=2'],
+            [b'!done', b'.tag=3'],
+        )
+        self.assertEqual(await self.api.get_resource('/interface').get(), [])
+        with self.assertRaises(exceptions.RouterOsApiCommunicationError):
+            await promise.get()
+
+    async def test_timeout(self):
+        promise = self.api.get_resource('/interface').call_async('monitor-traffic', {'interface': 'ether1'})
+        with self.assertRaises(exceptions.RouterOsApiTimeoutError):
+            await promise.get(0.01)
+        self.writer.write.assert_called_with(base_api.encode_sentence([b'/cancel', b'=tag=1', b'.tag=2']))
+        self.reply(
+            [b'!trap', b'=category=2', b'=message=interrupted', b'.tag=1'],
+            [b'!done', b'.tag=1'],
+            [b'!done', b'.tag=2'],
+            [b'!done', b'.tag=3'],
+        )
+        self.assertEqual(await self.api.get_resource('/interface').get(reply_timeout=1), [])
+
+    async def test_reconcile(self):
+        replies = [
+            [
+                [b'!re', b'=.id=*1', b'=name=a', b'=max-limit=1M/1M', b'.tag=1'],
+                [b'!re', b'=.id=*2', b'=name=b', b'=max-limit=1M/1M', b'.tag=1'],
+                [b'!done', b'.tag=1'],
+            ],
+            [[b'!done', b'.tag=2']],
+            [[b'!trap', b'=message=invalid value', b'.tag=3'], [b'!done', b'.tag=3']],
+        ]
+        self.writer.write.side_effect = lambda data: self.reply(*replies.pop(0))
+        plan = await self.api.get_resource('/queue/simple').reconcile(
+            [{'name': 'a', 'max_limit': '1M/1M'}, {'name': 'c', 'max_limit': 'x'}], 'name')
+        self.assertEqual([(change.command, change.arguments) for change in plan.changes], [
+            ('remove', {'id': '*2'}),
+            ('add', {'name': 'c', 'max-limit': 'x'}),
+        ])
+        self.assertEqual(plan.changes[0].response, [])
+        self.assertEqual(plan.errors, [plan.changes[1]])
+
+    async def test_add_many(self):
+        replies = [
+            [[b'!done', b'=ret=*1', b'.tag=1']],
+            [[b'!trap', b'=message=failure', b'.tag=2'], [b'!done', b'.tag=2']],
+        ]
+        self.writer.write.side_effect = lambda data: self.reply(*replies.pop(0))
+        results = await self.api.get_resource('/ip/pool').add_many([{'name': 'a'}, {'name': 'b'}], max_in_flight=1)
+        self.assertEqual(results[0].ret, '*1')
+        self.assertIsInstance(results[1].error, exceptions.RouterOsApiCommunicationError)
+
+    async def test_trap(self):
+        self.reply([b'!trap', b'=message=no such item', b'.tag=1'], [b'!done', b'.tag=1'])
+        with self.assertRaises(exceptions.RouterOsApiCommunicationError):
+            await self.api.get_resource('/interface').remove(id='*9')
+
+    async def test_connection_closed(self):
+        promise = self.api.get_resource('/interface').call_async('print')
+        self.reader.feed_eof()
+        with self.assertRaises(exceptions.RouterOsApiConnectionClosedError):
+            await promise
+
+    async def test_connection_error_disconnects_pool(self):
+        pool = asyncio_api.AsyncRouterOsApiPool('host')
+        pool.communicator = self.communicator
+        pool.connected = True
+        self.communicator.add_exception_handler(api.CloseConnectionExceptionHandler(pool))
+        promise = self.api.get_resource('/interface').call_async('print')
+        self.reader.feed_eof()
+        with self.assertRaises(exceptions.RouterOsApiConnectionClosedError):
+            await promise
+        self.assertFalse(pool.connected)
+        self.assertIsNone(pool.communicator)
+
+    async def test_login(self):
+        replies = [
+            [b'!done', b'=ret=00112233445566778899aabbccddeeff', b'.tag=1'],
+            [b'!done', b'.tag=2'],
+        ]
+        self.writer.write.side_effect = lambda data: self.reply(replies.pop(0))
+        await self.api.login('admin', 'password', plaintext_login=False)
+        self.assertEqual(self.writer.write.call_count, 2)
+        self.assertIn(b'=response=00', self.writer.write.call_args[0][0])
+
+
+class TestAsyncRouterOsApiPool(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_get_api_share_one_connection(self):
+        readers = []
+        logins = []
+
+        def answer_login(reader):
+            logins.append(reader)
+            reader.feed_data(encode_replies([b'!done', b'.tag=1']))
+
+        async def open_connection():
+            await asyncio.sleep(0)
+            reader = asyncio.StreamReader()
+            writer = mock.Mock()
+            writer.drain = mock.AsyncMock()
+            # The login is answered a little later, callers must not get the api before.
+            writer.write.side_effect = lambda data: asyncio.get_running_loop().call_later(0.05, answer_login, reader)
+            readers.append(reader)
+            return reader, writer
+
+        async def get_api():
+            routeros_api = await pool.get_api()
+            return routeros_api, len(logins)
+
+        pool = asyncio_api.AsyncRouterOsApiPool('host', plaintext_login=True)
+        self.addCleanup(pool.disconnect)
+        with mock.patch.object(pool, '_open_connection', side_effect=open_connection):
+            results = await asyncio.gather(get_api(), get_api(), get_api())
+        self.assertEqual(len(readers), 1)
+        self.assertEqual(results, [(pool.api, 1)] * 3)
+        self.assertTrue(pool.connected)
+
+    async def test_failed_login_is_not_connected(self):
+        async def open_connection():
+            reader = asyncio.StreamReader()
+            writer = mock.Mock()
+            writer.drain = mock.AsyncMock()
+            writer.write.side_effect = lambda data: reader.feed_data(
+                encode_replies([b'!trap', b'=message=invalid user name or password', b'.tag=1'], [b'!done', b'.tag=1']))
+            return reader, writer
+
+        pool = asyncio_api.AsyncRouterOsApiPool('host', plaintext_login=True)
+        with mock.patch.object(pool, '_open_connection', side_effect=open_connection):
+            with self.assertRaises(exceptions.RouterOsApiCommunicationError):
+                await pool.get_api()
+        self.assertFalse(pool.connected)
+        self.assertIsNone(pool.communicator)
@@ -7,89 +7,56 @@ try:
 except ImportError:
     import mock
 
-try:
-    from StringIO import StringIO as BytesIO
-except ImportError:
-    import io
-    BytesIO = io.BytesIO
-
 from routeros_api import base_api
 
 
+def receiving(*chunks):
+    chunks = list(chunks)
+
+    def recv_into(buffer):
+        chunk = chunks.pop(0)
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+    return recv_into
+
+
 class TestEncodeLength(TestCase):
     def test_zero(self):
-        result = base_api._encode_length(0)
-        expected_number = 0
-        expected_length = 1
-        expected = (expected_number, expected_length)
-        self.assertEqual(expected, result)
+        self.assertEqual(b'\x00', base_api.encode_length(0))
 
     def test_one(self):
-        result = base_api._encode_length(1)
-        expected_number = 1
-        expected_length = 1
-        expected = (expected_number, expected_length)
-        self.assertEqual(expected, result)
+        self.assertEqual(b'\x01', base_api.encode_length(1))
 
     def test_over_0x80(self):
-        result = base_api._encode_length(300)
-        expected_number = 33068
-        expected_length = 2
-        expected = (expected_number, expected_length)
-        self.assertEqual(expected, result)
+        self.assertEqual(b'\x81\x2c', base_api.encode_length(300))
 
     def test_over_0x3FFF(self):
-        result = base_api._encode_length(17000)
-        expected_number = 12599912
-        expected_length = 3
-        expected = (expected_number, expected_length)
-        self.assertEqual(expected, result)
+        self.assertEqual(b'\xc0\x42\x68', base_api.encode_length(17000))
 
     def test_0x10000000(self):
-        result = base_api._encode_length(0x10000000)
-        expected_number = 0xF010000000
-        expected_length = 5
-        expected = (expected_number, expected_length)
-        self.assertEqual(expected, result)
+        self.assertEqual(b'\xf0\x10\x00\x00\x00', base_api.encode_length(0x10000000))
 
     def test_to_big(self):
         self.assertRaises(exceptions.FatalRouterOsApiError,
-                          base_api._encode_length, 0x100000000)
+                          base_api.encode_length, 0x100000000)
 
 
-class TestDecodeLength(TestCase):
+class TestDecodeLengthPrefix(TestCase):
     def test_zero(self):
-        data = BytesIO(b"\x00")
-        self.assertEqual(0, base_api.decode_length(data.read))
+        self.assertEqual((0, 0), base_api.decode_length_prefix(0x00))
 
     def test_over_0x80(self):
-        data = BytesIO(b"\x81\x2c")
-        self.assertEqual(300, base_api.decode_length(data.read))
+        self.assertEqual((1, 1), base_api.decode_length_prefix(0x81))
 
     def test_over_0x3FFF(self):
-        data = BytesIO(b"\xc0\x42\x68")
-        self.assertEqual(17000, base_api.decode_length(data.read))
+        self.assertEqual((0, 2), base_api.decode_length_prefix(0xc0))
 
     def test_0x10000000(self):
-        data = BytesIO(b"\xF0\x10\x00\x00\x00")
-        self.assertEqual(0x10000000, base_api.decode_length(data.read))
+        self.assertEqual((0, 4), base_api.decode_length_prefix(0xf0))
 
     def test_wrong_prefix(self):
-        data = BytesIO(b"\xF8")
         self.assertRaises(exceptions.FatalRouterOsApiError,
-                          base_api.decode_length, data.read)
-
-
-class TestToBytes(TestCase):
-    def test_zero(self):
-        result = base_api.to_bytes(0, 1)
-        expected = b'\x00'
-        self.assertEqual(expected, result)
-
-    def test_multiple_bytes(self):
-        result = base_api.to_bytes(0x1112, 2)
-        expected = b'\x11\x12'
-        self.assertEqual(expected, result)
+                          base_api.decode_length_prefix, 0xf8)
 
 
 class TestConnection(TestCase):
@@ -98,24 +65,51 @@ class TestConnection(TestCase):
         connection = base_api.Connection(socket)
         connection.send_sentence([b'foo', b'bar'])
         expected = [
-            mock.call(b'\x03foo'),
-            mock.call(b'\x03bar'),
-            mock.call(b'\x00'),
+            mock.call(b'\x03foo\x03bar\x00'),
         ]
         self.assertEqual(expected, socket.send.mock_calls)
 
+    def test_coalescing(self):
+        socket = mock.Mock()
+        connection = base_api.Connection(socket)
+        with connection.coalescing():
+            connection.send_sentence([b'foo'])
+            connection.send_sentence([b'bar'])
+            self.assertEqual([], socket.send.mock_calls)
+        self.assertEqual([], socket.send.mock_calls)
+        socket.send_many.assert_called_once_with([b'\x03foo\x00', b'\x03bar\x00'])
+
+    def test_queued_sentences_are_flushed_before_receiving(self):
+        socket = mock.Mock()
+        socket.receive_into.side_effect = receiving(b'\x00')
+        connection = base_api.Connection(socket)
+        connection.queue_sentence([b'foo'])
+        connection.receive_sentence()
+        socket.send.assert_called_once_with(b'\x03foo\x00')
+
+    def test_queue_is_flushed_when_full(self):
+        socket = mock.Mock()
+        connection = base_api.Connection(socket)
+        connection.max_queued_bytes = 12
+        connection.queue_sentence([b'foo'])
+        connection.queue_sentence([b'bar'])
+        self.assertEqual([], socket.send_many.mock_calls)
+        connection.queue_sentence([b'baz'])
+        socket.send_many.assert_called_once_with([b'\x03foo\x00', b'\x03bar\x00', b'\x03baz\x00'])
+
     def test_receiving(self):
         socket = mock.Mock()
-        socket.receive.side_effect = [b'\x03', b'foo', b'\x03', b'bar',
-                                      b'\x00']
+        socket.receive_into.side_effect = receiving(b'\x03fo', b'o\x03', b'bar\x00\x03baz\x00')
         connection = base_api.Connection(socket)
-        result = connection.receive_sentence()
-        self.assertEqual([b'foo', b'bar'], result)
-        expected = [
-            mock.call(1),
-            mock.call(3),
-            mock.call(1),
-            mock.call(3),
-            mock.call(1),
-        ]
-        self.assertEqual(expected, socket.receive.mock_calls)
+        self.assertEqual([b'foo', b'bar'], connection.receive_sentence())
+        self.assertEqual([b'baz'], connection.receive_sentence())
+        self.assertEqual(3, socket.receive_into.call_count)
+
+    def test_receiving_with_deadline(self):
+        socket = mock.Mock()
+        socket.wait_readable.side_effect = [True, False, True]
+        socket.receive_into.side_effect = receiving(b'\x03fo', b'o\x00')
+        connection = base_api.Connection(socket)
+        self.assertRaises(exceptions.RouterOsApiTimeoutError, connection.receive_sentence, 0)
+        # The partial sentence is kept for the next read.
+        self.assertEqual([b'foo'], connection.receive_sentence(0))
@@ -0,0 +1,90 @@
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from routeros_api import api
+from routeros_api import api_communicator
+from routeros_api import api_socket
+from routeros_api import base_api
+from routeros_api import exceptions
+from tests import fake_router
+
+
+class TestBatch(unittest.TestCase):
+    def get_api(self, *replies):
+        base = mock.MagicMock()
+        base.receive_sentence.side_effect = list(replies)
+        communicator = api_communicator.ApiCommunicator(base)
+        return api.RouterOsApi(communicator), base
+
+    def test_commands_are_sent_before_replies_are_read(self):
+        routeros_api, base = self.get_api(
+            [b'!done', b'.tag=1'],
+            [b'!done', b'.tag=2'],
+        )
+        with routeros_api.batch() as batch:
+            queues = batch.get_resource('/queue/simple')
+            queues.set(id='*1', max_limit='1M/1M')
+            queues.set(id='*2', max_limit='2M/2M')
+            self.assertEqual(base.receive_sentence.call_count, 0)
+        self.assertEqual(base.mock_calls[:4], [
+            mock.call.coalescing(),
+            mock.call.coalescing().__enter__(),
+            mock.call.send_sentence([b'/queue/simple/set', b'=.id=*1', b'=max-limit=1M/1M', b'.tag=1']),
+            mock.call.send_sentence([b'/queue/simple/set', b'=.id=*2', b'=max-limit=2M/2M', b'.tag=2']),
+        ])
+        self.assertEqual([result.get() for result in batch.results], [[], []])
+
+    def test_errors_are_reported_per_command(self):
+        routeros_api, _ = self.get_api(
+            [b'!re', b'=name=ether1', b'.tag=1'],
+            [b'!trap', b'=message=no such item', b'.tag=2'],
+            [b'!done', b'.tag=1'],
+            [b'!done', b'.tag=2'],
+        )
+        with routeros_api.batch() as batch:
+            interfaces = batch.get_resource('/interface')
+            first = interfaces.get()
+            second = interfaces.remove(id='*9')
+        self.assertEqual(first.get(), [{'name': 'ether1'}])
+        self.assertIsInstance(second.error, exceptions.RouterOsApiCommunicationError)
+        self.assertRaises(exceptions.RouterOsApiCommunicationError, second.get)
+        self.assertEqual(batch.errors, [second])
+
+    def test_connection_error_fails_remaining_commands(self):
+        routeros_api, _ = self.get_api(exceptions.RouterOsApiConnectionClosedError())
+        with routeros_api.batch() as batch:
+            interfaces = batch.get_binary_resource('/interface')
+            first = interfaces.get()
+            second = interfaces.get()
+        self.assertIsInstance(first.error, exceptions.RouterOsApiConnectionClosedError)
+        self.assertIs(second.error, first.error)
+
+    def test_timeout(self):
+        routeros_api, base = self.get_api()
+        promise = mock.Mock()
+        with routeros_api.batch(timeout=5) as batch:
+            first = batch.append(promise)
+            second = batch.append(promise, timeout=1)
+        self.assertTrue(first.done)
+        self.assertLessEqual(promise.get.mock_calls[0][1][0], 5)
+        self.assertEqual(promise.get.mock_calls[1], mock.call(1))
+        self.assertIs(second.error, None)
+
+    def test_replies_are_read_while_sending(self):
+        router = fake_router.FakeRouter(lambda words: [[b'!done', b'=ret=*1', words[-1]]])
+        self.addCleanup(router.close)
+        client = api_socket.SocketWrapper(router.client_socket)
+        self.addCleanup(client.close)
+        # Both socket buffers fill up if the batch sends everything before reading.
+        client.settimeout(5)
+        routeros_api = api.RouterOsApi(api_communicator.ApiCommunicator(base_api.Connection(client)))
+        with routeros_api.batch(max_in_flight=100) as batch:
+            addresses = batch.get_resource('/ip/address')
+            for index in range(5000):
+                addresses.add(address='10.0.{}.{}/32'.format(index // 256, index % 256), comment='x' * 100)
+        self.assertEqual(batch.errors, [])
+        self.assertEqual(len(batch.results), 5000)
@@ -0,0 +1,89 @@
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from routeros_api import api
+from routeros_api import api_communicator
+from routeros_api.api_communicator import caching_decorator
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.base = mock.MagicMock()
+        self.replies = []
+        self.base.send_sentence.side_effect = self.reply
+        self.base.receive_sentence.side_effect = lambda: self.replies.pop(0)
+        self.cache = caching_decorator.ResponseCache(ttl=10, ttls={'/interface': 0}, max_entries=2)
+        self.api = api.RouterOsApi(api_communicator.ApiCommunicator(self.base, cache=self.cache))
+
+    def reply(self, words):
+        tag = words[-1]
+        if words[0].endswith(b'/print'):
+            self.replies.append([b'!re', b'=name=router', tag])
+        self.replies.append([b'!done', tag])
+
+    def get_sent(self):
+        return [call[1][0] for call in self.base.send_sentence.mock_calls]
+
+    def test_print_is_answered_from_cache(self):
+        identity = self.api.get_resource('/system/identity')
+        self.assertEqual(identity.get(), [{'name': 'router'}])
+        self.assertEqual(identity.get(), [{'name': 'router'}])
+        self.assertEqual(self.base.send_sentence.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_key_includes_queries_and_proplist(self):
+        addresses = self.api.get_resource('/ip/address')
+        addresses.get()
+        addresses.get(interface='ether1')
+        addresses.get(columns=['name'])
+        addresses.get(interface='ether1')
+        self.assertEqual(self.base.send_sentence.call_count, 3)
+
+    def test_write_invalidates_menu_and_submenus(self):
+        self.api.get_resource('/ip/firewall/filter').get()
+        self.api.get_resource('/ip/firewall').add(chain='input')
+        self.api.get_resource('/ip/firewall/filter').get()
+        self.api.get_resource('/ip/firewall/filter').get()
+        self.assertEqual(self.base.send_sentence.call_count, 3)
+        self.assertEqual(self.cache.invalidations, 1)
+
+    def test_response_of_print_sent_before_write_is_not_stored(self):
+        addresses = self.api.get_resource('/ip/address')
+        promise = addresses.get_async()
+        addresses.set_async(id='*1', disabled='yes')
+        promise.get()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_uncached_commands(self):
+        self.api.get_resource('/interface').get()
+        self.api.get_resource('/interface').get()
+        self.api.get_resource('/log').call_async('print', {'follow-only': ''})
+        self.assertEqual(self.base.send_sentence.call_count, 3)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+
+    @mock.patch('routeros_api.api_communicator.caching_decorator.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        monotonic.return_value = 100
+        self.api.get_resource('/system/identity').get()
+        monotonic.return_value = 111
+        self.api.get_resource('/system/identity').get()
+        self.assertEqual(self.base.send_sentence.call_count, 2)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for path in ['/a', '/b', '/a', '/c', '/a', '/b']:
+            self.api.get_resource(path).get()
+        self.assertEqual([call[0] for call in self.get_sent()], [b'/a/print', b'/b/print', b'/c/print', b'/b/print'])
+        self.assertEqual(self.cache.evictions, 2)
+
+    def test_size_limit(self):
+        self.cache.max_bytes = 10
+        self.api.get_resource('/system/identity').get()
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.size, len(b'name') + len(b'router'))
+        self.api.get_resource('/system/clock').get()
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.evictions, 1)
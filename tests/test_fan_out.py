@@ -0,0 +1,105 @@
+import asyncio
+import time
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from routeros_api import api
+from routeros_api import asyncio_api
+from routeros_api import exceptions
+from routeros_api import fan_out
+
+
+def fake_call(pool):
+    if pool.host == 'dead':
+        raise exceptions.RouterOsApiConnectionError('timed out')
+    if pool.host == 'slow':
+        time.sleep(0.2)
+    return [{'name': pool.host}]
+
+
+class TestFanOut(unittest.TestCase):
+    def setUp(self):
+        self.pools = []
+
+        def get_api(pool):
+            self.pools.append(pool)
+            routeros_api = mock.Mock()
+            routeros_api.get_resource.return_value.call.side_effect = lambda *args, **kwargs: fake_call(pool)
+            return routeros_api
+        patcher = mock.patch.object(api.RouterOsApiPool, 'get_api', autospec=True, side_effect=get_api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_results_are_yielded_as_they_complete(self):
+        results = list(fan_out.fan_out(['slow', 'r1', 'dead', 'r2'], '/system/resource', max_workers=4))
+        self.assertEqual([result.host for result in results][-1], 'slow')
+        by_host = dict((result.host, result) for result in results)
+        self.assertEqual(by_host['r1'].get(), [{'name': 'r1'}])
+        self.assertFalse(by_host['dead'].ok)
+        self.assertIsInstance(by_host['dead'].error, exceptions.RouterOsApiConnectionError)
+        self.assertTrue(by_host['slow'].ok)
+
+    def test_concurrency_is_bounded(self):
+        hosts = ['r{}'.format(index) for index in range(50)]
+        results = list(fan_out.fan_out(hosts, '/system/resource', max_workers=3))
+        self.assertEqual(sorted(result.host for result in results), sorted(hosts))
+
+    def test_closing_does_not_wait_for_remaining_hosts(self):
+        results = fan_out.fan_out(['r0', 'slow', 'slow'], '/system/resource', max_workers=1)
+        self.assertEqual(next(results).host, 'r0')
+        started = time.monotonic()
+        results.close()
+        self.assertLess(time.monotonic() - started, 0.15)
+        time.sleep(0.3)
+        # The second slow host was still queued and is never run.
+        self.assertLessEqual(len(self.pools), 2)
+
+    def test_connection_arguments_and_timeouts(self):
+        list(fan_out.fan_out([{'host': 'r1', 'password': 'secret'}], '/system/resource', username='monitor',
+                             connect_timeout=1, login_timeout=2, command_timeout=3))
+        pool, = self.pools
+        self.assertEqual((pool.host, pool.username, pool.password), ('r1', 'monitor', 'secret'))
+        self.assertEqual((pool.connect_timeout, pool.login_timeout, pool.socket_timeout), (1, 2, 3))
+
+
+@mock.patch('routeros_api.api.RouterOsApi.login', mock.Mock())
+@mock.patch('routeros_api.api_socket.get_socket')
+class TestFanOutWithPool(unittest.TestCase):
+    def test_pooled_connections_are_reused(self, get_socket):
+        pool = api.RouterOsApiPool('r1')
+        with mock.patch('routeros_api.resource.RouterOsResource.call', return_value=[]):
+            list(fan_out.fan_out([pool], '/system/resource'))
+            results = list(fan_out.fan_out([pool], '/system/resource'))
+        self.assertTrue(results[0].ok)
+        self.assertEqual(get_socket.call_count, 1)
+        self.assertEqual(len(pool.idle_connections), 1)
+
+
+class TestAsyncFanOut(unittest.IsolatedAsyncioTestCase):
+    async def test_results(self):
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        async def get_api(pool):
+            if pool.host == 'dead':
+                raise exceptions.RouterOsApiConnectionError('timed out')
+            routeros_api = mock.Mock()
+            resource = routeros_api.get_resource.return_value
+            if pool.host == 'slow':
+                resource.call = mock.AsyncMock(side_effect=hang)
+            else:
+                resource.call = mock.AsyncMock(return_value=[{'name': pool.host}])
+            return routeros_api
+
+        with mock.patch.object(asyncio_api.AsyncRouterOsApiPool, 'get_api', autospec=True, side_effect=get_api):
+            results = [result async for result in fan_out.async_fan_out(
+                ['slow', 'r1', 'dead'], '/system/resource', command_timeout=0.1)]
+        by_host = dict((result.host, result) for result in results)
+        self.assertEqual(by_host['r1'].get(), [{'name': 'r1'}])
+        self.assertIsInstance(by_host['dead'].error, exceptions.RouterOsApiConnectionError)
+        self.assertIsInstance(by_host['slow'].error, asyncio.TimeoutError)
+        self.assertEqual(results[-1].host, 'slow')
@@ -0,0 +1,205 @@
+import asyncio
+import socket
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from routeros_api import api
+from routeros_api import api_communicator
+from routeros_api import api_socket
+from routeros_api import asyncio_api
+from routeros_api import base_api
+from routeros_api import exceptions
+from routeros_api import instrumentation
+from routeros_api.api_communicator import asyncio_communicator
+from tests import fake_router
+
+
+def reply(words):
+    tag = words[-1]
+    if words[0] == b'/system/reboot':
+        return []
+    if words[0] == b'/interface/remove':
+        return [[b'!trap', b'=message=no such item', tag], [b'!done', tag]]
+    return [[b'!re', b'=name=ether1', tag], [b'!re', b'=name=ether2', tag], [b'!done', tag]]
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.instrument = instrumentation.install(mock.Mock(spec=instrumentation.Instrument))
+        self.addCleanup(instrumentation.uninstall)
+        self.router = fake_router.FakeRouter(reply)
+        self.addCleanup(self.router.close)
+        self.client = api_socket.SocketWrapper(self.router.client_socket)
+        self.addCleanup(self.client.close)
+
+    def get_api(self, threaded=False):
+        connection = base_api.Connection(self.client, 'r1')
+        return api.RouterOsApi(api_communicator.ApiCommunicator(connection, threaded=threaded))
+
+    def check_command(self, routeros_api):
+        self.assertEqual(len(routeros_api.get_resource('/interface').get()), 2)
+        (host, timing), _ = self.instrument.command_finished.call_args
+        self.assertEqual((host, timing.command, timing.rows, timing.error), ('r1', '/interface/print', 2, None))
+        self.assertTrue(timing.started <= timing.sent <= timing.first_reply <= timing.finished)
+        self.instrument.sentence_sent.assert_called_once_with('r1', 2)
+        self.assertEqual(self.instrument.sentence_received.mock_calls,
+                         [mock.call('r1', 3), mock.call('r1', 3), mock.call('r1', 2)])
+        self.instrument.bytes_sent.assert_called_once_with('r1', len(b'\x11/interface/print\x06.tag=1\x00'))
+
+    def test_command(self):
+        self.check_command(self.get_api())
+        self.assertEqual(self.instrument.in_flight.mock_calls, [mock.call('r1', 1), mock.call('r1', -1)])
+
+    def test_threaded_command(self):
+        self.check_command(self.get_api(threaded=True))
+        self.assertEqual(self.instrument.in_flight.mock_calls, [mock.call('r1', 1), mock.call('r1', -1)])
+
+    def test_commands_of_lost_connection_are_not_in_flight(self):
+        system = self.get_api().get_resource('/system')
+        promises = [system.call_async('reboot'), system.call_async('reboot')]
+        self.router.close()
+        self.assertRaises(exceptions.RouterOsApiConnectionError, promises[0].get)
+        self.assertEqual(self.instrument.in_flight.mock_calls,
+                         [mock.call('r1', 1), mock.call('r1', 1), mock.call('r1', -2)])
+
+    def test_failed_command(self):
+        self.assertRaises(exceptions.RouterOsApiCommunicationError,
+                          self.get_api().get_resource('/interface').remove, id='*9')
+        (_, timing), _ = self.instrument.command_finished.call_args
+        self.assertEqual(timing.error, b'no such item')
+
+    def test_prepared_command(self):
+        interfaces = self.get_api().get_resource('/interface')
+        interfaces.prepare('print').call()
+        self.instrument.sentence_sent.assert_called_once_with('r1', 2)
+        self.assertEqual(self.instrument.command_finished.call_args[0][1].rows, 2)
+
+    def test_nothing_is_measured_when_uninstalled(self):
+        instrumentation.uninstall()
+        routeros_api = self.get_api()
+        routeros_api.get_resource('/interface').get()
+        self.assertEqual(routeros_api.communicator.communicator.timings, {})
+        self.assertEqual(self.instrument.mock_calls, [])
+
+    def test_connect(self):
+        server = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(server.close)
+        api_socket.get_socket('127.0.0.1', server.getsockname()[1]).close()
+        (host, connect_seconds, tls_seconds, tls_resumed), _ = self.instrument.connected.call_args
+        self.assertEqual((host, tls_seconds, tls_resumed), ('127.0.0.1', None, None))
+        port = server.getsockname()[1]
+        server.close()
+        self.assertRaises(exceptions.RouterOsApiConnectionError, api_socket.get_socket, '127.0.0.1', port)
+        self.instrument.connect_failed.assert_called_once_with('127.0.0.1', mock.ANY)
+
+    @mock.patch('routeros_api.api.RouterOsApi.login', mock.Mock())
+    @mock.patch('routeros_api.api_socket.get_socket')
+    def test_reconnect(self, get_socket):
+        pool = api.RouterOsApiPool('r1')
+        routeros_api = pool.acquire()
+        pool.close_connection(routeros_api)
+        pool.release(routeros_api)
+        pool.release(pool.acquire())
+        self.instrument.reconnected.assert_called_once_with('r1')
+        pool.release(pool.acquire())
+        self.assertEqual(self.instrument.reconnected.call_count, 1)
+
+    @mock.patch('routeros_api.api.RouterOsApi.login', mock.Mock())
+    @mock.patch('routeros_api.api_socket.get_socket')
+    def test_commands_of_closed_connection_are_not_in_flight(self, get_socket):
+        get_socket.return_value = self.client
+        pool = api.RouterOsApiPool('r1')
+        routeros_api = pool.acquire()
+        self.assertRaises(exceptions.RouterOsApiTimeoutError,
+                          routeros_api.get_resource('/system').call, 'reboot', timeout=0.05)
+        # The reboot and its /cancel are still waiting for replies.
+        self.assertEqual(len(routeros_api.communicator.communicator.timings), 2)
+        pool.close_connection(routeros_api)
+        pool.release(routeros_api)
+        self.assertEqual(sum(change for (_, change), _ in self.instrument.in_flight.call_args_list), 0)
+
+    @mock.patch('routeros_api.api.RouterOsApi.login', mock.Mock())
+    @mock.patch('routeros_api.api_socket.get_socket')
+    def test_reconnect_after_connection_error(self, get_socket):
+        pool = api.RouterOsApiPool('r1')
+        pool.get_api()
+        api.CloseConnectionExceptionHandler(pool).handle(exceptions.RouterOsApiConnectionError())
+        pool.get_api()
+        self.instrument.reconnected.assert_called_once_with('r1')
+
+    @mock.patch('routeros_api.api.RouterOsApi.login', mock.Mock())
+    @mock.patch('routeros_api.api_socket.get_socket')
+    def test_disconnect_is_not_a_lost_connection(self, get_socket):
+        pool = api.RouterOsApiPool('r1')
+        pool.get_api()
+        pool.disconnect()
+        pool.get_api()
+        pool.close()
+        pool.get_api()
+        self.assertEqual(self.instrument.reconnected.mock_calls, [])
+
+
+class TestAsyncioInstrumentation(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.instrument = instrumentation.install(mock.Mock(spec=instrumentation.Instrument))
+        self.addCleanup(instrumentation.uninstall)
+        self.reader = asyncio.StreamReader()
+        self.writer = mock.Mock()
+        self.writer.drain = mock.AsyncMock()
+        connection = base_api.AsyncConnection(self.reader, self.writer, 'r1')
+        self.communicator = asyncio_communicator.AsyncioApiCommunicator(connection)
+        self.api = asyncio_api.AsyncRouterOsApi(self.communicator)
+
+    def get_in_flight(self):
+        return sum(change for (_, change), _ in self.instrument.in_flight.call_args_list)
+
+    async def test_commands_of_lost_connection_are_not_in_flight(self):
+        promise = self.api.get_resource('/interface').call_async('print')
+        self.assertEqual(self.get_in_flight(), 1)
+        self.reader.feed_eof()
+        with self.assertRaises(exceptions.RouterOsApiConnectionClosedError):
+            await promise
+        self.assertEqual(self.get_in_flight(), 0)
+        self.communicator.close()
+
+    async def test_commands_of_closed_connection_are_not_in_flight(self):
+        self.api.get_resource('/interface').call_async('print')
+        self.communicator.close()
+        self.assertEqual(self.get_in_flight(), 0)
+
+
+class TestPrometheusCollector(unittest.TestCase):
+    def setUp(self):
+        self.collector = instrumentation.PrometheusCollector(buckets=[0.1, 1])
+
+    def test_render(self):
+        timing = instrumentation.CommandTiming('/interface/print', 10.0)
+        timing.sent, timing.first_reply, timing.finished, timing.rows = 10.0, 10.5, 12.0, 3
+        self.collector.command_finished('r1', timing)
+        self.collector.bytes_sent('r1', 10)
+        self.collector.bytes_sent('r1', 5)
+        for change in [1, 1, 1, -1]:
+            self.collector.in_flight('r1', change)
+        self.collector.connected('r"2', 0.05, 0.2, True)
+        rendered = self.collector.render()
+        self.assertIn('# TYPE routeros_api_bytes_sent_total counter\n'
+                      'routeros_api_bytes_sent_total{host="r1"} 15\n', rendered)
+        self.assertIn('routeros_api_rows_received_total{command="/interface/print",host="r1"} 3\n', rendered)
+        self.assertIn('routeros_api_commands_in_flight{host="r1"} 2\n', rendered)
+        self.assertIn('routeros_api_tls_handshakes_total{host="r\\"2",resumed="true"} 1\n', rendered)
+        self.assertIn(
+            'routeros_api_command_seconds_bucket{command="/interface/print",host="r1",phase="wait",le="0.1"} 0\n'
+            'routeros_api_command_seconds_bucket{command="/interface/print",host="r1",phase="wait",le="1"} 1\n'
+            'routeros_api_command_seconds_bucket{command="/interface/print",host="r1",phase="wait",le="+Inf"} 1\n'
+            'routeros_api_command_seconds_sum{command="/interface/print",host="r1",phase="wait"} 0.5\n'
+            'routeros_api_command_seconds_count{command="/interface/print",host="r1",phase="wait"} 1\n', rendered)
+        self.assertNotIn('routeros_api_command_errors_total', rendered)
+
+    def test_clear(self):
+        self.collector.reconnected('r1')
+        self.collector.clear()
+        self.assertEqual(self.collector.render(), '')
@@ -0,0 +1,207 @@
+import queue
+import time
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from routeros_api import api
+from routeros_api import api_socket
+from routeros_api import exceptions
+from routeros_api import mirror
+from routeros_api import protocol
+from routeros_api.api_communicator import caching_decorator
+from tests import fake_router
+
+
+class TestMirrorChanges(unittest.TestCase):
+    def setUp(self):
+        self.mirror = mirror.Mirror(mock.Mock(), '/ip/dhcp-server/lease')
+        self.changes = []
+        self.mirror.on_change(self.changes.append)
+        self.mirror.replace([{'id': '*1', 'address': '10.0.0.1'}, {'id': '*2', 'address': '10.0.0.2'}])
+        del self.changes[:]
+
+    def test_update(self):
+        self.mirror.apply({'id': '*1', 'address': '10.0.0.10'})
+        self.assertEqual(self.mirror['*1'], {'id': '*1', 'address': '10.0.0.10'})
+        self.assertEqual([(change.action, change.id) for change in self.changes], [(mirror.UPDATED, '*1')])
+        self.assertEqual(self.changes[0].previous, {'id': '*1', 'address': '10.0.0.1'})
+
+    def test_unchanged_row_is_not_reported(self):
+        self.mirror.apply({'id': '*1', 'address': '10.0.0.1'})
+        self.assertEqual(self.changes, [])
+
+    def test_add_and_remove(self):
+        self.mirror.apply({'id': '*3', 'address': '10.0.0.3'})
+        self.mirror.apply({'id': '*2', '.dead': 'true'})
+        self.mirror.apply({'id': '*4', '.dead': 'true'})
+        self.assertEqual(sorted(self.mirror), ['*1', '*3'])
+        self.assertEqual([(change.action, change.id) for change in self.changes],
+                         [(mirror.ADDED, '*3'), (mirror.REMOVED, '*2')])
+
+    def test_replace_reports_differences(self):
+        self.mirror.replace([{'id': '*2', 'address': '10.0.0.20'}, {'id': '*3', 'address': '10.0.0.3'}])
+        self.assertEqual([(change.action, change.id) for change in self.changes],
+                         [(mirror.REMOVED, '*1'), (mirror.UPDATED, '*2'), (mirror.ADDED, '*3')])
+        self.assertEqual(len(self.mirror), 2)
+
+    def test_failing_callback_does_not_stop_others(self):
+        self.mirror.callbacks.insert(0, mock.Mock(side_effect=ValueError))
+        self.mirror.apply({'id': '*3', 'address': '10.0.0.3'})
+        self.assertEqual(len(self.changes), 1)
+
+
+class LeaseRouter(fake_router.FakeRouter):
+    def __init__(self, leases):
+        self.leases = leases
+        self.follow_tags = queue.Queue()
+        # Number of follow and print commands still to be answered with a !trap.
+        self.follow_traps = 0
+        self.print_traps = 0
+        super(LeaseRouter, self).__init__(self.reply)
+
+    def reply(self, words):
+        tag = words[-1]
+        if b'=follow-only' in words:
+            if self.follow_traps:
+                self.follow_traps -= 1
+                return [[b'!trap', b'=message=no such command', tag], [b'!done', tag]]
+            self.follow_tags.put(tag)
+            return []
+        if words[0] == b'/cancel':
+            return [[b'!done', tag]]
+        if self.print_traps:
+            self.print_traps -= 1
+            return [[b'!trap', b'=message=no such item', tag], [b'!done', tag]]
+        replies = [[b'!re', b'=.id=' + lease_id, b'=address=' + address, tag] for lease_id, address in self.leases]
+        return replies + [[b'!done', tag]]
+
+    def end_follow(self):
+        tag = self.follow_tags.get(timeout=5)
+        self.server_socket.sendall(protocol.encode_sentence([b'!done', tag]))
+
+    def send_change(self, *words):
+        tag = self.follow_tags.get(timeout=5)
+        self.server_socket.sendall(protocol.encode_sentence([b'!re'] + list(words) + [tag]))
+        self.follow_tags.put(tag)
+
+
+@mock.patch('routeros_api.api.RouterOsApi.login', mock.Mock())
+@mock.patch('routeros_api.api_socket.get_socket')
+class TestMirror(unittest.TestCase):
+    def setUp(self):
+        self.routers = []
+        self.changes = queue.Queue()
+
+    def tearDown(self):
+        for router in self.routers:
+            router.close()
+
+    def connect(self, get_socket, *routers, **kwargs):
+        self.routers.extend(routers)
+        get_socket.side_effect = [api_socket.SocketWrapper(router.client_socket) for router in routers]
+        pool = api.RouterOsApiPool('host', **kwargs)
+        self.addCleanup(pool.close)
+        lease_mirror = mirror.Mirror(pool, '/ip/dhcp-server/lease')
+        lease_mirror.retry_interval = 0
+        lease_mirror.on_change(self.changes.put)
+        return lease_mirror
+
+    def get_change(self):
+        change = self.changes.get(timeout=5)
+        return change.action, change.id
+
+    def test_follows_changes(self, get_socket):
+        router = LeaseRouter([(b'*1', b'10.0.0.1')])
+        lease_mirror = self.connect(get_socket, router).start()
+        self.assertTrue(lease_mirror.wait_synced(5))
+        self.assertEqual(self.get_change(), (mirror.ADDED, '*1'))
+        router.send_change(b'=.id=*2', b'=address=10.0.0.2')
+        self.assertEqual(self.get_change(), (mirror.ADDED, '*2'))
+        router.send_change(b'=.id=*1', b'=.dead=true')
+        self.assertEqual(self.get_change(), (mirror.REMOVED, '*1'))
+        self.assertEqual(dict(lease_mirror), {'*2': {'id': '*2', 'address': '10.0.0.2'}})
+        lease_mirror.stop()
+        self.assertFalse(lease_mirror.thread.is_alive())
+        self.assertEqual(lease_mirror.pool.pooled_count, 0)
+
+    def test_resyncs_after_reconnect(self, get_socket):
+        first = LeaseRouter([(b'*1', b'10.0.0.1'), (b'*2', b'10.0.0.2')])
+        second = LeaseRouter([(b'*2', b'10.0.0.2'), (b'*3', b'10.0.0.3')])
+        lease_mirror = self.connect(get_socket, first, second).start()
+        self.assertEqual([self.get_change(), self.get_change()], [(mirror.ADDED, '*1'), (mirror.ADDED, '*2')])
+        first.close()
+        self.assertEqual([self.get_change(), self.get_change()], [(mirror.REMOVED, '*1'), (mirror.ADDED, '*3')])
+        self.assertTrue(lease_mirror.wait_synced(5))
+        self.assertEqual(sorted(lease_mirror), ['*2', '*3'])
+        lease_mirror.stop()
+
+    def test_resync_is_not_answered_from_cache(self, get_socket):
+        first = LeaseRouter([(b'*1', b'10.0.0.1'), (b'*2', b'10.0.0.2')])
+        second = LeaseRouter([(b'*2', b'10.0.0.2'), (b'*3', b'10.0.0.3')])
+        lease_mirror = self.connect(get_socket, first, second, cache=caching_decorator.ResponseCache(ttl=60))
+        lease_mirror.start()
+        self.assertTrue(lease_mirror.wait_synced(5))
+        self.assertEqual([self.get_change(), self.get_change()], [(mirror.ADDED, '*1'), (mirror.ADDED, '*2')])
+        # The print of the first router would be cached for the resync.
+        first.close()
+        self.assertEqual([self.get_change(), self.get_change()], [(mirror.REMOVED, '*1'), (mirror.ADDED, '*3')])
+        self.assertEqual(sorted(lease_mirror), ['*2', '*3'])
+        lease_mirror.stop()
+
+    def test_resyncs_after_retry_interval_when_changes_end(self, get_socket):
+        router = LeaseRouter([(b'*1', b'10.0.0.1')])
+        lease_mirror = self.connect(get_socket, router)
+        lease_mirror.retry_interval = 0.3
+        self.assertTrue(lease_mirror.start().wait_synced(5))
+        router.end_follow()
+        started = time.monotonic()
+        for _ in range(100):
+            if not lease_mirror.synced.is_set():
+                break
+            time.sleep(0.01)
+        self.assertFalse(lease_mirror.synced.is_set())
+        router.follow_tags.get(timeout=5)
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+        self.assertTrue(lease_mirror.wait_synced(5))
+        lease_mirror.stop()
+
+    def test_trap_is_raised_by_wait_synced(self, get_socket):
+        router = LeaseRouter([(b'*1', b'10.0.0.1')])
+        router.print_traps = 1000
+        lease_mirror = self.connect(get_socket, router)
+        lease_mirror.retry_interval = 10
+        lease_mirror.start()
+        with self.assertLogs('routeros_api.mirror', 'ERROR'):
+            self.assertRaises(exceptions.RouterOsApiCommunicationError, lease_mirror.wait_synced, 5)
+        self.assertTrue(lease_mirror.thread.is_alive())
+        lease_mirror.stop()
+        self.assertFalse(lease_mirror.thread.is_alive())
+
+    def test_retries_after_trap(self, get_socket):
+        router = LeaseRouter([(b'*1', b'10.0.0.1')])
+        router.follow_traps = 2
+        lease_mirror = self.connect(get_socket, router)
+        with self.assertLogs('routeros_api.mirror', 'ERROR') as logs:
+            lease_mirror.start()
+            self.assertEqual(self.get_change(), (mirror.ADDED, '*1'))
+            router.send_change(b'=.id=*2', b'=address=10.0.0.2')
+            self.assertEqual(self.get_change(), (mirror.ADDED, '*2'))
+        self.assertEqual(len(logs.records), 2)
+        self.assertTrue(lease_mirror.wait_synced(5))
+        self.assertIsNone(lease_mirror.error)
+        lease_mirror.stop()
+
+    def test_threaded_connection_keeps_no_timeout_after_trap(self, get_socket):
+        router = LeaseRouter([(b'*1', b'10.0.0.1')])
+        router.print_traps = 1
+        lease_mirror = self.connect(get_socket, router, threaded=True)
+        lease_mirror.retry_interval = 10
+        with self.assertLogs('routeros_api.mirror', 'ERROR'):
+            lease_mirror.start()
+            self.assertRaises(exceptions.RouterOsApiCommunicationError, lease_mirror.wait_synced, 5)
+        self.assertIsNone(router.client_socket.gettimeout())
+        lease_mirror.stop()
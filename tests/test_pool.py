@@ -0,0 +1,181 @@
+import threading
+import time
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from routeros_api import api
+from routeros_api import api_socket
+from routeros_api import exceptions
+from tests import fake_router
+
+
+@mock.patch('routeros_api.api.RouterOsApi.login', mock.Mock())
+@mock.patch('routeros_api.api_socket.get_socket')
+class TestRouterOsApiPool(unittest.TestCase):
+    def test_acquire_opens_separate_connections(self, get_socket):
+        pool = api.RouterOsApiPool('host')
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(get_socket.call_count, 2)
+
+    def test_released_connection_is_reused(self, get_socket):
+        pool = api.RouterOsApiPool('host')
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(get_socket.call_count, 1)
+
+    def test_acquire_times_out_when_exhausted(self, get_socket):
+        pool = api.RouterOsApiPool('host', max_size=1)
+        pool.acquire()
+        self.assertRaises(exceptions.RouterOsApiPoolTimeoutError, pool.acquire, timeout=0.01)
+
+    def test_release_wakes_up_waiting_thread(self, get_socket):
+        pool = api.RouterOsApiPool('host', max_size=1)
+        first = pool.acquire()
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+        thread.start()
+        pool.release(first)
+        thread.join()
+        self.assertEqual(acquired, [first])
+
+    def test_broken_connection_is_not_reused(self, get_socket):
+        pool = api.RouterOsApiPool('host')
+        first = pool.acquire()
+        pool.checked_out_connections[first].disconnect()
+        pool.release(first)
+        self.assertIsNot(pool.acquire(), first)
+        self.assertEqual(pool.pooled_count, 1)
+
+    def test_connection_error_marks_connection_broken(self, get_socket):
+        pool = api.RouterOsApiPool('host')
+        first = pool.acquire()
+        error = exceptions.RouterOsApiConnectionClosedError()
+        self.assertRaises(exceptions.RouterOsApiConnectionClosedError,
+                          first.communicator.exception_aware_communicator.handle_exception, error)
+        self.assertTrue(pool.checked_out_connections[first].broken)
+
+    def test_warm_up(self, get_socket):
+        pool = api.RouterOsApiPool('host', min_size=3)
+        pool.warm_up()
+        self.assertEqual(get_socket.call_count, 3)
+        self.assertEqual(len(pool.idle_connections), 3)
+
+    def test_idle_connections_are_evicted(self, get_socket):
+        pool = api.RouterOsApiPool('host', min_size=1, max_idle_time=60, health_check_interval=600)
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first)
+        pool.release(second)
+        for connection in pool.idle_connections:
+            connection.last_used -= 120
+        pool.acquire()
+        self.assertEqual(pool.pooled_count, 1)
+        get_socket.return_value.close.assert_called_once_with()
+
+    def test_failed_health_check_discards_connection(self, get_socket):
+        pool = api.RouterOsApiPool('host', health_check_interval=10)
+        first = pool.acquire()
+        pool.release(first)
+        pool.idle_connections[0].last_used -= 20
+        with mock.patch('routeros_api.resource.RouterOsBinaryResource.call_prepared') as call:
+            call.side_effect = exceptions.RouterOsApiConnectionError()
+            second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.pooled_count, 1)
+
+    def test_failed_login_frees_slot(self, get_socket):
+        pool = api.RouterOsApiPool('host', max_size=1)
+        with mock.patch('routeros_api.api.RouterOsApi.login') as login:
+            login.side_effect = exceptions.RouterOsApiCommunicationError('invalid user', b'invalid user')
+            self.assertRaises(exceptions.RouterOsApiCommunicationError, pool.acquire)
+        self.assertEqual(pool.pooled_count, 0)
+        pool.acquire(timeout=0.01)
+
+    def test_threads_never_exceed_max_size(self, get_socket):
+        pool = api.RouterOsApiPool('host', max_size=2)
+        lock = threading.Lock()
+        in_use = set()
+        peak = []
+
+        def work():
+            for _ in range(20):
+                with pool.connection(timeout=5) as routeros_api:
+                    with lock:
+                        in_use.add(routeros_api)
+                        peak.append(len(in_use))
+                    with lock:
+                        in_use.discard(routeros_api)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(peak), 2)
+        self.assertLessEqual(get_socket.call_count, 2)
+
+
+@mock.patch('routeros_api.api_socket.get_socket')
+class TestThreadedPool(unittest.TestCase):
+    def setUp(self):
+        self.router = fake_router.FakeRouter(lambda words: [[b'!done', words[-1]]])
+        self.addCleanup(self.router.close)
+        self.addCleanup(self.router.client_socket.close)
+
+    def test_idle_connection_outlives_socket_timeout(self, get_socket):
+        get_socket.return_value = api_socket.SocketWrapper(self.router.client_socket)
+        pool = api.RouterOsApiPool('host', plaintext_login=True, threaded=True)
+        pool.socket_timeout = 0.2
+        pool.login_timeout = 2
+        self.addCleanup(pool.close)
+        with pool.connection() as routeros_api:
+            self.assertEqual(routeros_api.get_resource('/interface').get(), [])
+            pool.set_timeout(0.2)
+            time.sleep(0.5)
+            self.assertEqual(routeros_api.get_resource('/interface').get(), [])
+
+    def test_login_to_silent_router_times_out(self, get_socket):
+        silent_routers = [fake_router.FakeRouter(lambda words: []) for _ in range(2)]
+        for silent_router in silent_routers:
+            self.addCleanup(silent_router.close)
+        get_socket.side_effect = [api_socket.SocketWrapper(router.client_socket) for router in silent_routers]
+        pool = api.RouterOsApiPool('host', plaintext_login=True, threaded=True)
+        pool.login_timeout = 0.2
+        started = time.monotonic()
+        self.assertRaises(exceptions.RouterOsApiTimeoutError, pool.get_api)
+        self.assertRaises(exceptions.RouterOsApiTimeoutError, pool.acquire)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(pool.pooled_count, 0)
+
+    def test_health_check_of_silent_router_times_out(self, get_socket):
+        answered = []
+
+        def reply(words):
+            # Only the login is answered.
+            if not answered:
+                answered.append(words)
+                return [[b'!done', words[-1]]]
+            return []
+        silent_router = fake_router.FakeRouter(reply)
+        self.addCleanup(silent_router.close)
+        get_socket.side_effect = [api_socket.SocketWrapper(silent_router.client_socket),
+                                  api_socket.SocketWrapper(self.router.client_socket)]
+        pool = api.RouterOsApiPool('host', plaintext_login=True, threaded=True, health_check_interval=0)
+        pool.socket_timeout = 0.2
+        self.addCleanup(pool.close)
+        pool.release(pool.acquire())
+        started = time.monotonic()
+        routeros_api = pool.acquire()
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(get_socket.call_count, 2)
+        self.assertEqual(routeros_api.get_resource('/interface').get(), [])
+        pool.release(routeros_api)
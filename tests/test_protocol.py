@@ -0,0 +1,83 @@
+from unittest import TestCase
+
+from routeros_api import exceptions
+from routeros_api import protocol
+
+
+class TestLengthPrefixes(TestCase):
+    def test_table_matches_length_matrix(self):
+        masks = [mask for _, mask in protocol.LENGTH_MATRIX] + [protocol.OVER_MAX_LENGTH_MASK]
+        for first in range(256):
+            expected = None
+            for additional_bytes, (mask, next_mask) in enumerate(zip(masks, masks[1:])):
+                if next_mask & first == mask:
+                    expected = (first & ~next_mask, additional_bytes)
+                    break
+            self.assertEqual(expected, protocol.LENGTH_PREFIXES[first])
+
+    def test_encode_length(self):
+        for length in [0, 1, 0x7F, 0x80, 300, 0x3FFF, 0x4000, 17000, 0x1FFFFF, 0x200000, 0xFFFFFFF, 0x10000000]:
+            encoded = protocol.encode_length(length)
+            result, additional_bytes = protocol.decode_length_prefix(encoded[0])
+            self.assertEqual(len(encoded), additional_bytes + 1)
+            for byte in encoded[1:]:
+                result = result << 8 | byte
+            self.assertEqual(result, length)
+
+
+class TestSentenceReader(TestCase):
+    def test_byte_by_byte(self):
+        data = protocol.encode_sentence([b'!re', b'=a=' + b'x' * 300, b'.tag=1']) + protocol.encode_sentence([b'!done'])
+        reader = protocol.SentenceReader()
+        sentences = []
+        for index in range(len(data)):
+            reader.feed(data[index:index + 1])
+            sentences.extend(reader.read_sentences())
+        self.assertEqual([[b'!re', b'=a=' + b'x' * 300, b'.tag=1'], [b'!done']], sentences)
+        self.assertEqual(0, reader.buffered)
+
+    def test_long_word(self):
+        word = b'y' * 0x200000
+        reader = protocol.SentenceReader()
+        reader.feed(protocol.encode_sentence([word]))
+        self.assertEqual([word], reader.read_sentence())
+
+    def test_incomplete_sentence(self):
+        reader = protocol.SentenceReader()
+        reader.feed(b'\x03foo\x03ba')
+        self.assertIsNone(reader.read_sentence())
+        reader.feed(b'r\x00')
+        self.assertEqual([b'foo', b'bar'], reader.read_sentence())
+
+    def test_receive_into(self):
+        data = protocol.encode_sentence([b'!re', b'=a=' + b'x' * 300]) + protocol.encode_sentence([b'!done'])
+        chunks = [data[:100], data[100:]]
+        sizes = []
+
+        def recv_into(view):
+            sizes.append(len(view))
+            chunk = chunks.pop(0)
+            view[:len(chunk)] = chunk
+            return len(chunk)
+        reader = protocol.SentenceReader()
+        self.assertEqual(100, reader.receive_into(recv_into, 128))
+        self.assertIsNone(reader.read_sentence())
+        self.assertEqual(len(data) - 100, reader.receive_into(recv_into, 512))
+        self.assertEqual([[b'!re', b'=a=' + b'x' * 300], [b'!done']], list(reader.read_sentences()))
+        self.assertEqual([128, 512], sizes)
+        self.assertEqual(0, reader.buffered)
+
+    def test_buffer_is_reused(self):
+        def recv_into(view):
+            view[:5] = b'\x03foo\x00'
+            return 5
+        reader = protocol.SentenceReader()
+        for _ in range(20):
+            reader.receive_into(recv_into, 64)
+            self.assertEqual([b'foo'], reader.read_sentence())
+        self.assertEqual(64, len(reader.buffer))
+
+    def test_malformed_length(self):
+        reader = protocol.SentenceReader()
+        reader.feed(b'\xF8')
+        self.assertRaises(exceptions.FatalRouterOsApiError, reader.read_sentence)
@@ -3,11 +3,19 @@ try:
 except ImportError:
     import mock
 
+import array
+import collections
 import unittest
 
+from routeros_api import api_communicator
+from routeros_api import api_socket
 from routeros_api import api_structure as structure
+from routeros_api import base_api
+from routeros_api import exceptions
+from routeros_api import protocol
 from routeros_api import resource
 from routeros_api.api_communicator import base
+from tests import fake_router
 
 STRING_STRUCTURE = {'string': structure.StringField()}
 BYTES_STRUCTURE = {'bytes': structure.BytesField()}
@@ -111,3 +119,261 @@ class TestTypedResource(unittest.TestCase):
         communicator.call.assert_called_with(
             '/boolean/', 'set', arguments={'boolean': b'yes'}, queries={},
             additional_queries=())
+
+
+class TestRowDecoder(unittest.TestCase):
+    def test_decoding(self):
+        decoder = resource.RowDecoder(collections.defaultdict(structure.StringField, BOOLEAN_STRUCTURE))
+        row = decoder({b'.id': b'*1', b'boolean': b'no', b'empty': None})
+        self.assertEqual(row, {'id': '*1', 'boolean': False, 'empty': None})
+
+    def test_keys_are_compiled_once(self):
+        decoder = resource.RowDecoder(collections.defaultdict(structure.StringField, BOOLEAN_STRUCTURE))
+        first = decoder({b'.id': b'*1', b'boolean': b'yes'})
+        second = decoder({b'.id': b'*2', b'boolean': b'no'})
+        self.assertEqual(sorted(decoder.schema), [b'.id', b'boolean'])
+        self.assertIs(list(first)[0], list(second)[0])
+        self.assertEqual(second, {'id': '*2', 'boolean': False})
+
+    def test_resource_decodes_rows_in_one_pass(self):
+        base_api = mock.Mock()
+        base_api.receive_sentence.side_effect = [[b'!re', b'=.id=*1', b'=boolean=yes', b'.tag=1'],
+                                                 [b'!done', b'.tag=1']]
+        some_resource = resource.RouterOsResource(api_communicator.ApiCommunicator(base_api), '/boolean',
+                                                  collections.defaultdict(structure.StringField, BOOLEAN_STRUCTURE))
+        promise = some_resource.get_async()
+        self.assertIs(promise.row_decoder, some_resource.row_decoder)
+        self.assertEqual(promise.get(), [{'id': '*1', 'boolean': True}])
+
+
+class TestLazyRow(unittest.TestCase):
+    def setUp(self):
+        self.converter = mock.Mock(side_effect=lambda value: value.decode().upper())
+        field = mock.Mock()
+        field.get_python_value = self.converter
+        self.decoder = resource.LazyRowDecoder(collections.defaultdict(lambda: field))
+
+    def test_converts_on_first_access_only(self):
+        row = self.decoder({b'.id': b'*1', b'name': b'ether1', b'comment': None})
+        self.assertEqual(0, self.converter.call_count)
+        self.assertEqual('ETHER1', row['name'])
+        self.assertEqual('ETHER1', row['name'])
+        self.assertEqual(1, self.converter.call_count)
+        self.assertIsNone(row['comment'])
+
+    def test_same_as_eager_decoding(self):
+        raw = {b'.id': b'*1', b'name': b'ether1', b'comment': None}
+        row = self.decoder(raw)
+        self.assertEqual(resource.RowDecoder(self.decoder.structure)(raw), dict(row))
+        self.assertEqual(['id', 'name', 'comment'], list(row))
+        self.assertEqual(3, len(row))
+
+    def test_missing_key(self):
+        row = self.decoder({b'name': b'ether1'})
+        self.assertNotIn('comment', row)
+        self.assertIn('name', row)
+        self.assertRaises(KeyError, row.__getitem__, 'comment')
+        self.assertIsNone(row.get('comment'))
+
+    def test_read_only(self):
+        row = self.decoder({b'name': b'ether1'})
+        with self.assertRaises(TypeError):
+            row['name'] = 'ether2'
+
+
+class TestColumns(unittest.TestCase):
+    def test_get_columns(self):
+        base_api = mock.Mock()
+        base_api.receive_sentence.side_effect = [[b'!re', b'=.id=*1', b'=rx-byte=10', b'.tag=1'],
+                                                 [b'!re', b'=.id=*2', b'=comment=x', b'.tag=1'],
+                                                 [b'!re', b'=.id=*3', b'=rx-byte=30', b'.tag=1'],
+                                                 [b'!done', b'.tag=1']]
+        some_resource = resource.RouterOsResource(
+            api_communicator.ApiCommunicator(base_api), '/interface',
+            collections.defaultdict(structure.StringField, {'rx-byte': structure.IntegerField()}))
+        columns = some_resource.get_columns()
+        self.assertEqual(3, columns.row_count)
+        self.assertEqual(['*1', '*2', '*3'], columns['id'])
+        self.assertEqual(array.array('q', [10, 0, 30]), columns['rx-byte'])
+        self.assertEqual(bytearray([1, 0, 1]), columns.masks['rx-byte'])
+        self.assertEqual([None, 'x', None], columns['comment'])
+        self.assertEqual(bytearray([0, 1, 0]), columns.masks['comment'])
+        self.assertEqual(['id', 'rx-byte', 'comment'], list(columns))
+
+
+class TestSelect(unittest.TestCase):
+    def setUp(self):
+        self.base_api = mock.Mock()
+        self.resource = resource.RouterOsResource(
+            api_communicator.ApiCommunicator(self.base_api), '/interface', structure.default_structure)
+
+    def test_get_columns_sends_proplist(self):
+        self.base_api.receive_sentence.side_effect = [[b'!re', b'=.id=*1', b'=rx-byte=10', b'.tag=1'],
+                                                      [b'!done', b'.tag=1']]
+        response = self.resource.get(columns=['id', 'rx_byte'], name='ether1')
+        self.assertEqual([{'id': '*1', 'rx-byte': '10'}], response)
+        self.base_api.send_sentence.assert_called_once_with(
+            [b'/interface/print', b'=.proplist=.id,rx-byte', b'?name=ether1', b'.tag=1'])
+
+    def test_select(self):
+        self.base_api.receive_sentence.side_effect = [[b'!re', b'=name=ether1', b'.tag=1'],
+                                                      [b'!done', b'.tag=1']]
+        selected = self.resource.select('name')
+        self.assertEqual([{'name': 'ether1'}], selected.detailed_get())
+        self.base_api.send_sentence.assert_called_once_with(
+            [b'/interface/print', b'=detail', b'=.proplist=name', b'.tag=1'])
+        self.assertIsNone(self.resource.selected_columns)
+
+    def test_warns_about_columns_not_returned(self):
+        self.base_api.receive_sentence.side_effect = [[b'!re', b'=name=ether1', b'.tag=1'],
+                                                      [b'!done', b'.tag=1']]
+        with self.assertLogs('routeros_api.resource', 'WARNING') as logs:
+            self.resource.get(columns=['name', 'rx-bytes'])
+        self.assertIn('rx-bytes', logs.output[0])
+
+    def test_prepare_selected(self):
+        self.base_api.receive_sentence.side_effect = [[b'!re', b'=name=ether1', b'.tag=1'],
+                                                      [b'!done', b'.tag=1']]
+        prepared = self.resource.select('name').prepare('print', queries={'disabled': 'false'})
+        self.assertEqual([{'name': 'ether1'}], prepared.call())
+        self.base_api.send_encoded_sentence.assert_called_once_with(protocol.encode_sentence(
+            [b'/interface/print', b'=.proplist=name', b'?disabled=false', b'.tag=1']))
+
+
+class TestGet(unittest.TestCase):
+    def setUp(self):
+        self.base_api = mock.Mock()
+        self.resource = resource.RouterOsResource(
+            api_communicator.ApiCommunicator(self.base_api), '/ip/dhcp-server/lease', structure.default_structure)
+        self.base_api.receive_sentence.side_effect = [[b'!re', b'=.id=*1', b'.tag=1'], [b'!done', b'.tag=1']]
+
+    def test_timeout_is_a_query(self):
+        self.assertEqual([{'id': '*1'}], self.resource.get(timeout='1d', reply_timeout=5))
+        self.base_api.send_sentence.assert_called_once_with(
+            [b'/ip/dhcp-server/lease/print', b'?timeout=1d', b'.tag=1'])
+
+
+class TestReconcile(unittest.TestCase):
+    def setUp(self):
+        self.base_api = mock.MagicMock()
+        self.resource = resource.RouterOsResource(
+            api_communicator.ApiCommunicator(self.base_api), '/ip/firewall/address-list', structure.default_structure)
+        self.current = [
+            [b'!re', b'=.id=*1', b'=comment=a', b'=address=10.0.0.1', b'.tag=1'],
+            [b'!re', b'=.id=*2', b'=comment=b', b'=address=10.0.0.2', b'.tag=1'],
+            [b'!re', b'=.id=*3', b'=comment=c', b'=address=10.0.0.3', b'.tag=1'],
+            [b'!re', b'=.id=*4', b'=address=10.0.0.4', b'.tag=1'],
+            [b'!done', b'.tag=1'],
+        ]
+        self.desired = [
+            {'comment': 'a', 'address': '10.0.0.1'},
+            {'comment': 'b', 'address': '10.0.0.20'},
+            {'comment': 'd', 'address': '10.0.0.5'},
+        ]
+
+    def test_dry_run(self):
+        self.base_api.receive_sentence.side_effect = self.current
+        plan = self.resource.reconcile(self.desired, 'comment', queries={'list': 'blocked'}, dry_run=True)
+        self.base_api.send_sentence.assert_called_once_with([
+            b'/ip/firewall/address-list/print', b'=.proplist=.id,comment,address', b'?list=blocked', b'.tag=1'])
+        self.assertEqual([(change.command, change.arguments) for change in plan.changes], [
+            ('remove', {'id': '*3'}),
+            ('set', {'id': '*2', 'address': '10.0.0.20'}),
+            ('add', {'comment': 'd', 'address': '10.0.0.5'}),
+        ])
+        self.assertEqual(repr(plan), 'ReconcilePlan(add=1, set=1, remove=1)')
+
+    def test_changes_are_pipelined(self):
+        self.base_api.receive_sentence.side_effect = self.current + [
+            [b'!done', b'.tag=2'],
+            [b'!trap', b'=message=failure: already have such entry', b'.tag=3'],
+            [b'!done', b'.tag=3'],
+            [b'!done', b'=ret=*5', b'.tag=4'],
+        ]
+        plan = self.resource.reconcile(self.desired, 'comment', remove=False)
+        self.assertEqual(self.base_api.mock_calls[6:10], [
+            mock.call.coalescing(),
+            mock.call.coalescing().__enter__(),
+            mock.call.send_sentence([
+                b'/ip/firewall/address-list/set', b'=address=10.0.0.20', b'=.id=*2', b'.tag=2']),
+            mock.call.send_sentence([
+                b'/ip/firewall/address-list/add', b'=comment=d', b'=address=10.0.0.5', b'.tag=3']),
+        ])
+        self.assertEqual(plan.errors, [plan.changes[1]])
+        self.assertEqual(plan.changes[0].get(), [])
+
+    def test_duplicate_desired_key(self):
+        self.base_api.receive_sentence.side_effect = self.current
+        self.assertRaises(ValueError, self.resource.reconcile, self.desired * 2, 'comment')
+
+    def test_large_plan_does_not_fill_socket_buffers(self):
+        def reply(words):
+            if words[0].endswith(b'/print'):
+                return [[b'!done', words[-1]]]
+            return [[b'!done', b'=ret=*1', words[-1]]]
+        router = fake_router.FakeRouter(reply)
+        self.addCleanup(router.close)
+        client = api_socket.SocketWrapper(router.client_socket)
+        self.addCleanup(client.close)
+        client.settimeout(5)
+        addresses = resource.RouterOsResource(
+            api_communicator.ApiCommunicator(base_api.Connection(client)), '/ip/firewall/address-list',
+            structure.default_structure)
+        desired = [{'comment': str(index), 'address': '10.0.{}.{}'.format(index // 256, index % 256)}
+                   for index in range(5000)]
+        plan = addresses.reconcile(desired, 'comment')
+        self.assertEqual(repr(plan), 'ReconcilePlan(add=5000, set=0, remove=0)')
+        self.assertEqual(plan.errors, [])
+
+
+class TestCallMany(unittest.TestCase):
+    def setUp(self):
+        self.base_api = mock.Mock()
+        self.resource = resource.RouterOsBinaryResource(
+            api_communicator.ApiCommunicator(self.base_api), '/ip/firewall/address-list')
+
+    def test_in_flight_commands_are_bounded(self):
+        self.base_api.receive_sentence.side_effect = [
+            [b'!done', b'=ret=*1', b'.tag=1'],
+            [b'!trap', b'=message=already have such entry', b'.tag=2'],
+            [b'!done', b'.tag=2'],
+            [b'!done', b'=ret=*3', b'.tag=3'],
+        ]
+        results = self.resource.add_many(
+            [{'address': b'10.0.0.1'}, {'address': b'10.0.0.1'}, {'address': b'10.0.0.3'}], max_in_flight=2)
+        self.assertEqual(self.base_api.mock_calls[:4], [
+            mock.call.send_sentence([b'/ip/firewall/address-list/add', b'=address=10.0.0.1', b'.tag=1']),
+            mock.call.send_sentence([b'/ip/firewall/address-list/add', b'=address=10.0.0.1', b'.tag=2']),
+            mock.call.receive_sentence(),
+            mock.call.send_sentence([b'/ip/firewall/address-list/add', b'=address=10.0.0.3', b'.tag=3']),
+        ])
+        self.assertEqual(results[0].ret, b'*1')
+        self.assertIsInstance(results[1].error, exceptions.RouterOsApiCommunicationError)
+        self.assertEqual(results[2].ret, b'*3')
+
+    def test_connection_error_fails_remaining_commands(self):
+        self.base_api.receive_sentence.side_effect = [
+            [b'!done', b'.tag=1'],
+            exceptions.RouterOsApiConnectionClosedError(),
+        ]
+        results = self.resource.set_many([{'id': b'*%d' % index, 'disabled': b'yes'} for index in range(4)],
+                                         max_in_flight=2)
+        self.assertIsNone(results[0].error)
+        for result in results[1:]:
+            self.assertIsInstance(result.error, exceptions.RouterOsApiConnectionClosedError)
+        self.assertEqual(self.base_api.send_sentence.call_count, 3)
+
+    def test_remove_many_joins_ids(self):
+        self.base_api.receive_sentence.side_effect = [[b'!done', b'.tag=1'], [b'!done', b'.tag=2']]
+        results = self.resource.remove_many([b'*1', b'*2', b'*3'], ids_per_command=2)
+        self.assertEqual([result.arguments for result in results], [{'numbers': b'*1,*2'}, {'numbers': b'*3'}])
+        self.assertEqual(self.base_api.send_sentence.call_args_list, [
+            mock.call([b'/ip/firewall/address-list/remove', b'=numbers=*1,*2', b'.tag=1']),
+            mock.call([b'/ip/firewall/address-list/remove', b'=numbers=*3', b'.tag=2']),
+        ])
+
+    def test_set_async_does_not_wait(self):
+        self.resource.set_async(id=b'*1', disabled=b'yes')
+        self.base_api.send_sentence.assert_called_once_with(
+            [b'/ip/firewall/address-list/set', b'=.id=*1', b'=disabled=yes', b'.tag=1'])
+        self.base_api.receive_sentence.assert_not_called()
@@ -1,3 +1,6 @@
+import itertools
+import re
+
 from unittest import TestCase
 
 from routeros_api import exceptions
@@ -25,12 +28,78 @@ class TestResponseSentence(TestCase):
         self.assertRaises(exceptions.RouterOsApiParsingError,
                           sentence.ResponseSentence.parse, [b'!re', b'?tag=b'])
 
+    def test_done_with_trailing_newline(self):
+        response = sentence.ResponseSentence.parse([b'!done\n'])
+        self.assertEqual(response.type, b'done')
+
+    def test_attribute_value_with_equals_sign(self):
+        response = sentence.ResponseSentence.parse([b'!re', b'=comment=a=b'])
+        self.assertEqual(response.attributes[b'comment'], b'a=b')
+
+    def test_re_with_empty_key(self):
+        self.assertRaises(exceptions.RouterOsApiParsingError,
+                          sentence.ResponseSentence.parse, [b'!re', b'==b'])
+
     def test_trap(self):
         response = sentence.ResponseSentence.parse([b'!trap', b'=message=b'])
         self.assertEqual(response.type, b'trap')
         self.assertEqual(response.attributes[b'message'], b'b')
 
 
+class RegexResponseSentence(sentence.ResponseSentence):
+    """The regular expression based parser used before, as a reference."""
+
+    response_re = re.compile(rb'^!(re|trap|fatal|empty|done)$')
+    attribute_re = re.compile(rb'^=([^=]+)=(.*)$', re.DOTALL)
+    tag_re = re.compile(rb'^\.tag=(.*)$')
+
+    @classmethod
+    def parse(cls, sentence):
+        response_match = cls.response_re.match(sentence[0])
+        if response_match:
+            response = cls(response_match.group(1))
+            response.parse_attributes(sentence[1:])
+        else:
+            raise exceptions.RouterOsApiParsingError("Malformed sentence %s", sentence)
+        return response
+
+    def parse_attributes(self, serialized_attributes):
+        for serialized in serialized_attributes:
+            attribute_match = self.attribute_re.match(serialized)
+            tag_match = self.tag_re.match(serialized)
+            if attribute_match:
+                key, value = attribute_match.groups()
+                self.attributes[key] = self.process_value(value)
+            elif tag_match:
+                self.tag = tag_match.group(1)
+            else:
+                raise exceptions.RouterOsApiParsingError("Malformed attribute %s", serialized)
+
+
+class TestResponseSentenceMatchesRegexParser(TestCase):
+    types = [b'!re', b'!done', b'!trap', b'!fatal', b'!empty', b'!done\n', b'!done\n\n', b'!don', b'!', b'',
+             b'done', b'!redone', b' !re', b'!re ', b'\n!re', b'!RE']
+    words = [b'=a=b', b'=a=', b'=a==', b'=a=b=c', b'==b', b'=a', b'=', b'', b'a=b', b'=a=b\n', b'=a\n=b',
+             b'=a=b\nc', b'=.id=*1', b'.tag=1', b'.tag=', b'.tag=1\n', b'.tag=1\n\n', b'.tag=1\n2', b'.tag',
+             b'.tags=1', b'.tag==', b'?tag=b', b'=\xff=\x00', b'=a=\xb9\xe6']
+
+    def test_same_results(self):
+        sentences = [[first] for first in self.types]
+        sentences += [[b'!re', word] for word in self.words]
+        sentences += [[b'!re'] + list(words) for words in itertools.permutations(self.words[:8] + self.words[13:19], 2)]
+        for words in sentences:
+            with self.subTest(words=words):
+                self.assertEqual(self.parse(sentence.ResponseSentence, words),
+                                 self.parse(RegexResponseSentence, words))
+
+    def parse(self, parser, words):
+        try:
+            response = parser.parse(words)
+        except exceptions.RouterOsApiParsingError as e:
+            return e.args
+        return response.type, response.attributes, response.tag
+
+
 class TestCommandSentence(TestCase):
     def test_login_sentence(self):
         command = sentence.CommandSentence(b'/', b'login')
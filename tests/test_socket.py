@@ -1,4 +1,7 @@
+import os
 import socket
+import ssl
+import threading
 
 from unittest import TestCase
 
@@ -11,31 +14,104 @@ from routeros_api import api_socket
 from routeros_api import exceptions
 
 
+def receiving(*chunks):
+    chunks = list(chunks)
+
+    def recv_into(buffer):
+        chunk = chunks.pop(0)
+        if isinstance(chunk, Exception):
+            raise chunk
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+    return recv_into
+
+
 class TestSocketWrapper(TestCase):
     def test_socket(self):
         inner = mock.Mock()
         wrapper = api_socket.SocketWrapper(inner)
-        inner.recv.side_effect = [
-            socket.error(api_socket.EINTR),
-            'bytes',
-        ]
-        self.assertEqual(wrapper.receive(5), 'bytes')
+        inner.recv_into.side_effect = receiving(socket.error(api_socket.EINTR), b'bytes')
+        self.assertEqual(wrapper.receive(5), b'bytes')
+
+    def test_receive_returns_received_bytes(self):
+        inner = mock.Mock()
+        wrapper = api_socket.SocketWrapper(inner)
+        inner.recv_into.side_effect = receiving(b'abcd', b'ef')
+        self.assertEqual(wrapper.receive(6), b'abcd')
+        self.assertEqual(wrapper.receive(6), b'ef')
+
+    def test_receive_into(self):
+        inner = mock.Mock()
+        wrapper = api_socket.SocketWrapper(inner)
+        inner.recv_into.side_effect = receiving(b'ab', socket.error(api_socket.EINTR), b'cde')
+        buffer = bytearray(8)
+        self.assertEqual(wrapper.receive_into(buffer), 2)
+        self.assertEqual(wrapper.receive_into(memoryview(buffer)[2:]), 3)
+        self.assertEqual(buffer[:5], b'abcde')
+
+    def test_closed_connection(self):
+        inner = mock.Mock()
+        wrapper = api_socket.SocketWrapper(inner)
+        inner.recv_into.return_value = 0
+        self.assertRaises(exceptions.RouterOsApiConnectionClosedError, wrapper.receive, 1)
+
+    def test_wait_readable(self):
+        client, server = socket.socketpair()
+        self.addCleanup(server.close)
+        wrapper = api_socket.SocketWrapper(client)
+        self.addCleanup(wrapper.close)
+        self.assertFalse(wrapper.wait_readable(0.01))
+        server.sendall(b'ab')
+        self.assertTrue(wrapper.wait_readable(1))
+        self.assertEqual(wrapper.receive(1), b'a')
+        self.assertTrue(wrapper.wait_readable(0))
+        self.assertEqual(wrapper.receive(1), b'b')
+        self.assertFalse(wrapper.wait_readable(0.01))
+
+
+class TestSendMany(TestCase):
+    def test_single_sendmsg(self):
+        inner = mock.Mock()
+        inner.sendmsg.return_value = 8
+        wrapper = api_socket.SocketWrapper(inner)
+        wrapper.send_many([b'\x03foo', b'\x03bar'])
+        inner.sendmsg.assert_called_once_with([b'\x03foo', b'\x03bar'])
+
+    def test_partial_sendmsg(self):
+        inner = mock.Mock()
+        sent = []
+
+        def sendmsg(buffers):
+            sent.append([bytes(buffer) for buffer in buffers])
+            return min(5, sum(len(buffer) for buffer in buffers))
+        inner.sendmsg.side_effect = sendmsg
+        wrapper = api_socket.SocketWrapper(inner)
+        wrapper.send_many([b'\x03foo', b'\x03bar'])
+        self.assertEqual(sent, [[b'\x03foo', b'\x03bar'], [b'bar']])
+
+    def test_without_sendmsg(self):
+        inner = mock.Mock(spec=['sendall'])
+        wrapper = api_socket.SocketWrapper(inner)
+        wrapper.send_many([b'\x03foo', b'\x03bar'])
+        inner.sendall.assert_called_once_with(b'\x03foo\x03bar')
 
 
+@mock.patch('routeros_api.api_socket.resolver', mock.Mock(resolve=mock.Mock(return_value=['address'])))
 class TestGetSocket(TestCase):
-    @mock.patch('socket.create_connection')
+    @mock.patch('routeros_api.api_socket.create_connection')
     def test_with_interrupt(self, create_connection_mock):
         create_connection_mock.side_effect = [
             socket.error(api_socket.EINTR),
             mock.Mock(),
         ]
         api_socket.get_socket('host', 123)
+        api_socket.resolver.resolve.assert_called_with('host', 123)
         create_connection_mock.assert_has_calls([
-            mock.call(('host', 123), timeout=15.0),
-            mock.call(('host', 123), timeout=15.0),
+            mock.call(['address'], timeout=15.0),
+            mock.call(['address'], timeout=15.0),
         ])
 
-    @mock.patch('socket.create_connection')
+    @mock.patch('routeros_api.api_socket.create_connection')
     def test_with_other_error(self, create_connection_mock):
         create_connection_mock.side_effect = [
             socket.error(1),
@@ -44,5 +120,133 @@ class TestGetSocket(TestCase):
         self.assertRaises(exceptions.RouterOsApiConnectionError,
                           api_socket.get_socket, 'host', 123)
         create_connection_mock.assert_has_calls([
-            mock.call(('host', 123), timeout=15.0),
+            mock.call(['address'], timeout=15.0),
         ])
+
+    @mock.patch('routeros_api.api_socket.create_connection')
+    def test_tcp_nodelay(self, create_connection_mock):
+        api_socket.get_socket('host', 123, tcp_nodelay=True)
+        create_connection_mock.return_value.setsockopt.assert_any_call(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class TlsServer(object):
+    """Accepts TLS connections on localhost and sends one byte on each of them."""
+
+    def __init__(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(os.path.join(os.path.dirname(__file__), 'keycert.pem'))
+        self.listener = context.wrap_socket(socket.create_server(('localhost', 0)), server_side=True)
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        try:
+            while True:
+                connection, _ = self.listener.accept()
+                with connection:
+                    connection.sendall(b'!')
+                    connection.recv(1)
+        except OSError:
+            pass
+
+    def close(self):
+        self.listener.close()
+
+
+class TestSslSessions(TestCase):
+    def setUp(self):
+        self.server = TlsServer()
+        self.addCleanup(self.server.close)
+        self.addCleanup(api_socket.ssl_sessions.clear)
+
+    def connect(self, **kwargs):
+        wrapper = api_socket.get_socket('localhost', self.server.port, use_ssl=True, ssl_verify=False, **kwargs)
+        self.assertEqual(wrapper.receive(1), b'!')
+        wrapper.close()
+        return wrapper
+
+    def test_session_is_resumed_on_reconnect(self):
+        self.assertFalse(self.connect().session_reused)
+        self.assertTrue(self.connect().session_reused)
+        self.assertEqual(len(api_socket.ssl_sessions), 1)
+
+    def test_session_is_only_offered_to_its_context(self):
+        self.connect()
+        self.assertFalse(self.connect(ssl_context=api_socket.create_ssl_context(ssl_verify=False)).session_reused)
+
+    def test_contexts_are_shared(self):
+        self.assertIs(api_socket.get_ssl_context(True, ssl_verify=False),
+                      api_socket.get_ssl_context(True, ssl_verify=False, ssl_verify_hostname=False))
+        self.assertIsNot(api_socket.get_ssl_context(True), api_socket.get_ssl_context(True, ssl_verify=False))
+        self.assertIsNone(api_socket.get_ssl_context(False))
+
+
+class TestCreateConnection(TestCase):
+    def setUp(self):
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(self.server.close)
+        self.port = self.server.getsockname()[1]
+
+    def get_addresses(self, port):
+        return socket.getaddrinfo('127.0.0.1', port, 0, socket.SOCK_STREAM)
+
+    def test_connect(self):
+        connection = api_socket.create_connection(self.get_addresses(self.port), timeout=3)
+        self.addCleanup(connection.close)
+        self.assertEqual(connection.getpeername()[1], self.port)
+        self.assertEqual(connection.gettimeout(), 3)
+
+    def test_next_address_is_tried_after_failure(self):
+        closed = socket.create_server(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+        addresses = self.get_addresses(closed_port) + self.get_addresses(self.port)
+        connection = api_socket.create_connection(addresses, timeout=3)
+        self.addCleanup(connection.close)
+        self.assertEqual(connection.getpeername()[1], self.port)
+
+    def test_last_error_is_raised(self):
+        closed = socket.create_server(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+        self.assertRaises(ConnectionRefusedError, api_socket.create_connection, self.get_addresses(closed_port), 3)
+
+    def test_next_address_is_tried_if_socket_cannot_be_created(self):
+        unsupported = (socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_UDP, '', ('127.0.0.1', self.port))
+        connection = api_socket.create_connection([unsupported] + self.get_addresses(self.port), timeout=3)
+        self.addCleanup(connection.close)
+        self.assertEqual(connection.getpeername()[1], self.port)
+
+    def test_socket_creation_error_is_raised(self):
+        unsupported = (socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_UDP, '', ('127.0.0.1', self.port))
+        self.assertRaises(OSError, api_socket.create_connection, [unsupported], 3)
+
+    def test_address_families_are_interleaved(self):
+        v6 = [(socket.AF_INET6, socket.SOCK_STREAM, 6, '', ('::{}'.format(index), 1)) for index in range(3)]
+        v4 = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.{}'.format(index), 1)) for index in range(2)]
+        self.assertEqual(api_socket.interleave_families(v6 + v4), [v6[0], v4[0], v6[1], v4[1], v6[2]])
+
+
+class TestResolver(TestCase):
+    @mock.patch('routeros_api.api_socket.time.monotonic')
+    @mock.patch('routeros_api.api_socket.socket.getaddrinfo')
+    def test_addresses_are_cached(self, getaddrinfo, monotonic):
+        resolver = api_socket.Resolver(ttl=10)
+        monotonic.return_value = 100
+        self.assertIs(resolver.resolve('router', 8728), getaddrinfo.return_value)
+        monotonic.return_value = 109
+        resolver.resolve('router', 8728)
+        self.assertEqual(getaddrinfo.call_count, 1)
+        resolver.resolve('router', 8729)
+        monotonic.return_value = 111
+        resolver.resolve('router', 8728)
+        self.assertEqual(getaddrinfo.call_count, 3)
+
+    @mock.patch('routeros_api.api_socket.socket.getaddrinfo')
+    def test_failures_are_not_cached(self, getaddrinfo):
+        resolver = api_socket.Resolver()
+        getaddrinfo.side_effect = [socket.gaierror('unknown host'), []]
+        self.assertRaises(socket.gaierror, resolver.resolve, 'router', 8728)
+        self.assertEqual(resolver.resolve('router', 8728), [])